@@ -0,0 +1,313 @@
+"""Local HTTP JSON API for projections.
+
+    python api_server.py serve [--port 8502] [--window-ms 5]
+    python api_server.py loadtest [--url http://127.0.0.1:8502] [--concurrency 32] [--duration 10]
+
+POST /project with a form_data JSON object (dates as "YYYY-MM-DD", rates as
+fractions, optional "horizon_years"; omitted inputs take the app defaults)
+returns {"monthly": {...}, "yearly": {...}, "metrics": {...}}. Requests that
+arrive within the batching window are evaluated together in one
+project_batch() call, and responses are cached by canonical_key(form_data).
+GET /stats reports latency percentiles, error responses by status, batching and
+cache counters. Failed batches answer 500 and timeouts 503, with a JSON error.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from engine import default_inputs, key_metrics, payback_label, project_batch, yearly_batch
+from result_cache import ResultCache, canonical_key
+
+# Encoded responses, keyed like the app's result cache
+RESPONSE_CACHE = ResultCache(int(float(os.environ.get("API_CACHE_MB", "128")) * 2**20))
+
+
+def parse_form_data(payload):
+    """form_data from a JSON request body, with app defaults for anything omitted.
+
+    Raises ValueError/TypeError on malformed input, so one bad request never
+    fails the batch it would have joined.
+    """
+    form_data = default_inputs()
+    form_data['horizon_years'] = 5
+    form_data.update(payload)
+    for key, value in form_data.items():
+        if key == 'kick_off_date':
+            form_data[key] = date.fromisoformat(value) if isinstance(value, str) else value
+        elif key == 'horizon_years':
+            form_data[key] = int(value)
+            if not 1 <= form_data[key] <= 50:
+                raise ValueError("horizon_years must be between 1 and 50")
+        else:
+            form_data[key] = float(value)
+    return form_data
+
+
+def _json_values(values):
+    if values.dtype.kind == "M":
+        return np.datetime_as_string(values, unit="D").tolist()
+    values = values.tolist()
+    if any(isinstance(v, float) and not math.isfinite(v) for v in values):
+        values = [v if not isinstance(v, float) or math.isfinite(v) else None for v in values]
+    return values
+
+
+def _json_number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def evaluate(forms):
+    """Evaluate a list of form_data dicts together; returns one encoded JSON response per form."""
+    responses = [None] * len(forms)
+    # Forms are batched only with forms that give the same inputs: a batch reads schedule lengths
+    # from the keys present across it, so a shorter schedule would otherwise pick up NaN years
+    groups = {}
+    for index, form_data in enumerate(forms):
+        groups.setdefault((form_data["horizon_years"], frozenset(form_data)), []).append(index)
+    for (horizon_years, _), indices in groups.items():
+        group = [forms[index] for index in indices]
+        batch = project_batch(group, 12 * int(horizon_years))
+        yearly = yearly_batch(batch)
+        metrics = key_metrics(group)
+        for row, index in enumerate(indices):
+            body = {
+                "monthly": {name: _json_values(values[row]) for name, values in batch.items()},
+                "yearly": {name: _json_values(values[row]) for name, values in yearly.items()},
+                "metrics": {name: _json_number(values[row]) for name, values in metrics.items()},
+            }
+            body["metrics"]["sem_payback"] = payback_label(metrics["sem_payback_months"][row])
+            body["metrics"]["affiliate_payback"] = payback_label(metrics["affiliate_payback_months"][row])
+            responses[index] = json.dumps(body).encode()
+    return responses
+
+
+class Coalescer:
+    """Collects requests for up to `window` seconds and evaluates them as one batch."""
+
+    def __init__(self, window=0.005, max_batch=512):
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, key, form_data):
+        future = Future()
+        self._queue.put((key, form_data, future))
+        return future
+
+    def _loop(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical inputs within a batch are evaluated once
+            unique = {}
+            for key, form_data, _ in items:
+                unique.setdefault(key, form_data)
+            try:
+                responses = dict(zip(unique, evaluate(list(unique.values()))))
+            except Exception as exc:
+                for _, _, future in items:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.batched_requests += len(items)
+            for key, _, future in items:
+                future.set_result(responses[key])
+
+
+class LatencyLog:
+    """Latencies of the most recent requests, for percentile reporting, and error responses by status."""
+
+    def __init__(self, size=10000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = {}
+
+    def error(self, status):
+        with self._lock:
+            self.errors[str(status)] = self.errors.get(str(status), 0) + 1
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self._lock:
+            samples = np.array(self._samples)
+        if not len(samples):
+            return {"requests": self.count, "errors": dict(self.errors)}
+        p50, p99 = np.percentile(samples, [50, 99]) * 1000
+        return {"requests": self.count, "p50_ms": p50, "p99_ms": p99, "max_ms": samples.max() * 1000,
+                "errors": dict(self.errors)}
+
+
+class ProjectionHandler(BaseHTTPRequestHandler):
+    coalescer = None
+    latency = None
+
+    def _send(self, status, body):
+        if status >= 400 and self.latency is not None:
+            self.latency.error(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, b'{"status": "ok"}')
+        elif self.path == "/stats":
+            stats = {
+                "latency": self.latency.summary(),
+                "batches": self.coalescer.batches,
+                "mean_batch_size": self.coalescer.batched_requests / self.coalescer.batches if self.coalescer.batches else 0,
+                "cache": RESPONSE_CACHE.stats(),
+            }
+            self._send(200, json.dumps(stats).encode())
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        if self.path != "/project":
+            self._send(404, b'{"error": "not found"}')
+            return
+        start = time.perf_counter()
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            form_data = parse_form_data(payload)
+        except (ValueError, TypeError) as exc:
+            self._send(400, json.dumps({"error": str(exc)}).encode())
+            return
+        key = canonical_key(form_data)
+        body = RESPONSE_CACHE.get(key)
+        if body is None:
+            try:
+                body = self.coalescer.submit(key, form_data).result(timeout=60)
+            except (KeyError, ValueError) as exc:
+                self._send(400, json.dumps({"error": str(exc)}).encode())
+                return
+            except FutureTimeout:
+                self._send(503, b'{"error": "projection timed out, try again"}')
+                return
+            except Exception as exc:
+                # The Coalescer fails every request of a batch that raised; each still gets a JSON answer
+                self._send(500, json.dumps({"error": f"projection failed: {exc}"}).encode())
+                return
+            RESPONSE_CACHE.put(key, body)
+        self._send(200, body)
+        self.latency.add(time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProjectionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default of 5 refuses connections under load
+
+
+def serve(host="127.0.0.1", port=8502, window=0.005, max_batch=512):
+    ProjectionHandler.coalescer = Coalescer(window, max_batch)
+    ProjectionHandler.latency = LatencyLog()
+    server = ProjectionServer((host, port), ProjectionHandler)
+    print(f"Serving projections on http://{host}:{port}")
+    server.serve_forever()
+
+
+def load_test(url, concurrency=32, duration=10.0, unique=0.5, seed=0):
+    """Hammer POST /project from `concurrency` threads for `duration` seconds.
+
+    A `unique` share of requests get a fresh churn_rate so they miss the cache.
+    Prints throughput and client-side latency percentiles, then the server's /stats.
+    """
+    stop = time.monotonic() + duration
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = np.random.default_rng([seed, worker_id])
+        local = []
+        while time.monotonic() < stop:
+            body = {}
+            if rng.random() < unique:
+                body["churn_rate"] = round(float(rng.uniform(0.01, 0.5)), 6)
+            request = urllib.request.Request(f"{url}/project", data=json.dumps(body).encode(),
+                                             headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+            except OSError as exc:
+                with lock:
+                    errors.append(exc)
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (float("nan"),) * 2
+    print(f"{len(latencies):,} requests in {elapsed:.1f}s -> {len(latencies) / elapsed:,.0f} req/s "
+          f"(p50 {p50:.1f} ms, p99 {p99:.1f} ms, {len(errors)} errors)")
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        print("server:", response.read().decode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="run the API server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8502)
+    serve_parser.add_argument("--window-ms", type=float, default=5.0, help="batching window (default 5 ms)")
+    serve_parser.add_argument("--max-batch", type=int, default=512)
+    load_parser = sub.add_parser("loadtest", help="measure sustained requests per second")
+    load_parser.add_argument("--url", default="http://127.0.0.1:8502")
+    load_parser.add_argument("--concurrency", type=int, default=32)
+    load_parser.add_argument("--duration", type=float, default=10.0)
+    load_parser.add_argument("--unique", type=float, default=0.5, help="share of requests that miss the cache")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.window_ms / 1000, args.max_batch)
+    else:
+        load_test(args.url, args.concurrency, args.duration, args.unique)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,31 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 from datetime import date, datetime
-from dateutil.relativedelta import relativedelta
-import calendar
-import plotly.graph_objects as go
-import plotly.express as px
+import os
 import textwrap
+import time
+
+from calibration import PARAMETER_GROUPS, SERIES, calibrate, default_parameters, read_actuals
+from charts import (add_calibration_overlay, add_cashflow_bands, add_financials_bands, cohort_figure,
+                    financials_figure, monthly_trace, scenario_cashflow_figure, scenario_mrr_figure,
+                    scenario_traffic_figure)
+from cohorts import cohort_matrix, retention_curves, retention_inputs
+from diagnostics import ENABLED_BY_DEFAULT, RerunProfiler, StageTimer, is_admin
+from disk_cache import DISK_CACHE
+from engine import INPUT_KEYS, payback_label, scenario_arrays
+from export import EXPORT_POOL, FORMATS, export_batch, export_result, stage_upload
+from montecarlo import DISTRIBUTIONS, bootstrap_specs, simulate
+from result_cache import RESULT_CACHE, canonical_key
+from scenario_store import SCENARIO_STORE
+from plans import PLAN_KEY, has_plan_inputs
+from rollups import LEVELS, MONTH_NAMES
+from schedules import (CAC_LABEL, MAX_RATE, MIN_YEARS, PLAN_COLUMNS, SCHEDULE_KEY, TRAFFIC_LABEL, channel_frame,
+                       channel_inputs, mix_label, plan_frame, plan_inputs, schedule_frame, schedule_inputs, year_label)
+from session_memory import SESSION_MEMORY
+from worker_pool import PROJECTION_POOL, PoolBusy, build_in_worker
+from solver import PRESET_TARGETS, preset_target, solve, target_label
+import startup
 
 # Initialize session state
 if "page" not in st.session_state:
@@ -17,8 +37,49 @@ if "form_data" not in st.session_state:
 if "calculate" not in st.session_state:
     st.session_state.calculate = False
 
+# Stage timing for this rerun (and a cProfile capture when an admin asked for one)
+diagnostics_panel = st.sidebar.expander("Diagnostics")
+with diagnostics_panel:
+    timing_enabled = st.checkbox("Time each stage", value=ENABLED_BY_DEFAULT)
+timer = StageTimer(enabled=timing_enabled)
+profiler = RerunProfiler() if st.session_state.pop("profile_next_rerun", False) else None
+
+
+def finish_profile():
+    """Stop this rerun's cProfile capture, if any, and keep its .pstats path; later calls do nothing."""
+    global profiler
+    if profiler is not None:
+        st.session_state.last_profile = profiler.dump()
+        profiler = None
+
+
+def stop():
+    """st.stop() that still ends a profiled rerun's capture (the script's last lines never run)."""
+    finish_profile()
+    st.stop()
+
+
+def rerun():
+    """st.rerun() that still ends a profiled rerun's capture."""
+    finish_profile()
+    st.rerun()
+
+run_context = get_script_run_ctx()
+session_id = run_context.session_id if run_context else None
+
 st.title("📊 SaaS Financial Model")
 
+with st.sidebar.expander("Result cache"):
+    cache_stats = RESULT_CACHE.stats()
+    st.write(f"Hits: {cache_stats['hits']:,} | Misses: {cache_stats['misses']:,} | Hit rate: {cache_stats['hit_rate']:.0%}")
+    st.write(f"Entries: {cache_stats['entries']:,} | {cache_stats['bytes'] / 2**20:,.1f} of {cache_stats['max_bytes'] / 2**20:,.0f} MB")
+    disk_stats = DISK_CACHE.stats()
+    st.write(f"On disk: {disk_stats['entries']:,} entries | {disk_stats['bytes'] / 2**20:,.1f} of {disk_stats['max_bytes'] / 2**20:,.0f} MB")
+    pool_stats = PROJECTION_POOL.stats()
+    st.write(f"Workers: {pool_stats['running']} of {pool_stats['workers']} busy | {pool_stats['queued']} of "
+             f"{pool_stats['max_queued']} queued | {pool_stats['cancelled']:,} cancelled | {pool_stats['rejected']:,} turned away")
+
+timer.begin("form")
 with st.form("single_page_form", clear_on_submit=False):
     # Core Parameters - Column 1
     st.subheader("Revenue Model Core Parameters")
@@ -36,6 +97,9 @@ with st.form("single_page_form", clear_on_submit=False):
         # Store in session state
         st.session_state.form_data['kick_off_date'] = kick_off_date
         st.session_state.form_data['subscription_price'] = st.number_input("Monthly Subscription Price ($)",min_value=0.0,value=25.5,step=0.5, format="%.2f")
+        st.session_state.form_data['horizon_years'] = st.number_input("Projection Horizon (Years)", min_value=1, max_value=50, value=5, step=1)
+        fiscal_start = st.selectbox("Fiscal Year Starts In", MONTH_NAMES, index=0)
+        st.session_state.form_data['fiscal_start_month'] = MONTH_NAMES.index(fiscal_start) + 1
 
 
     
@@ -43,119 +107,121 @@ with st.form("single_page_form", clear_on_submit=False):
         st.session_state.form_data['free_trial_days'] = st.number_input("Subscription Free Trial (Days)", min_value=0, max_value=28,value=7,step=1)
         st.session_state.form_data['trial_to_paid'] = st.number_input("Monthly Trial To Paid Rate (%)", min_value=0, max_value=100,value=25,step=5) / 100
         st.session_state.form_data['churn_rate'] = st.number_input("Monthly Churn Rate (%) - Paying users who unsubscribe", min_value=1, max_value=100,value=25,step=5) / 100      
+
+    # Retention curve: the flat churn rate above, or a per-month cohort curve
+    retention_model = st.radio(
+        "Paid User Retention",
+        ["Flat monthly churn rate", "Shifted-beta-geometric curve", "Uploaded retention curve"],
+        horizontal=True
+    )
+    retention_cols = st.columns(3)
+    with retention_cols[0]:
+        retention_alpha = st.number_input("sBG Alpha", min_value=0.01, value=1.0, step=0.1, format="%.2f")
+    with retention_cols[1]:
+        retention_beta = st.number_input("sBG Beta", min_value=0.01, value=3.0, step=0.1, format="%.2f")
+    with retention_cols[2]:
+        retention_csv = st.file_uploader("Retention curve CSV ('retention' column, month 1 first)", type="csv")
+    st.caption("sBG: first-month churn is Alpha / (Alpha + Beta) and churn falls as cohorts age. "
+               "Key Metrics (LTV, CAC payback) keep using the flat churn rate.")
+    for key in [key for key in st.session_state.form_data if key.startswith("retention_")]:
+        del st.session_state.form_data[key]
+    if retention_model == "Shifted-beta-geometric curve":
+        st.session_state.form_data['retention_alpha'] = retention_alpha
+        st.session_state.form_data['retention_beta'] = retention_beta
+    elif retention_model == "Uploaded retention curve" and retention_csv is not None:
+        try:
+            st.session_state.form_data.update(retention_inputs(retention_csv))
+        except (ValueError, KeyError) as e:
+            st.error(f"Couldn't read the retention curve: {e}")
+
+    # Price plans: new trials split across plans by a yearly mix, each with its own economics
+    use_plans = st.checkbox("Split subscriptions across price plans", key="price_plans")
+    st.caption("Each plan bills its price every billing period (1 = monthly, 12 = annual) and loses its churn rate "
+               "at each renewal. The mix is each plan's share of new trials per year, scaled to add up to 100%. "
+               "Add or delete rows to change the plans. Key Metrics (LTV, CAC payback) and the cohort view keep "
+               "using the single-plan inputs above.")
+    plan_years = st.session_state.form_data.get('horizon_years', MIN_YEARS)
+    plan_grid = st.data_editor(
+        plan_frame(st.session_state.form_data, plan_years),
+        use_container_width=True,
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={
+            PLAN_COLUMNS[0][1]: st.column_config.NumberColumn(min_value=0.0, step=0.5, format="$%.2f"),
+            PLAN_COLUMNS[1][1]: st.column_config.NumberColumn(min_value=1, step=1, format="%d"),
+            PLAN_COLUMNS[2][1]: st.column_config.NumberColumn(min_value=0, step=1, format="%d"),
+            **{label: st.column_config.NumberColumn(min_value=0.0, max_value=MAX_RATE, step=1.0, format="%.1f")
+               for _, label, scale in PLAN_COLUMNS if scale == 100},
+            **{mix_label(y): st.column_config.NumberColumn(min_value=0.0, max_value=MAX_RATE, step=1.0, format="%.1f")
+               for y in range(1, max(plan_years, MIN_YEARS) + 1)},
+        },
+        key="plans"
+    )
+    plan_values = {}
+    if use_plans:
+        try:
+            plan_values = plan_inputs(plan_grid)
+        except ValueError as e:
+            plan_values = None
+            st.error(f"Fix the price plan grid before calculating. {e}")
+    if plan_values is not None:
+        for key in [key for key in st.session_state.form_data if PLAN_KEY.fullmatch(key)]:
+            del st.session_state.form_data[key]
+        st.session_state.form_data.update(plan_values)
         
     
-    # Traffic Inputs
+    # Acquisition channels: one row per channel of the registry (channels.py)
     st.markdown("")
     st.subheader("Web/App Traffic Parameters")
-    traffic_col1, traffic_col2, traffic_col3 = st.columns(3)
-    
-    with traffic_col1:
-        st.session_state.form_data['sem_traffic_m1'] = st.number_input(
-            "Paid Traffic (SEM Traffic) - First Month", min_value=0, 
-            value=100000, step=1000, format="%d")
-    with traffic_col2:
-        st.session_state.form_data['seo_traffic_m1'] = st.number_input(
-            "Organic Traffic (SEO Traffic) - First Month", min_value=0, 
-            value=100000, step=1000, format="%d")
-    with traffic_col3:
-        st.session_state.form_data['am_traffic_m1'] = st.number_input(
-            "Affiliate Marketing Traffic - First Month (Traffic coming from another website)", min_value=0, 
-            value=10000, step=1000, format="%d")    
-    
-    # Growth Rates Section
-    st.markdown("")
-    st.subheader("Web/App Traffic Monthly Growth Rates by Year")
-    st.write("Note: A 1% monthly growth rate is approximately equivalent to 12% annual growth rate")
-    # SEM Growth Rates
-    st.markdown("**Web/App Paid Traffic (SEM Traffic) Monthly Growth Rate by Year**")
-    _cols = st.columns(5)
-    with _cols[0]:
-        st.session_state.form_data['sem_traffic_gr_y1'] = st.number_input("Monthly Growth Rate - Year 1 (%)", 0.0, 100.0, 2.0, 0.5, key="_y1") / 100
-    with _cols[1]:
-        st.session_state.form_data['sem_traffic_gr_y2'] = st.number_input("Monthly Growth Rate - Year 2 (%)", 0.0, 100.0, 2.0, 0.5, key="_y2") / 100
-    with _cols[2]:
-        st.session_state.form_data['sem_traffic_gr_y3'] = st.number_input("Monthly Growth Rate - Year 3 (%)", 0.0, 100.0, 2.0, 0.5, key="sem_y3") / 100
-    with _cols[3]:
-        st.session_state.form_data['sem_traffic_gr_y4'] = st.number_input("Monthly Growth Rate - Year 4 (%)", 0.0, 100.0, 2.0, 0.5, key="sem_y4") / 100
-    with _cols[4]:
-        st.session_state.form_data['sem_traffic_gr_y5'] = st.number_input("Monthly Growth Rate - Year 5 (%)", 0.0, 100.0, 2.0, 0.5, key="sem_y5") / 100
-    
-    # SEO Growth Rates
-    st.markdown("**Web/App Organic Traffic (SEO Traffic) Monthly Growth Rate by Year**")
-    seo_cols = st.columns(5)
-    with seo_cols[0]:
-        st.session_state.form_data['seo_traffic_gr_y1'] = st.number_input("Monthly Growth Rate - Year 1 (%)", 0.0, 100.0, 2.0, 0.5, key="seo_y1") / 100
-    with seo_cols[1]:
-        st.session_state.form_data['seo_traffic_gr_y2'] = st.number_input("Monthly Growth Rate - Year 2 (%)", 0.0, 100.0, 2.0, 0.5, key="seo_y2") / 100
-    with seo_cols[2]:
-        st.session_state.form_data['seo_traffic_gr_y3'] = st.number_input("Monthly Growth Rate - Year 3 (%)", 0.0, 100.0, 2.0, 0.5, key="seo_y3") / 100
-    with seo_cols[3]:
-        st.session_state.form_data['seo_traffic_gr_y4'] = st.number_input("Monthly Growth Rate - Year 4 (%)", 0.0, 100.0, 2.0, 0.5, key="seo_y4") / 100
-    with seo_cols[4]:
-        st.session_state.form_data['seo_traffic_gr_y5'] = st.number_input("Monthly Growth Rate - Year 5 (%)", 0.0, 100.0, 2.0, 0.5, key="seo_y5") / 100
-    
-    # Affiliate Marketing Growth Rates
-    st.markdown("**Web/App Affiliate Marketing Traffic Monthly Growth Rate by Year**")
-    am_cols = st.columns(5)
-    with am_cols[0]:
-        st.session_state.form_data['am_traffic_gr_y1'] = st.number_input("Monthly Growth Rate - Year 1 (%)", 0.0, 100.0, 2.0, 0.5, key="am_y1") / 100
-    with am_cols[1]:
-        st.session_state.form_data['am_traffic_gr_y2'] = st.number_input("Monthly Growth Rate - Year 2 (%)", 0.0, 100.0, 2.0, 0.5, key="am_y2") / 100
-    with am_cols[2]:
-        st.session_state.form_data['am_traffic_gr_y3'] = st.number_input("Monthly Growth Rate - Year 3 (%)", 0.0, 100.0, 2.0, 0.5, key="am_y3") / 100
-    with am_cols[3]:
-        st.session_state.form_data['am_traffic_gr_y4'] = st.number_input("Monthly Growth Rate - Year 4 (%)", 0.0, 100.0, 2.0, 0.5, key="am_y4") / 100
-    with am_cols[4]:
-        st.session_state.form_data['am_traffic_gr_y5'] = st.number_input("Monthly Growth Rate - Year 5 (%)", 0.0, 100.0, 2.0, 0.5, key="am_y5") / 100
-    
-    # Conversion Rates Section
-    st.markdown("")
-    st.subheader("Conversion Rate Assumptions (Traffic-to-Subscription Trial Rate %)")
-    
-    # SEM Conversion Rates
-    st.markdown("**Paid Traffic (SEM Traffic) Conversion Rates**")
-    sem_cr_cols = st.columns(5)
-    with sem_cr_cols[0]:
-        st.session_state.form_data['sem_cr_y1'] = st.number_input("Year 1 (%)", 0.0, 100.0, 4.0, 0.5, key="sem_cr_y1") / 100
-    with sem_cr_cols[1]:
-        st.session_state.form_data['sem_cr_y2'] = st.number_input("Year 2 (%)", 0.0, 100.0, 4.5, 0.5, key="sem_cr_y2") / 100
-    with sem_cr_cols[2]:
-        st.session_state.form_data['sem_cr_y3'] = st.number_input("Year 3 (%)", 0.0, 100.0, 5.0, 0.5, key="sem_cr_y3") / 100
-    with sem_cr_cols[3]:
-        st.session_state.form_data['sem_cr_y4'] = st.number_input("Year 4 (%)", 0.0, 100.0, 5.5, 0.5, key="sem_cr_y4") / 100
-    with sem_cr_cols[4]:
-        st.session_state.form_data['sem_cr_y5'] = st.number_input("Year 5 (%)", 0.0, 100.0, 6.0, 0.5, key="sem_cr_y5") / 100
-    
-    # SEO Conversion Rates
-    st.markdown("**Organic Tradffic (SEO Traffic) Conversion Rates**")
-    seo_cr_cols = st.columns(5)
-    with seo_cr_cols[0]:
-        st.session_state.form_data['seo_cr_y1'] = st.number_input("Year 1 (%)", 0.0, 100.0, 4.0, 0.5, key="seo_cr_y1") / 100
-    with seo_cr_cols[1]:
-        st.session_state.form_data['seo_cr_y2'] = st.number_input("Year 2 (%)", 0.0, 100.0, 4.5, 0.5, key="seo_cr_y2") / 100
-    with seo_cr_cols[2]:
-        st.session_state.form_data['seo_cr_y3'] = st.number_input("Year 3 (%)", 0.0, 100.0, 5.0, 0.5, key="seo_cr_y3") / 100
-    with seo_cr_cols[3]:
-        st.session_state.form_data['seo_cr_y4'] = st.number_input("Year 4 (%)", 0.0, 100.0, 5.5, 0.5, key="seo_cr_y4") / 100
-    with seo_cr_cols[4]:
-        st.session_state.form_data['seo_cr_y5'] = st.number_input("Year 5 (%)", 0.0, 100.0, 6.0, 0.5, key="seo_cr_y5") / 100
-
-    # Affiliate Marketing Conversion Rates
-    st.markdown("**Affiliate Marketing Traffic Conversion Rates**")
-    am_cr_cols = st.columns(5)
-    with am_cr_cols[0]:
-        st.session_state.form_data['am_cr_y1'] = st.number_input("Year 1 (%)", 0.0, 100.0, 4.0, 0.5, key="am_cr_y1") / 100
-    with am_cr_cols[1]:
-        st.session_state.form_data['am_cr_y2'] = st.number_input("Year 2 (%)", 0.0, 100.0, 4.5, 0.5, key="am_cr_y2") / 100
-    with am_cr_cols[2]:
-        st.session_state.form_data['am_cr_y3'] = st.number_input("Year 3 (%)", 0.0, 100.0, 5.0, 0.5, key="am_cr_y3") / 100
-    with am_cr_cols[3]:
-        st.session_state.form_data['am_cr_y4'] = st.number_input("Year 4 (%)", 0.0, 100.0, 5.5, 0.5, key="am_cr_y4") / 100
-    with am_cr_cols[4]:
-        st.session_state.form_data['am_cr_y5'] = st.number_input("Year 5 (%)", 0.0, 100.0, 6.0, 0.5, key="am_cr_y5") / 100
+    st.write("First-month traffic of every acquisition channel, and the Customer Acquisition Cost (CAC) of each "
+             "new subscription from a paid channel. Channels with no traffic are left out of the model's charts.")
+    channel_grid = st.data_editor(
+        channel_frame(st.session_state.form_data),
+        use_container_width=True,
+        num_rows="fixed",
+        column_config={
+            TRAFFIC_LABEL: st.column_config.NumberColumn(min_value=0, step=1000, format="%d"),
+            CAC_LABEL: st.column_config.NumberColumn(min_value=0.0, step=0.5, format="$%.2f",
+                                                     help="Paid channels only; ignored for organic ones"),
+        },
+        key="channels"
+    )
+    try:
+        channel_values = channel_inputs(channel_grid)
+    except ValueError as e:
+        channel_values = None
+        st.error(f"Fix the channel grid before calculating. {e}")
+    else:
+        st.session_state.form_data.update(channel_values)
 
-    
+    # Rate schedules: one grid, channels as rows and years as columns
+    st.markdown("")
+    st.subheader("Monthly Traffic Growth and Conversion Rates by Year (%)")
+    st.write("Growth rates are monthly: a 1% monthly growth rate is approximately equivalent to 12% annual growth rate. "
+             "Conversion rates are the traffic-to-subscription trial rate.")
+    st.write("The grid has a column per year of the projection horizon (at least 5; change the horizon and press "
+             "Calculate Projections to add years). The last year's rates also apply to every year after it. "
+             "Paste a block of cells copied from a spreadsheet into the grid to fill it at once.")
+    schedule_years = st.session_state.form_data.get('horizon_years', MIN_YEARS)
+    schedule_grid = st.data_editor(
+        schedule_frame(st.session_state.form_data, schedule_years),
+        use_container_width=True,
+        num_rows="fixed",
+        column_config={
+            year_label(y): st.column_config.NumberColumn(min_value=0.0, max_value=MAX_RATE, step=0.01, format="%.2f")
+            for y in range(1, max(schedule_years, MIN_YEARS) + 1)
+        },
+        key="rate_schedules"
+    )
+    try:
+        schedule_values = schedule_inputs(schedule_grid)
+    except ValueError as e:
+        schedule_values = None
+        st.error(f"Fix the rate grid before calculating. {e}")
+    else:
+        for key in [key for key in st.session_state.form_data if SCHEDULE_KEY.fullmatch(key)]:
+            del st.session_state.form_data[key]
+        st.session_state.form_data.update(schedule_values)
 
     # Cost Assumptions Section
     st.markdown("")
@@ -163,13 +229,11 @@ with st.form("single_page_form", clear_on_submit=False):
     cost_col1, cost_col2 = st.columns(2)
     
     with cost_col1:
-        st.session_state.form_data['sem_cpa'] = st.number_input("SEM Customer Acquisition Cost - CAC ($)", min_value=0.0, value=20.0, step=0.5, format="%.2f")
-        st.session_state.form_data['affiliate_cpa'] = st.number_input("Affiliate Marketing Customer Acquisition Cost - CAC ($)", min_value=0.0, value=11.0, step=0.5, format="%.2f")
         st.session_state.form_data['ccp_rate'] = st.number_input("Credit Card Processing Cost (% of Revenue)", min_value=0.0, value=10.0, step=0.5, format="%.2f") / 100
         st.session_state.form_data['refund_rate'] = st.number_input("Refund Rate (% of Revenue)", min_value=0.0, value=5.0, step=0.5, format="%.2f") / 100
-        
-    with cost_col2:
         st.session_state.form_data['chb_rate'] = st.number_input("Chargeback Rate (% of Revenue)", min_value=0.0, value=0.5, step=0.5, format="%.2f") / 100
+
+    with cost_col2:
         st.session_state.form_data['monthly_web_hosting_cost'] = st.number_input("Monthly Web Hosting Cost ($)", min_value=0, value=300, step=50)
         st.session_state.form_data['monthly_techsoft_cost'] = st.number_input("Monthly Technology & Software Cost ($)", min_value=0, value=300, step=50)
         st.session_state.form_data['monthly_labor_cost'] = st.number_input("Monthly Labor Cost ($)", min_value=0, value=10000, step=1000)
@@ -203,69 +267,84 @@ with st.form("single_page_form", clear_on_submit=False):
      
            
     # Calculate button - FIXED VERSION
-    if st.form_submit_button("Calculate Projections"):
+    if (st.form_submit_button("Calculate Projections") and channel_values is not None and schedule_values is not None
+            and plan_values is not None):
         st.session_state.calculate = True
-        st.rerun()
+        st.session_state.pop("loaded_scenario", None)
+        rerun()
+timer.end("form")
 
 
 
+# Widgets inside a fragment rerun only their fragment (Streamlit 1.33+); on older versions they rerun the script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+
+
+@fragment
+def chart_section(figures, rollups, monte_carlo, calibration, form_data, df, n_months):
+    """Chart tabs: switching tabs, rollup levels or the cohort toggle redraws this section without the form or the model."""
+    # One chart tab at a time: only the open tab's figure is loaded and sent to the browser
+    chart_tabs = {
+        "Traffic": ("traffic", "Web/App Monthly Traffic"),
+        "Subscriptions": ("subscriptions", "Monthly Subscriptions"),
+        "MRR Split": ("mrr", "Monthly Recurring Revenue MRR Split"),
+        "Financials": ("financials", "Financial Performance (Annual Income Statement Output)"),
+        "Cash Flow": ("cashflow", "Cash Flow Accumulation Over The Years"),
+    }
+    chart_tab = st.radio("Chart", list(chart_tabs), horizontal=True, label_visibility="collapsed", key="chart_tab")
+    chart_name, chart_title = chart_tabs[chart_tab]
+    # The income statement at any level of the result's rollup cube; the fiscal year chart is prebuilt
+    level = "Fiscal Year"
+    if chart_name == "financials":
+        level = st.radio("Period", LEVELS, index=LEVELS.index("Fiscal Year"), horizontal=True, key="rollup_level")
+    if level == "Fiscal Year":
+        with timer.stage("figures_load"):
+            import plotly.io as pio
+            figure = pio.from_json(figures[chart_name])
+    else:
+        period = {"Month": "Monthly", "Quarter": "Quarterly", "TTM": "Trailing Twelve Months"}[level]
+        chart_title = f"Financial Performance ({period} Income Statement Output)"
+        with timer.stage(f"figure:financials:{level}"):
+            figure = financials_figure(rollups[level], xaxis_title="Month ending" if level == "TTM" else level)
+    # Monte Carlo bands are by calendar year
+    calendar_years = level == "Fiscal Year" and form_data.get('fiscal_start_month', 1) == 1
+    if monte_carlo is not None and calendar_years and chart_name == "financials":
+        add_financials_bands(figure, monte_carlo)
+    if monte_carlo is not None and calendar_years and chart_name == "cashflow":
+        add_cashflow_bands(figure, monte_carlo)
+    if calibration is not None:
+        add_calibration_overlay(figure, chart_name, calibration["fit"])
+
+    st.subheader(chart_title)
+    with timer.stage(f"chart:{chart_name}"):
+        st.plotly_chart(figure, use_container_width=True)
+    if chart_name == "financials" and st.toggle("Show table", key="rollup_table"):
+        st.dataframe(rollups[level], hide_index=True, use_container_width=True)
+
+    # Paying users by cohort, built only on request (months x months cells)
+    if chart_name == "subscriptions" and not has_plan_inputs(form_data) and st.toggle("Show paying users by cohort"):
+        with timer.stage("chart:cohorts"):
+            retention = retention_curves(scenario_arrays(form_data), n_months)[0]
+            cohorts = cohort_matrix(df["Trial To Paid Transactions Count"].to_numpy(), retention)
+            st.plotly_chart(cohort_figure(df["Month"], cohorts), use_container_width=True)
+
+
+# A loaded saved scenario stands in for the form's inputs until Calculate Projections is pressed again
+loaded_scenario = st.session_state.get("loaded_scenario")
+
 # Calculations and Results
-if st.session_state.calculate:
+if st.session_state.calculate or loaded_scenario is not None:
     # Extract all variables from session state
-    form_data = st.session_state.form_data
-    kick_off_date = form_data['kick_off_date']
+    form_data = loaded_scenario["form_data"] if loaded_scenario is not None else st.session_state.form_data
     subscription_price = form_data['subscription_price']
     free_trial_days = form_data['free_trial_days']
     trial_to_paid = form_data['trial_to_paid']
     churn_rate = form_data['churn_rate']
     sem_traffic_m1 = form_data['sem_traffic_m1']
-    seo_traffic_m1 = form_data['seo_traffic_m1']
     am_traffic_m1 = form_data['am_traffic_m1']
-    sem_traffic_gr_y1 = form_data['sem_traffic_gr_y1']
-    sem_traffic_gr_y2 = form_data['sem_traffic_gr_y2']
-    sem_traffic_gr_y3 = form_data['sem_traffic_gr_y3']
-    sem_traffic_gr_y4 = form_data['sem_traffic_gr_y4']
-    sem_traffic_gr_y5 = form_data['sem_traffic_gr_y5']
-    seo_traffic_gr_y1 = form_data['seo_traffic_gr_y1']
-    seo_traffic_gr_y2 = form_data['seo_traffic_gr_y2']
-    seo_traffic_gr_y3 = form_data['seo_traffic_gr_y3']
-    seo_traffic_gr_y4 = form_data['seo_traffic_gr_y4']
-    seo_traffic_gr_y5 = form_data['seo_traffic_gr_y5']
-    am_traffic_gr_y1 = form_data['am_traffic_gr_y1']
-    am_traffic_gr_y2 = form_data['am_traffic_gr_y2']
-    am_traffic_gr_y3 = form_data['am_traffic_gr_y3']
-    am_traffic_gr_y4 = form_data['am_traffic_gr_y4']
-    am_traffic_gr_y5 = form_data['am_traffic_gr_y5']
-    sem_cr_y1 = form_data['sem_cr_y1']
-    sem_cr_y2 = form_data['sem_cr_y2']
-    sem_cr_y3 = form_data['sem_cr_y3']
-    sem_cr_y4 = form_data['sem_cr_y4']
-    sem_cr_y5 = form_data['sem_cr_y5']
-    seo_cr_y1 = form_data['seo_cr_y1']
-    seo_cr_y2 = form_data['seo_cr_y2']
-    seo_cr_y3 = form_data['seo_cr_y3']
-    seo_cr_y4 = form_data['seo_cr_y4']
-    seo_cr_y5 = form_data['seo_cr_y5']
-    am_cr_y1 = form_data['am_cr_y1']
-    am_cr_y2 = form_data['am_cr_y2']
-    am_cr_y3 = form_data['am_cr_y3']
-    am_cr_y4 = form_data['am_cr_y4']
-    am_cr_y5 = form_data['am_cr_y5']
     sem_cpa = form_data['sem_cpa']
     affiliate_cpa = form_data['affiliate_cpa']
-    ccp_rate = form_data['ccp_rate']
-    refund_rate = form_data['refund_rate']
-    chb_rate = form_data['chb_rate']
-    monthly_web_hosting_cost = form_data['monthly_web_hosting_cost']
-    monthly_techsoft_cost = form_data['monthly_techsoft_cost']
-    monthly_labor_cost = form_data['monthly_labor_cost']
-    views_per_visit=0.000000001 if form_data['views per visit'] == 0 else form_data['views per visit']
-    cpm=0 if form_data['views per visit'] == 0 else form_data['cpm']
-    
-    
-    am_ctr=form_data['am_ctr']
-    am_cpa=form_data['am_cpa']
-    am_ocr=form_data['am_ocr']
+    n_months = 12 * form_data['horizon_years']
     renewal_rate = 1 - churn_rate
     LTV = (subscription_price * trial_to_paid) / (1 - renewal_rate)
     sem_roi=LTV-sem_cpa 
@@ -280,458 +359,70 @@ if st.session_state.calculate:
     else: 
         affiliate_marketing_roi_percent = affiliate_marketing_roi/affiliate_cpa
 
-    # First, let's create a function to determine the growth rate based on the month index
-    def get_sem_growth_rate(month_idx):
-        if month_idx <= 11:  # Year 1
-            return 1 + sem_traffic_gr_y1 if sem_traffic_gr_y1 != 0 else 1
-        elif month_idx <= 23:  # Year 2
-            return 1 + sem_traffic_gr_y2 if sem_traffic_gr_y2 != 0 else 1
-        elif month_idx <= 35:  # Year 3
-            return 1 + sem_traffic_gr_y3 if sem_traffic_gr_y3 != 0 else 1
-        elif month_idx <= 47:  # Year 4
-            return 1 + sem_traffic_gr_y4 if sem_traffic_gr_y4 != 0 else 1
-        else:  # Year 5
-            return 1 + sem_traffic_gr_y5 if sem_traffic_gr_y5 != 0 else 1
-
-    def get_sem_cr(month_idx):
-        if month_idx <= 11:    # Year 1
-            return sem_cr_y1 
-        elif month_idx <= 23:  # Year 2
-            return sem_cr_y2
-        elif month_idx <= 35:  # Year 3
-            return sem_cr_y3
-        elif month_idx <= 47:  # Year 4
-            return sem_cr_y4
-        else:                  # Year 5
-            return sem_cr_y5  
-
-    def get_seo_growth_rate(month_idx):
-        if month_idx <= 11:  # Year 1
-            return 1 + seo_traffic_gr_y1
-        elif month_idx <= 23:  # Year 2
-            return 1 + seo_traffic_gr_y2
-        elif month_idx <= 35:  # Year 3
-            return 1 + seo_traffic_gr_y3
-        elif month_idx <= 47:  # Year 4
-            return 1 + seo_traffic_gr_y4
-        else:  # Year 5
-            return 1 + seo_traffic_gr_y5
-
-    def get_seo_cr(month_idx):
-        if month_idx <= 11:    # Year 1
-            return seo_cr_y1
-        elif month_idx <= 23:  # Year 2
-            return seo_cr_y2
-        elif month_idx <= 35:  # Year 3
-            return seo_cr_y3
-        elif month_idx <= 47:  # Year 4
-            return seo_cr_y4
-        else:                  # Year 5
-            return seo_cr_y5      
-
-    def get_am_growth_rate(month_idx):
-        if month_idx <= 11:  # Year 1
-            return 1 + am_traffic_gr_y1
-        elif month_idx <= 23:  # Year 2
-            return 1 + am_traffic_gr_y2
-        elif month_idx <= 35:  # Year 3
-            return 1 + am_traffic_gr_y3
-        elif month_idx <= 47:  # Year 4
-            return 1 + am_traffic_gr_y4
-        else:  # Year 5
-            return 1 + am_traffic_gr_y5
-
-    def get_am_cr(month_idx):
-        if month_idx <= 11:    # Year 1
-            return am_cr_y1
-        elif month_idx <= 23:  # Year 2
-            return am_cr_y2
-        elif month_idx <= 35:  # Year 3
-            return am_cr_y3
-        elif month_idx <= 47:  # Year 4
-            return am_cr_y4
-        else:                  # Year 5
-            return am_cr_y5
-            
-
-
-    # Recurring revenue and financials dataframe
-    months = [kick_off_date + relativedelta(months=i) for i in range(60)]
-    # Create DataFrame
-    df = pd.DataFrame({
-        "Month": [kick_off_date + relativedelta(months=i) for i in range(60)],
-        "Year": [month.year for month in months],  # Extract year from each date
-        "Days Count": [calendar.monthrange(month.year, month.month)[1] for month in months],
-    })
-    df["Cross-Over Month Trial-To-Paid"] = free_trial_days / df["Days Count"]
-    df["Trial-To-Paid Within Month"] = 1 - df["Cross-Over Month Trial-To-Paid"]
-    
-    df["SEM - Paid Traffic"] = 0.0
-    df.at[0, "SEM - Paid Traffic"] = sem_traffic_m1  # Set first month value
-
-    # Calculate subsequent months
-    for i in range(1, 60):
-        sem_growth_rate = get_sem_growth_rate(i)
-        df.at[i, "SEM - Paid Traffic"] = df.at[i-1, "SEM - Paid Traffic"] * sem_growth_rate
-
-    df["SEO - Organic Traffic"] = 0.0
-    df.at[0, "SEO - Organic Traffic"] = seo_traffic_m1  # Set first month value
-
-    # Calculate subsequent months
-    for i in range(1, 60):
-        seo_growth_rate = get_seo_growth_rate(i)
-        df.at[i, "SEO - Organic Traffic"] = df.at[i-1, "SEO - Organic Traffic"] * seo_growth_rate
 
-    df["AM - Paid Traffic"] = 0.0
-    df.at[0, "AM - Paid Traffic"] = am_traffic_m1  # Set first month value
-
-    # Calculate subsequent months
-    for i in range(1, 60):
-        am_growth_rate = get_am_growth_rate(i)
-        df.at[i, "AM - Paid Traffic"] = df.at[i-1, "AM - Paid Traffic"] * am_growth_rate
-        
-    df["SEM Subscriptions"] = df["SEM - Paid Traffic"] * df.index.map(get_sem_cr)
-    df["SEO Subscriptions"] = df["SEO - Organic Traffic"] * df.index.map(get_seo_cr)
-    df["AM Subscriptions"] = df["AM - Paid Traffic"] * df.index.map(get_am_cr)
-    df["Total Monthly Subscriptions"] = df["SEM Subscriptions"] + df["SEO Subscriptions"] + df["AM Subscriptions"]
-    df["Website Views"]= (df["SEM - Paid Traffic"]+df["SEO - Organic Traffic"]+df["AM - Paid Traffic"])*views_per_visit
-
-    # Initialize the new column
-    df["Trial To Paid Transactions Count"] = 0.0
-
-    # First row calculation
-    df.at[0, "Trial To Paid Transactions Count"] = (
-        df.at[0, "Total Monthly Subscriptions"] * 
-        df.at[0, "Trial-To-Paid Within Month"] * 
-        trial_to_paid
-    )
-
-    # Subsequent rows calculation
-    for i in range(1, len(df)):
-        df.at[i, "Trial To Paid Transactions Count"] = (
-            (df.at[i, "Total Monthly Subscriptions"] * df.at[i, "Trial-To-Paid Within Month"] * trial_to_paid) +
-            (df.at[i-1, "Total Monthly Subscriptions"] * df.at[i-1, "Cross-Over Month Trial-To-Paid"] * trial_to_paid)
-        )
-
-    df["Monthly Renewal Transactions Count"] = 0.0
-    for i in range(1, len(df)):
-        prev_ttp = df.loc[i - 1, "Trial To Paid Transactions Count"]
-        renewal_prev = df.loc[i - 1, "Monthly Renewal Transactions Count"]
-        df.loc[i, "Monthly Renewal Transactions Count"] = (prev_ttp + renewal_prev) * (1 - churn_rate)  
-
-    df['New Monthly Recurring Revenue MRR'] = df["Trial To Paid Transactions Count"] * subscription_price
-    df['Renewal Recurring Revenue MRR'] = df["Monthly Renewal Transactions Count"] * subscription_price
-    df["Ad Network Revenue"]=(df["Website Views"]*(cpm/1000)) if views_per_visit > 0 else 0
-    df['Ad Affiliate Revenue']=df["Website Views"]*am_ctr*am_ocr*am_cpa/views_per_visit
-    df['Revenue'] = df['Renewal Recurring Revenue MRR'] + df['New Monthly Recurring Revenue MRR'] +df["Ad Network Revenue"]+df['Ad Affiliate Revenue']
-    df['Chargebacks'] = df['Revenue'] * chb_rate
-    df['Refunds'] = df['Revenue'] * refund_rate
-    df['Income'] = df['Revenue'] - df['Refunds'] - df['Chargebacks']
-    df['Credit Card Processing'] = df['Revenue'] * ccp_rate
-    df['Web Hosting'] = monthly_web_hosting_cost
-    df['Cost of Goods/Services Sold'] = df['Credit Card Processing'] + df['Web Hosting']
-    df['Gross Income'] = df['Income'] - df['Cost of Goods/Services Sold']
-    df['Labor Cost'] = monthly_labor_cost
-    df['SEM Marketing'] = df["SEM Subscriptions"] * sem_cpa
-    df['Affiliate Marketing'] = df["AM Subscriptions"] * affiliate_cpa
-    df['Internet Marketing Cost'] = df['Affiliate Marketing'] + df['SEM Marketing']
-    df['Technology & Software'] = monthly_techsoft_cost
-    df['Earnings Before Taxes'] = df['Gross Income'] - df['Labor Cost'] - df['Internet Marketing Cost'] - df['Technology & Software']
-    df['Cash Flow Accumulation'] = df['Earnings Before Taxes']  # Initialize with first month's value
-
-    for i in range(1, len(df)):
-        prev_cf = df.loc[i - 1, 'Cash Flow Accumulation']
-        current_earnings = df.loc[i, 'Earnings Before Taxes']
-        df.loc[i, 'Cash Flow Accumulation'] = prev_cf + current_earnings
-
-    df["Internet Marketing CAC Weighted average"] = ((df["SEM Subscriptions"] * sem_cpa) + (df["AM Subscriptions"] * affiliate_cpa)) / (df["SEM Subscriptions"] + df["AM Subscriptions"])
-
-    # dataframe for cac payback period
-    first_value = subscription_price * trial_to_paid
-    ltv_threshold = LTV * 0.999  # 99% of LTV
-
-    # Initialize list with the first period value
-    period_values = [first_value]
-
-    # Generate values until the cumulative sum reaches 99% of LTV
-    while sum(period_values) < ltv_threshold:
-        next_value = period_values[-1] * renewal_rate
-        period_values.append(next_value)
-
-    cumulative_ltv = pd.DataFrame({"Period Value": period_values})
-    cumulative_ltv["Accumulated Value"] = cumulative_ltv["Period Value"].cumsum()
-    start_month = free_trial_days / 30
-    months = [start_month + i for i in range(len(cumulative_ltv))]
-    cumulative_ltv["Months"] = months
-    
-    if LTV < sem_cpa: 
-        time_to_recover_sem_cac = 100000
-    else: 
-        match_row = cumulative_ltv[cumulative_ltv["Accumulated Value"] >= sem_cpa].head(1)
-        if not match_row.empty:
-            time_to_recover_sem_cac = match_row["Months"].values[0]
-        else:
-            time_to_recover_sem_cac = "No Pay Back"
-        
-    if LTV < affiliate_cpa:
-        time_to_recover_affiliate_cac = 100000
+    # Model results are shared across sessions and keyed on the inputs, so reruns
+    # with unchanged form_data cost a lookup instead of a model run
+    if loaded_scenario is not None:
+        # Saved scenarios carry their results, so nothing is recomputed
+        result = loaded_scenario["result"]
     else:
-        match_row = cumulative_ltv[cumulative_ltv["Accumulated Value"] >= affiliate_cpa].head(1)
-        if not match_row.empty:
-            time_to_recover_affiliate_cac = match_row["Months"].values[0]
-        else:
-            time_to_recover_affiliate_cac = "No Pay Back"
-    
-    def lookup_payback_period(cac_value):
-        if LTV < cac_value:
-            return "No Pay Back"
-        match_row = cumulative_ltv[cumulative_ltv["Accumulated Value"] >= cac_value].head(1)
-        if not match_row.empty:
-            return match_row["Months"].values[0]
-        else:
-            return "No Pay Back"
-
-
-
-    df["time_to_recover_Internet_marketing_cac"] = df["Internet Marketing CAC Weighted average"].apply(lookup_payback_period)
-
-    # Financials dataframe consolidation
-    df_financials = df[[
-        'Month',
-        'Year',
-        'Revenue',
-        'Chargebacks',
-        'Refunds',
-        'Income',
-        'Credit Card Processing',
-        'Web Hosting',
-        'Cost of Goods/Services Sold',
-        'Gross Income',
-        'Labor Cost',
-        'SEM Marketing',
-        'Affiliate Marketing',
-        'Internet Marketing Cost',
-        'Technology & Software',
-        'Earnings Before Taxes',
-        'Cash Flow Accumulation'
-    ]]
-    df_financials_by_year = df_financials.groupby("Year", as_index=False).sum(numeric_only=True)
+        cache_key = canonical_key(form_data)
+        if cache_key == startup.DEFAULT_KEY:
+            # The default inputs are being loaded or built at boot; waiting beats building them twice
+            startup.wait()
+        result = RESULT_CACHE.get(cache_key)
+        if result is None:
+            # Other workers (or this dyno before a restart) may have stored it on disk
+            with timer.stage("disk_cache"):
+                result = DISK_CACHE.get(cache_key)
+            if result is None:
+                # Runs go to the shared worker pool; only what depends on inputs changed since this
+                # session's last result is recomputed. Pressing Calculate again with new inputs
+                # cancels a run still waiting here.
+                try:
+                    ticket = PROJECTION_POOL.submit(session_id, cache_key, build_in_worker, dict(form_data),
+                                                    st.session_state.get("last_result"), timer.enabled)
+                except PoolBusy:
+                    st.warning("⏳ The server is busy with other projections. Please press Calculate Projections "
+                               "again in a moment.")
+                    stop()
+                with timer.stage("pool_wait"):
+                    queue_status = st.empty()
+                    shown_position = None
+                    while not ticket.done():
+                        # Only a changed position is sent to the browser, not one message per poll
+                        position = PROJECTION_POOL.position(ticket)
+                        if position and position != shown_position:
+                            queue_status.info(f"⏳ Busy, queued #{position}")
+                        shown_position = position
+                        time.sleep(0.02)
+                    queue_status.empty()
+                result, worker_stages = ticket.result()
+                timer.merge(worker_stages)
+                with timer.stage("disk_cache"):
+                    DISK_CACHE.put(cache_key, result)
+            RESULT_CACHE.put(cache_key, result)
+    st.session_state.last_result = (dict(form_data), result)
+
+    df = result["df"]
+    time_to_recover_sem_cac = result["time_to_recover_sem_cac"]
+    time_to_recover_affiliate_cac = result["time_to_recover_affiliate_cac"]
+    # Monte Carlo bands only apply to the inputs they were simulated from
+    monte_carlo = st.session_state.get("monte_carlo")
+    if monte_carlo is not None and monte_carlo["form_data"] != form_data:
+        monte_carlo = None
+    # So do calibrations: their actuals and fitted lines overlay the monthly charts
+    calibration = st.session_state.get("calibration")
+    if calibration is not None and calibration["form_data"] != form_data:
+        calibration = None
 
     # Show charts
     st.title("📈 Financial Projections Results")
+    if loaded_scenario is not None:
+        st.info(f"Showing saved scenario '{loaded_scenario['name']}'. "
+                "Press Calculate Projections to go back to the form's inputs.")
 
-    # Traffic Sources Chart
-    st.subheader("Web/App Monthly Traffic")
-    df_traffic = df[[
-        'Month',
-        'SEM - Paid Traffic',
-        'SEO - Organic Traffic',
-        'AM - Paid Traffic'
-    ]]
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df_traffic["Month"],
-        y=df_traffic["SEM - Paid Traffic"],
-        mode='lines',
-        name='Paid(SEM)<br>Traffic',
-        line=dict(color='#1f77b4', width=2),
-        hovertemplate='SEM: %{y:,.0f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_traffic["Month"],
-        y=df_traffic["SEO - Organic Traffic"],
-        mode='lines',
-        name='Organic(SEO)<br>Traffic',
-        line=dict(color='#ff7f0e', width=2),
-        hovertemplate='SEO: %{y:,.0f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_traffic["Month"],
-        y=df_traffic["AM - Paid Traffic"],
-        mode='lines',
-        name='Affiliate<br>Marketing',
-        line=dict(color='#2ca02c', width=2),
-        hovertemplate='Affiliate: %{y:,.0f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        xaxis_title="Month",
-        yaxis_title="Traffic Volume",
-        xaxis=dict(
-            type='date',
-            tickformat='%b-%Y', 
-            tickmode='auto',
-            nticks=30,
-            tickangle=-45  # Optional: rotates labels for better readability
-        ),
-        yaxis=dict(tickformat=","),
-        hovermode="x unified",
-        legend=dict(title="Traffic Source"),
-        plot_bgcolor="white",
-        yaxis_gridcolor="lightgray",
-        margin=dict(t=25)
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)    
-
-    # Monthly Subscriptions
-    st.subheader("Monthly Subscriptions")
-    df_subscriptions = df[[
-        'Month',
-        'Total Monthly Subscriptions',
-        'Trial To Paid Transactions Count'
-    ]]
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df_subscriptions["Month"],
-        y=df_subscriptions["Total Monthly Subscriptions"],
-        mode='lines',
-        name='New Monthly<br>Subscriptions',
-        line=dict(color='#4E79A7', width=2),
-        hovertemplate='Total Subs: %{y:,.0f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_subscriptions["Month"],
-        y=df_subscriptions["Trial To Paid Transactions Count"],
-        mode='lines',
-        name='Trial To Paid<br>New Users',
-        line=dict(color='#F28E2B', width=2),
-        hovertemplate='Trial To Paid: %{y:,.0f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        xaxis_title="Month",
-        yaxis_title="Count",
-        xaxis=dict(
-            type='date',
-            tickformat='%b-%Y',
-            tickmode='auto',
-            nticks=30,
-            tickangle=-45
-        ),
-        yaxis=dict(tickformat=","),
-        hovermode="x unified",
-        legend=dict(title="Subscription Type"),
-        plot_bgcolor="white",
-        yaxis_gridcolor="lightgray",
-        margin=dict(t=25)
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Revenue split chart
-    st.subheader("Monthly Recurring Revenue MRR Split")
-    df_rev_split = df[[
-        'Month',
-        'New Monthly Recurring Revenue MRR',
-        'Renewal Recurring Revenue MRR' ,
-        'Ad Network Revenue',
-        'Ad Affiliate Revenue'
-    ]]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df_rev_split["Month"],
-        y=df_rev_split["New Monthly Recurring Revenue MRR"],
-        mode='lines',
-        name='Trial To Paid<br>(New Users)',
-        stackgroup='one',
-        hovertemplate='Trial To Paid: $%{y:,.2f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_rev_split["Month"],
-        y=df_rev_split["Renewal Recurring Revenue MRR"],
-        mode='lines',
-        name='Recurring<br>Renewals',
-        stackgroup='one',
-        hovertemplate='Recurring Renewal: $%{y:,.2f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_rev_split["Month"],
-        y=df_rev_split["Ad Network Revenue"],
-        mode='lines',
-        name='Ad Network',
-        stackgroup='one',
-        hovertemplate='Ad Network: $%{y:,.2f}<extra></extra>'
-    ))
-    fig.add_trace(go.Scatter(
-        x=df_rev_split["Month"],
-        y=df_rev_split["Ad Affiliate Revenue"],
-        mode='lines',
-        name='Ad Affiliate<br>Marketing',
-        stackgroup='one',
-        hovertemplate='Ad Affiliate: $%{y:,.2f}<extra></extra>'
-    ))
-    fig.update_layout(
-        xaxis_title="Month",
-        yaxis_title="MRR",
-        xaxis=dict(
-            type='date',
-            tickformat='%b-%Y',
-            tickmode='auto',
-            nticks=30,
-            tickangle=-45,
-            dtick='M2'# Optional: rotates labels for better readability
-        ),
-        yaxis=dict(tickformat="$,.2f"),
-        margin=dict(t=25)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Financial performance by year chart
-    st.subheader("Financial Performance (Annual Income Statement Output)")
-    
-    fig = go.Figure()
-    colors = ['#006400','#2E8B57','#3CB371','#90EE90']
-    fig.add_trace(go.Scatter(x=df_financials_by_year["Year"], y=df_financials_by_year["Revenue"],
-                             mode='lines+markers', name='Revenue',line=dict(color=colors[0], width=3),hovertemplate='$%{y:,.2f}<extra></extra>'))
-    fig.add_trace(go.Scatter(x=df_financials_by_year["Year"], y=df_financials_by_year["Income"],
-                             mode='lines+markers', name='Income',line=dict(color=colors[1], width=3),hovertemplate='$%{y:,.2f}<extra></extra>'))
-    fig.add_trace(go.Scatter(x=df_financials_by_year["Year"], y=df_financials_by_year["Gross Income"],
-                             mode='lines+markers', name='Gross<br>Income',line=dict(color=colors[2], width=3),hovertemplate='$%{y:,.2f}<extra></extra>'))
-    fig.add_trace(go.Scatter(x=df_financials_by_year["Year"], y=df_financials_by_year["Earnings Before Taxes"],
-                             mode='lines+markers', name='Earnings<br>EBITDA',line=dict(color=colors[3], width=3),hovertemplate='$%{y:,.2f}<extra></extra>'))
-    fig.update_layout(
-        xaxis_title="Year",
-        yaxis_title="Amount ($)",
-        plot_bgcolor="white",
-        hovermode="x unified",
-        legend=dict(title=""),
-        yaxis=dict(gridcolor="lightgray"),
-        margin=dict(t=25)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Cashflow accumulation chart
-    st.subheader("Cash Flow Accumulation Over The Years")
-    df_cashflow = df_financials.groupby("Year", as_index=False)["Earnings Before Taxes"].sum()
-    df_cashflow["Cash Flow Accumulation"] = df_cashflow["Earnings Before Taxes"].cumsum()
-    fig = px.bar(
-        df_cashflow,
-        x="Year",
-        y="Cash Flow Accumulation",
-        labels={"Cash Flow Accumulation": "Cash Flow Accumulation ($)"},
-        text_auto='.2f',
-        color_discrete_sequence=["skyblue"]
-    )
-    fig.update_traces(
-        hovertemplate='$%{y:,.2f}<extra></extra>',
-        texttemplate='$%{y:,.2f}',
-        textposition='outside',
-        textfont_color='darkgray'
-    )
-    fig.update_layout(
-        xaxis_title="Year",
-        yaxis_title="Cash Flow Accumulation",
-        bargap=0.3,
-        plot_bgcolor="white",
-        yaxis_gridcolor="lightgray",
-        margin=dict(t=30)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-
+    chart_section(result["figures"], result["rollups"], monte_carlo, calibration, form_data, df, n_months)
 
     # Key Metrics Summary Table - ADDED AT THE END
     st.subheader("Key Metrics Summary")
@@ -757,11 +448,12 @@ if st.session_state.calculate:
             f"${affiliate_cpa:,.2f}",
             f"${affiliate_marketing_roi:,.2f}" if affiliate_marketing_roi_percent is not None else "N/A. You input Affiliate Marketing CAC = 0.00",
             f"{affiliate_marketing_roi_percent:.2%}" if affiliate_marketing_roi_percent is not None else "N/A. You input Affiliate Marketing CAC = 0.00",
-            "N/A. You input SEM CAC = 0.00" if sem_roi_percent is None else "Immediately" if time_to_recover_sem_cac == 0.0 else "Not Profitable" if time_to_recover_sem_cac>1200 else f"{time_to_recover_sem_cac:,.2f}",
-            "N/A. You input Affiliate Marketing CAC = 0.00" if affiliate_marketing_roi_percent is None else "Immediately" if time_to_recover_affiliate_cac == 0.0 else "Not Profitable" if time_to_recover_affiliate_cac>1200 else f"{time_to_recover_affiliate_cac:,.2f}"
+            "N/A. You input SEM CAC = 0.00" if sem_roi_percent is None else payback_label(time_to_recover_sem_cac),
+            "N/A. You input Affiliate Marketing CAC = 0.00" if affiliate_marketing_roi_percent is None else payback_label(time_to_recover_affiliate_cac)
         ]
     }
     metrics_df = pd.DataFrame(metrics_data)
+    st.session_state.last_metrics = metrics_df
     st.dataframe(
         metrics_df,
         column_config={
@@ -792,3 +484,356 @@ if st.session_state.calculate:
                   f"exceeds Customer LTV (${LTV:,.2f}). You'll **lose money on every customer acquired through SEM channel**.")
         # Still allow calculations, but warn the user
 
+    # Monte Carlo simulation
+    st.subheader("Monte Carlo Simulation")
+    with st.expander("Simulate uncertain inputs", expanded=monte_carlo is not None):
+        st.write("Give any input a distribution instead of a point estimate. Values use the model's units "
+                 "(rates as fractions, e.g. 0.25 = 25%). Normal: Param 1 = mean, Param 2 = standard deviation. "
+                 "Triangular: low, mode, high. Uniform: low, high. Bootstrap: samples the input's column of the uploaded CSV.")
+        uncertain = [key for key in INPUT_KEYS if key == "churn_rate" or key == "trial_to_paid" or "_cr_y" in key]
+        mc_inputs = pd.DataFrame({
+            "Input": [key for key in INPUT_KEYS if key != "kick_off_date"],
+        })
+        mc_inputs["Distribution"] = ["triangular" if key in uncertain else "fixed" for key in mc_inputs["Input"]]
+        # Through scenario_arrays(), so a loaded scenario saved before a channel existed gets its defaults
+        mc_values = {key: float(values[0]) for key, values in scenario_arrays(form_data).items() if key != "kick_off_date"}
+        mc_inputs["Param 1"] = [mc_values[key] * 0.8 for key in mc_inputs["Input"]]
+        mc_inputs["Param 2"] = [mc_values[key] for key in mc_inputs["Input"]]
+        mc_inputs["Param 3"] = [mc_values[key] * 1.2 for key in mc_inputs["Input"]]
+        with st.form("monte_carlo_form"):
+            mc_table = st.data_editor(
+                mc_inputs,
+                column_config={
+                    "Input": st.column_config.TextColumn("Input", disabled=True),
+                    "Distribution": st.column_config.SelectboxColumn("Distribution", options=["fixed", *DISTRIBUTIONS], required=True),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+            mc_csv = st.file_uploader("Observed input values for bootstrap (CSV, one column per input)", type="csv")
+            mc_draws = st.number_input("Number of draws", min_value=1000, max_value=200000, value=20000, step=5000)
+            run_monte_carlo = st.form_submit_button("Run Simulation")
+
+        if run_monte_carlo:
+            observed = bootstrap_specs(mc_csv) if mc_csv is not None else {}
+            distributions = {}
+            for row in mc_table.itertuples(index=False):
+                if row.Distribution == "normal":
+                    distributions[row.Input] = {"kind": "normal", "mean": row[2], "sd": row[3]}
+                elif row.Distribution == "triangular":
+                    distributions[row.Input] = {"kind": "triangular", "low": row[2], "mode": row[3], "high": row[4]}
+                elif row.Distribution == "uniform":
+                    distributions[row.Input] = {"kind": "uniform", "low": row[2], "high": row[3]}
+                elif row.Distribution == "bootstrap":
+                    if row.Input not in observed:
+                        st.error(f"Bootstrap for '{row.Input}' needs a CSV with a '{row.Input}' column.")
+                        stop()
+                    distributions[row.Input] = observed[row.Input]
+            bar = st.progress(0.0, text="Running simulation...")
+            try:
+                st.session_state.monte_carlo = simulate(
+                    form_data,
+                    distributions,
+                    n_draws=int(mc_draws),
+                    n_months=n_months,
+                    pool=PROJECTION_POOL,
+                    session_id=session_id,
+                    progress=lambda done, total: bar.progress(done / total, text=f"Simulated {done:,} of {total:,} draws")
+                )
+            except ValueError as e:
+                st.error(str(e))
+                stop()
+            except PoolBusy:
+                st.warning("⏳ The server is busy with other projections. Please press Run Simulation again in a moment.")
+                stop()
+            rerun()
+
+        if monte_carlo is not None:
+            st.write(f"Bands above show P5/P50/P95 over {monte_carlo['n_draws']:,} simulated draws.")
+            import plotly.graph_objects as go
+            fig = go.Figure()
+            fig.add_trace(monthly_trace(
+                x=monte_carlo["months"],
+                y=monte_carlo["break_even"],
+                mode='lines',
+                name='Break-even probability',
+                line=dict(color='#4E79A7', width=2),
+                hovertemplate='%{y:.1%}<extra></extra>'
+            ))
+            fig.update_layout(
+                title="Probability of Break-Even (Cash Flow Accumulation >= 0) by Month",
+                xaxis_title="Month",
+                yaxis_title="Probability",
+                xaxis=dict(type='date', tickformat='%b-%Y', tickangle=-45),
+                yaxis=dict(tickformat=".0%", range=[0, 1]),
+                plot_bgcolor="white",
+                yaxis_gridcolor="lightgray",
+                margin=dict(t=40)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Goal seek
+    st.subheader("Goal Seek")
+    goal_seek = st.session_state.get("goal_seek")
+    if goal_seek is not None and goal_seek["form_data"] != form_data:
+        goal_seek = None
+    with st.expander("Find the input value that hits a target", expanded=goal_seek is not None):
+        st.write("Each row searches one input between Low and High for the value that makes the target equal "
+                 "the Goal, with all other inputs as submitted above. N is the year or month for targets that "
+                 "need one; year N is the Nth fiscal year of the Financials chart. Inputs use the model's units "
+                 "(rates as fractions, e.g. 0.25 = 25%).")
+        solver_inputs = [key for key in INPUT_KEYS if key != "kick_off_date"]
+        goal_seek_rows = pd.DataFrame({
+            "Input": ["sem_cpa", "seo_traffic_m1"],
+            "Target": ["SEM ROI ($)", "Cash Flow Accumulation at month N"],
+            "N": [1, min(24, n_months)],
+            "Goal": [0.0, 0.0],
+            "Low": [0.0, 0.0],
+            "High": [500.0, 1000000.0],
+        })
+        with st.form("goal_seek_form"):
+            goal_seek_table = st.data_editor(
+                goal_seek_rows,
+                column_config={
+                    "Input": st.column_config.SelectboxColumn("Input", options=solver_inputs, required=True),
+                    "Target": st.column_config.SelectboxColumn("Target", options=list(PRESET_TARGETS), required=True),
+                    "N": st.column_config.NumberColumn("N", min_value=1, step=1),
+                },
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True
+            )
+            run_goal_seek = st.form_submit_button("Solve")
+
+        if run_goal_seek:
+            problems = [
+                {"input": row.Input, "target": preset_target(row.Target, row.N), "goal": row.Goal,
+                 "low": row.Low, "high": row.High}
+                for row in goal_seek_table.dropna().itertuples(index=False)
+            ]
+            try:
+                solutions = solve(form_data, problems)
+            except ValueError as e:
+                st.error(str(e))
+                stop()
+            st.session_state.goal_seek = {"form_data": dict(form_data), "problems": problems, "solutions": solutions}
+            rerun()
+
+        if goal_seek is not None:
+            st.dataframe(
+                pd.DataFrame({
+                    "Input": [problem["input"] for problem in goal_seek["problems"]],
+                    "Target": [target_label(problem["target"]) for problem in goal_seek["problems"]],
+                    "Goal": [problem["goal"] for problem in goal_seek["problems"]],
+                    "Solution": [solution["value"] for solution in goal_seek["solutions"]],
+                    "Achieved": [solution["achieved"] for solution in goal_seek["solutions"]],
+                    "Status": [solution["status"] for solution in goal_seek["solutions"]],
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+
+    # Calibration to actuals
+    st.subheader("Calibrate to Actuals")
+    with st.expander("Fit inputs to monthly actuals", expanded=calibration is not None):
+        st.write("Upload a CSV with a `month` column and any of these monthly series: "
+                 f"{', '.join(f'`{name}`' for name in SERIES)}. The chosen inputs are fitted by least squares, "
+                 "starting from the values submitted above; yearly rates are fitted for the years the actuals "
+                 "cover, for channels with traffic. Fitted and actual values are overlaid on the Traffic, "
+                 "Subscriptions and MRR Split charts.")
+        with st.form("calibration_form"):
+            actuals_csv = st.file_uploader("Monthly actuals (CSV)", type="csv")
+            calibration_groups = st.multiselect("Inputs to fit", list(PARAMETER_GROUPS), default=list(PARAMETER_GROUPS))
+            calibration_starts = st.number_input("Starting points", min_value=1, max_value=64, value=8, step=1)
+            run_calibration = st.form_submit_button("Calibrate")
+
+        if run_calibration:
+            if actuals_csv is None:
+                st.error("Upload a CSV of monthly actuals to calibrate to.")
+                stop()
+            bar = st.progress(0.0, text="Calibrating...")
+            try:
+                actuals = read_actuals(actuals_csv)
+                parameters = default_parameters(form_data, actuals, [PARAMETER_GROUPS[g] for g in calibration_groups])
+                fit = calibrate(form_data, actuals, parameters, n_starts=int(calibration_starts),
+                                progress=lambda done, total: bar.progress(done / total, text=f"Iteration {done}"))
+            except ValueError as e:
+                st.error(str(e))
+                stop()
+            st.session_state.calibration = {"form_data": dict(form_data), "fit": fit}
+            rerun()
+
+        if calibration is not None:
+            fit = calibration["fit"]
+            st.write(f"{fit['status'].capitalize()} after {fit['iterations']} iterations: {fit['evaluations']:,} "
+                     f"model runs on {fit['n_observations']:,} observations in {fit['seconds']:.1f} s. Inputs the "
+                     "actuals don't move are marked not identified; a wide interval means the actuals can't pin "
+                     "the input down on its own.")
+            st.dataframe(
+                pd.DataFrame({
+                    "Input": fit["parameters"],
+                    "Submitted": fit["initial"],
+                    "Fitted": fit["value"],
+                    "Std Error": fit["std_error"],
+                    "95% Low": fit["low"],
+                    "95% High": fit["high"],
+                    "Identified": fit["identified"],
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.dataframe(
+                pd.DataFrame({
+                    "Series": [SERIES[name]["label"] for name in fit["rmse"]],
+                    "Relative RMSE": [f"{value:.1%}" for value in fit["rmse"].values()],
+                }),
+                hide_index=True
+            )
+            st.download_button("Download fitted inputs (scenario CSV)",
+                               pd.DataFrame([fit["form_data"]]).to_csv(index=False),
+                               file_name="calibrated_scenario.csv", mime="text/csv")
+
+
+# Saved scenarios: save the current result, load one back, or overlay several
+st.subheader("Saved Scenarios")
+with st.expander("Save, load and compare scenarios"):
+    if "last_result" in st.session_state:
+        with st.form("save_scenario_form"):
+            save_cols = st.columns(3)
+            with save_cols[0]:
+                scenario_name = st.text_input("Scenario Name")
+            with save_cols[1]:
+                scenario_owner = st.text_input("Owner")
+            with save_cols[2]:
+                scenario_tags = st.text_input("Tags (comma separated)")
+            save_scenario = st.form_submit_button("Save Current Results")
+        if save_scenario:
+            if not scenario_name.strip():
+                st.error("Give the scenario a name.")
+            else:
+                saved_form_data, saved_result = st.session_state.last_result
+                SCENARIO_STORE.save(scenario_name.strip(), saved_form_data, saved_result, owner=scenario_owner.strip(),
+                                    tags=[tag.strip() for tag in scenario_tags.split(",")])
+                st.success(f"Saved '{scenario_name.strip()}'.")
+
+    filter_cols = st.columns(2)
+    with filter_cols[0]:
+        owner_filter = st.text_input("Filter by owner").strip()
+    with filter_cols[1]:
+        tag_filter = st.text_input("Filter by tag").strip()
+    saved_scenarios = SCENARIO_STORE.list(owner=owner_filter or None, tag=tag_filter or None)
+    st.dataframe(saved_scenarios, hide_index=True, use_container_width=True)
+
+    scenario_names = dict(zip(saved_scenarios["id"], saved_scenarios["name"]))
+    selected_scenarios = st.multiselect("Scenarios to load or compare", list(scenario_names),
+                                        format_func=lambda scenario_id: scenario_names[scenario_id])
+    if st.button("Load Scenario", disabled=len(selected_scenarios) != 1):
+        name, saved_form_data, saved_result = SCENARIO_STORE.load(selected_scenarios[0])
+        st.session_state.loaded_scenario = {"name": name, "form_data": saved_form_data, "result": saved_result}
+        rerun()
+
+    if len(selected_scenarios) >= 2:
+        compared = {}
+        for scenario_id in selected_scenarios:
+            name, saved_form_data, saved_result = SCENARIO_STORE.load(scenario_id)
+            compared[f"{name} (#{scenario_id})"] = (saved_form_data, saved_result)
+        compared_inputs = pd.DataFrame({name: pd.Series(saved_form_data) for name, (saved_form_data, _) in compared.items()})
+        differing = compared_inputs.astype(str).nunique(axis=1) > 1
+        st.write("Inputs that differ")
+        st.dataframe(compared_inputs[differing].astype(str), use_container_width=True)
+        st.write("Web/App Monthly Traffic")
+        st.plotly_chart(scenario_traffic_figure({name: r["df"] for name, (_, r) in compared.items()}),
+                        use_container_width=True)
+        st.write("Monthly Recurring Revenue MRR")
+        st.plotly_chart(scenario_mrr_figure({name: r["df"] for name, (_, r) in compared.items()}),
+                        use_container_width=True)
+        st.write("Cash Flow Accumulation Over The Years")
+        st.plotly_chart(scenario_cashflow_figure({name: r["rollups"]["Fiscal Year"] for name, (_, r) in compared.items()}),
+                        use_container_width=True)
+
+# Exports are written on EXPORT_POOL threads; this rerun only submits them and checks on them at the end
+st.subheader("Export")
+with st.expander("Download results as XLSX, CSV or Parquet"):
+    export_cols = st.columns(2)
+    with export_cols[0]:
+        export_source = st.radio("Export", ["Current results", "Scenario file (batch)"], horizontal=True)
+    with export_cols[1]:
+        export_label = st.selectbox("Format", ["XLSX", "CSV", "Parquet"])
+        export_format = export_label.lower()
+    if export_source == "Current results":
+        st.caption("Monthly table with every column, yearly income statement, Key Metrics Summary and inputs.")
+        export_upload = None
+    else:
+        export_upload = st.file_uploader("Scenario CSV or Parquet (one row per scenario, columns named like the inputs)",
+                                         type=["csv", "parquet"], key="export_upload")
+    export_ready = export_upload is not None if export_source != "Current results" else "last_metrics" in st.session_state
+    if st.button("Prepare Export", disabled=not export_ready):
+        if export_upload is not None:
+            future = EXPORT_POOL.submit(export_batch, export_format, stage_upload(export_upload.name, export_upload.getvalue()))
+        else:
+            saved_form_data, saved_result = st.session_state.last_result
+            future = EXPORT_POOL.submit(export_result, export_format, saved_form_data, saved_result,
+                                        st.session_state.last_metrics)
+        st.session_state.export = {"future": future, "format": export_format, "label": export_label,
+                                   "started": time.perf_counter()}
+    export_slot = st.empty()
+
+# Diagnostics for this rerun
+finish_profile()
+with timer.stage("session_memory"):
+    session_bytes = SESSION_MEMORY.enforce(session_id, st.session_state)
+timer.log(session=session_id, calculate=st.session_state.calculate, session_bytes=sum(session_bytes.values()))
+with diagnostics_panel:
+    st.write(f"Session memory: {sum(session_bytes.values()) / 1024:,.1f} KB")
+    if timer.enabled:
+        stage_times = timer.summary()
+        st.write(f"Rerun: {stage_times['total_ms']:,.1f} ms")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, t["wall_ms"], t["cpu_ms"]) for name, t in stage_times["stages"].items()],
+                columns=["Stage", "Wall (ms)", "CPU (ms)"]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+    if is_admin(st.query_params):
+        st.dataframe(
+            pd.DataFrame(
+                [(session, nbytes / 1024) for session, nbytes in SESSION_MEMORY.stats()],
+                columns=["Session", "Held (KB)"]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+        if st.button("Profile next rerun"):
+            st.session_state.profile_next_rerun = True
+            rerun()
+        if "last_profile" in st.session_state:
+            with open(st.session_state.last_profile, "rb") as f:
+                st.download_button("Download profile (.pstats)", f.read(),
+                                   file_name=os.path.basename(st.session_state.last_profile))
+
+# Warm the default result and Plotly in the background once the first page is out
+startup.start()
+
+# Wait for a pending export last, so the page above is already drawn; any widget
+# interaction interrupts the wait at the next slot update and reruns as usual
+export = st.session_state.get("export")
+if export is not None:
+    while not export["future"].done():
+        export_slot.info(f"Preparing {export['label']} export... {time.perf_counter() - export['started']:.0f}s")
+        time.sleep(0.25)
+    try:
+        export_path = export["future"].result()
+    except Exception as e:
+        export_slot.error(f"Export failed: {e}")
+    else:
+        if not os.path.exists(export_path):
+            # Expired and cleaned up by a later export
+            del st.session_state.export
+            rerun()
+        with open(export_path, "rb") as f:
+            export_slot.download_button(
+                f"Download {export['label']} export ({os.path.getsize(export_path) / 2**20:,.1f} MB)", f.read(),
+                file_name=f"financial_projection_{datetime.now():%Y%m%d}{FORMATS[export['format']]}",
+            )
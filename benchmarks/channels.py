@@ -0,0 +1,71 @@
+"""Time the engine with growing numbers of acquisition channels.
+
+    python benchmarks/channels.py [--repeat 50] [--scenarios 1 1000]
+
+Each count runs in a fresh interpreter whose channel registry holds the
+three built-in channels plus generated ones (alternately paid and organic,
+all with traffic), since the engine's graph is built from the registry when
+it is imported. Channels are evaluated as one (channels, scenarios, months)
+array, so a single projection should cost about the same with 50 channels
+as with 3; large batches grow with the extra columns they write.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COUNTS = (3, 7, 20, 50)
+
+
+def child(n_channels, scenarios, repeat):
+    import channels
+    # Only the built-in channels, then generated ones up to n_channels
+    del channels.CHANNELS[3:]
+    for i in range(3, n_channels):
+        paid = i % 2 == 0
+        channels.register_channel(f"gen{i}", f"Channel {i}", f"Channel {i}", paid=paid,
+                                  cac_key=f"gen{i}_cpa" if paid else None, traffic_m1=1000 * i, cac=5.0)
+    from engine import default_inputs, project_batch
+
+    timings = {}
+    for n_scenarios in scenarios:
+        batch = [default_inputs()] * n_scenarios
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            project_batch(batch, 60)
+            best = min(best, time.perf_counter() - start)
+        timings[str(n_scenarios)] = best
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="runs per measurement; the best time is reported")
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[1, 1000], help="batch sizes to time")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(child(args.child, args.scenarios, args.repeat)))
+        return
+
+    header = "".join(f" {f'{n} scen. (ms)':>16}" for n in args.scenarios)
+    print(f"{'channels':>8}{header}")
+    for n_channels in COUNTS:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(n_channels),
+                              "--repeat", str(args.repeat), "--scenarios", *map(str, args.scenarios)],
+                             capture_output=True, text=True, cwd=ROOT)
+        if out.returncode:
+            raise RuntimeError(out.stderr)
+        timings = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{n_channels:>8}" + "".join(f" {timings[str(n)] * 1000:>16.2f}" for n in args.scenarios))
+
+
+if __name__ == "__main__":
+    main()
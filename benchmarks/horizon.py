@@ -0,0 +1,49 @@
+"""Time a single projection at growing horizons.
+
+    python benchmarks/horizon.py [--repeat 50]
+
+Run time should stay roughly flat from 60 to 600 months: every engine step is
+a whole-array operation, so the horizon only changes array lengths.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import cac_payback_months, default_inputs, project  # noqa: E402
+from rollups import rollup_cube  # noqa: E402
+
+HORIZONS = (60, 120, 240, 600)
+
+
+def time_horizon(form_data, n_months, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = project(form_data, n_months)
+        cac_payback_months(df["Internet Marketing CAC Weighted average"], form_data['subscription_price'],
+                           form_data['trial_to_paid'], form_data['churn_rate'], form_data['free_trial_days'])
+        rollup_cube(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="runs per horizon; the best time is reported")
+    args = parser.parse_args()
+
+    form_data = default_inputs()
+    form_data['churn_rate'] = 0.01  # slowest renewal decay
+    baseline = None
+    print(f"{'months':>8} {'best (ms)':>10} {'vs 60':>7}")
+    for n_months in HORIZONS:
+        best = time_horizon(form_data, n_months, args.repeat)
+        baseline = baseline or best
+        print(f"{n_months:>8} {best * 1000:>10.2f} {best / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measure what reruns send to the browser, and how long a chart tab switch takes.
+
+    python benchmarks/payload.py [--horizons 5 20 50] [--app path/to/app.py]
+
+For each projection horizon, runs the app through AppTest and sums the
+serialized size of every element a rerun draws:
+
+    form KB      the first page, before any results
+    results KB   "Calculate Projections", with the share taken by Plotly charts
+                 and the number of chart points
+    tab ms       best of --repeat reruns after switching the chart tab
+
+Pass --app to measure another checkout of app.py (e.g. a git worktree of
+an older commit) with the same inputs.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def elements(node):
+    """Every element (leaf) of an AppTest element tree."""
+    children = getattr(node, "children", None)
+    if children is None:
+        yield node
+        return
+    for child in children.values():
+        yield from elements(child)
+
+
+def chart_points(spec):
+    points = 0
+    for trace in spec.get("data", []):
+        y = trace.get("y")
+        if isinstance(y, dict):
+            # Plotly >= 5.21 may ship arrays as base64 typed arrays
+            points += int(y.get("shape", "0").split(",")[0] or 0)
+        elif y is not None:
+            points += len(y)
+    return points
+
+
+def page_bytes(at):
+    """(bytes of every element, bytes of Plotly charts, chart points) of the last rerun."""
+    total = charts = points = 0
+    for element in elements(at._tree):
+        proto = getattr(element, "proto", None)
+        if proto is None:
+            continue
+        nbytes = len(proto.SerializeToString())
+        total += nbytes
+        if element.type == "plotly_chart":
+            charts += nbytes
+            points += chart_points(json.loads(proto.figure.spec))
+    return total, charts, points
+
+
+def measure(app_path, horizon_years, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=120)
+    at.run()
+    form = page_bytes(at)[0]
+    [horizon] = [widget for widget in at.number_input if widget.label == "Projection Horizon (Years)"]
+    horizon.set_value(horizon_years)
+    at.session_state.calculate = True
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    total, charts, points = page_bytes(at)
+    chart_count = len(at.get("plotly_chart"))
+
+    tab_seconds = float("inf")
+    for i in range(repeat):
+        at.session_state.chart_tab = ("Cash Flow", "Traffic")[i % 2]
+        start = time.perf_counter()
+        at.run()
+        tab_seconds = min(tab_seconds, time.perf_counter() - start)
+    return {"form": form, "total": total, "charts": charts, "chart count": chart_count, "points": points,
+            "tab": tab_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"), help="app.py to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="tab switches timed per horizon; the best is reported")
+    args = parser.parse_args()
+
+    app_path = os.path.abspath(args.app)
+    sys.path.insert(0, os.path.dirname(app_path))
+    # Model runs inline, against an empty disk cache, so nothing but the page is measured
+    os.environ.setdefault("PROJECTION_WORKERS", "0")
+    os.environ.setdefault("DISK_CACHE_DIR", tempfile.mkdtemp())
+
+    print(f"{'horizon':>8} {'form KB':>8} {'results KB':>11} {'charts KB':>10} {'charts':>7} {'points':>8} {'tab ms':>7}")
+    for horizon_years in args.horizons:
+        row = measure(app_path, horizon_years, args.repeat)
+        print(f"{horizon_years:>7}y {row['form'] / 1024:>8.1f} {row['total'] / 1024:>11.1f} {row['charts'] / 1024:>10.1f} "
+              f"{row['chart count']:>7} {row['points']:>8,} {row['tab'] * 1000:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Measure cold start: import time and time to first render.
+
+    python benchmarks/startup.py [--repeat 3] [--think 3]
+
+Every number comes from a fresh interpreter, as after a dyno boot:
+
+    import        importing everything app.py imports (the heaviest modules are listed)
+    first page    the first rerun of app.py through AppTest: the form, before any results
+    first results "Calculate Projections" on the default inputs, --think seconds after
+                  the first page (the time an analyst spends on the form)
+    next results  the same rerun again, once everything is warm
+
+The disk cache points at an empty directory, so no earlier run is reused.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_imports():
+    """Modules app.py imports at the top level."""
+    with open(os.path.join(ROOT, "app.py")) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return modules
+
+
+def child_import():
+    import importlib
+    start = time.perf_counter()
+    for module in app_imports():
+        importlib.import_module(module)
+    return {"import": time.perf_counter() - start}
+
+
+def child_render(think):
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    for name in ("first page", "first results", "next results"):
+        if name == "first results":
+            time.sleep(think)
+            at.session_state.calculate = True
+        start = time.perf_counter()
+        at.run()
+        timings[name] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return timings
+
+
+def heaviest_imports(n=8):
+    """Top-level modules of app_imports() by cumulative import time, from python -X importtime."""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); " + "; ".join(f"import {m}" for m in app_imports())
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=ROOT).stderr
+    top_level = {module.split(".")[0] for module in app_imports()}
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only modules imported directly by the script (no indentation), not the interpreter's own
+        if cumulative.strip().isdigit() and not name.startswith("  ") and name.strip() in top_level:
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def run_child(what, think, cache_dir):
+    env = dict(os.environ, DISK_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", what, "--think", str(think)],
+                         capture_output=True, text=True, env=env, cwd=ROOT)
+    if out.returncode:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement; the best is reported")
+    parser.add_argument("--think", type=float, default=3.0, help="seconds between the first page and Calculate")
+    parser.add_argument("--child", choices=["import", "render"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        timings = child_import() if args.child == "import" else child_render(args.think)
+        print(json.dumps(timings))
+        return
+
+    best = {}
+    for _ in range(args.repeat):
+        for what in ("import", "render"):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for name, seconds in run_child(what, args.think, cache_dir).items():
+                    best[name] = min(best.get(name, float("inf")), seconds)
+
+    print(f"{'stage':<14} {'best (ms)':>10}")
+    for name, seconds in best.items():
+        print(f"{name:<14} {seconds * 1000:>10.1f}")
+    print("\nheaviest imports (cumulative ms)")
+    for seconds, name in heaviest_imports():
+        print(f"  {name:<32} {seconds * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
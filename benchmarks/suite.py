@@ -0,0 +1,191 @@
+"""Benchmark the model and page build per stage, with regression thresholds.
+
+    python benchmarks/suite.py [--repeat 20] [--threshold 0.25] [--no-page] [--no-record]
+
+Every regime in the grid (churn x horizon x traffic mix x ad revenue) is timed
+stage by stage: the engine, the CAC payback, the yearly rollup and each
+figure (built and serialized as the app caches it). The "page" stage is one
+full "Calculate Projections" rerun of app.py through Streamlit's AppTest with
+the caches cleared, so no browser is needed.
+
+Results are appended to benchmarks/history.json. A stage fails when its best
+time is more than --threshold slower than the best of the previous --window
+recorded runs (and at least --floor-ms slower, to ignore timer noise); the
+script then exits with status 1.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from charts import (cashflow_figure, figure_json, financials_figure, mrr_figure,  # noqa: E402
+                    subscriptions_figure, traffic_figure)
+from engine import cac_payback_months, default_inputs, project  # noqa: E402
+from rollups import rollup_cube  # noqa: E402
+
+HISTORY = os.path.join(ROOT, "benchmarks", "history.json")
+
+CHURN = {"churn25": 0.25, "churn1": 0.01}
+HORIZONS = {"5y": 5, "20y": 20}
+TRAFFIC = {
+    "all": {},
+    "seo_only": {"sem_traffic_m1": 0, "am_traffic_m1": 0},
+}
+ADS = {"ads_off": {"views per visit": 0.0}, "ads_on": {"views per visit": 3.0, "cpm": 5.0}}
+
+FIGURES = {
+    "traffic": lambda df, cube: traffic_figure(df),
+    "subscriptions": lambda df, cube: subscriptions_figure(df),
+    "mrr": lambda df, cube: mrr_figure(df),
+    "financials": lambda df, cube: financials_figure(cube["Fiscal Year"]),
+    "cashflow": lambda df, cube: cashflow_figure(cube["Fiscal Year"]),
+}
+
+
+def regimes():
+    """{name: (form_data, n_months)} for every combination of the grid."""
+    out = {}
+    for (churn, rate), (horizon, years), (traffic, mix), (ads, ad_inputs) in itertools.product(
+            CHURN.items(), HORIZONS.items(), TRAFFIC.items(), ADS.items()):
+        form_data = default_inputs()
+        form_data['churn_rate'] = rate
+        form_data.update(mix)
+        form_data.update(ad_inputs)
+        out[f"{churn}/{horizon}/{traffic}/{ads}"] = (form_data, 12 * years)
+    return out
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return value, {"min_ms": min(times) * 1000, "median_ms": float(np.median(times)) * 1000}
+
+
+def time_regime(form_data, n_months, repeat):
+    """Per-stage timings for one regime."""
+    stages = {}
+    df, stages["engine"] = _timed(lambda: project(form_data, n_months), repeat)
+    _, stages["payback"] = _timed(lambda: cac_payback_months(
+        df["Internet Marketing CAC Weighted average"], form_data['subscription_price'],
+        form_data['trial_to_paid'], form_data['churn_rate'], form_data['free_trial_days']), repeat)
+    cube, stages["rollups"] = _timed(lambda: rollup_cube(df), repeat)
+    for name, build in FIGURES.items():
+        _, stages[f"figure:{name}"] = _timed(lambda: figure_json(build(df, cube)), repeat)
+    return stages
+
+
+def time_page(repeat):
+    """One full results rerun of app.py, with the result caches emptied before each run."""
+    from streamlit.testing.v1 import AppTest
+
+    from result_cache import RESULT_CACHE
+
+    os.environ.setdefault("DISK_CACHE_DIR", os.path.join(ROOT, ".cache", "benchmark"))
+    from disk_cache import DISK_CACHE
+
+    def rerun():
+        RESULT_CACHE.clear()
+        for entry in DISK_CACHE._files() if os.path.isdir(DISK_CACHE.directory) else ():
+            os.remove(entry.path)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.run()
+    at.session_state.calculate = True
+    _, timing = _timed(rerun, repeat)
+    return timing
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def regressions(results, history, threshold, floor_ms, window):
+    """(regime, stage, best_ms, now_ms) for every stage slower than the recent best."""
+    failed = []
+    recent = history[-window:]
+    for regime, stages in results.items():
+        for stage, timing in stages.items():
+            previous = [run["results"][regime][stage]["min_ms"] for run in recent
+                        if stage in run["results"].get(regime, {})]
+            if not previous:
+                continue
+            best = min(previous)
+            now = timing["min_ms"]
+            if now > best * (1 + threshold) and now - best > floor_ms:
+                failed.append((regime, stage, best, now))
+    return failed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per stage; best and median are recorded")
+    parser.add_argument("--page-repeat", type=int, default=3, help="full page reruns")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs the recent best (0.25 = 25%%)")
+    parser.add_argument("--floor-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--window", type=int, default=5, help="previous runs to compare against")
+    parser.add_argument("--history", default=HISTORY)
+    parser.add_argument("--no-page", action="store_true", help="skip the AppTest page rerun")
+    parser.add_argument("--no-record", action="store_true", help="don't append this run to the history")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, (form_data, n_months) in regimes().items():
+        results[name] = time_regime(form_data, n_months, args.repeat)
+    if not args.no_page:
+        results["default"] = {"page": time_page(args.page_repeat)}
+
+    stages = list(dict.fromkeys(stage for timings in results.values() for stage in timings))
+    print(f"{'regime':<36}" + "".join(f"{stage.replace('figure:', ''):>15}" for stage in stages))
+    for regime, timings in results.items():
+        print(f"{regime:<36}" + "".join(
+            f"{timings[stage]['min_ms']:>15.2f}" if stage in timings else f"{'':>15}" for stage in stages))
+    print("(best of --repeat runs, ms)")
+
+    history = load_history(args.history)
+    failed = regressions(results, history, args.threshold, args.floor_ms, args.window)
+    for regime, stage, best, now in failed:
+        print(f"REGRESSION {regime} {stage}: {now:.2f} ms vs best {best:.2f} ms ({now / best - 1:+.0%})")
+
+    if not args.no_record:
+        history.append({
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "repeat": args.repeat,
+            "results": results,
+        })
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Calibrate model inputs to uploaded monthly actuals by nonlinear least squares.
+
+The actuals CSV has a `month` column (any date in the month) and one or more
+monthly series, in the model's units:
+
+    traffic            total traffic, all channels
+    {key}_traffic      one channel's traffic (sem_traffic, seo_traffic, ...)
+    trials             new trial subscriptions (Total Monthly Subscriptions)
+    {key}_trials       one channel's new trial subscriptions
+    paid               new paying users (Trial To Paid Transactions Count)
+    mrr                recurring revenue, new plus renewal MRR
+
+Months are matched to the projection from the launch month; blank cells are
+left out of the fit. Each series' residuals are divided by its RMS, so
+series of different magnitudes weigh alike.
+
+calibrate() fits churn_rate, trial_to_paid and the yearly conversion and
+traffic growth rates of the years the actuals cover (or any chosen inputs)
+with Levenberg-Marquardt, from several starting points at once. Every
+iteration evaluates all forward-difference Jacobian probes of every start in
+one project_batch() call, then a ladder of damping values per start in a
+second one, and keeps each start's best step. Standard errors come from the
+Jacobian at the optimum: s^2 (J'J)^-1, with s^2 the residual variance.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from channels import CHANNELS
+from engine import SUBSCRIPTION_COLUMNS, TRAFFIC_COLUMNS, project_batch, scenario_arrays
+from rollups import RECURRING_COLUMNS
+
+# Series an actuals CSV can carry: which model columns they sum, and where they are overlaid
+SERIES = {
+    "traffic": {"label": "Traffic", "chart": "traffic", "color": "#333333",
+                "columns": list(TRAFFIC_COLUMNS.values())},
+    "trials": {"label": "New Subscriptions", "chart": "subscriptions", "color": "#4E79A7",
+               "columns": ["Total Monthly Subscriptions"]},
+    "paid": {"label": "Trial To Paid", "chart": "subscriptions", "color": "#F28E2B",
+             "columns": ["Trial To Paid Transactions Count"]},
+    "mrr": {"label": "Recurring MRR", "chart": "mrr", "color": "#1f3b73", "columns": RECURRING_COLUMNS},
+}
+for _ch in CHANNELS:
+    SERIES[f"{_ch.key}_traffic"] = {"label": f"{_ch.short} Traffic", "chart": "traffic", "color": _ch.color,
+                                    "columns": [TRAFFIC_COLUMNS[_ch.key]]}
+    SERIES[f"{_ch.key}_trials"] = {"label": f"{_ch.short} Subscriptions", "chart": "subscriptions",
+                                   "color": _ch.color, "columns": [SUBSCRIPTION_COLUMNS[_ch.key]]}
+
+# Input groups offered for fitting: {label: churn_rate, trial_to_paid, or a per-channel yearly rate suffix}
+PARAMETER_GROUPS = {
+    "Churn rate": "churn_rate",
+    "Trial-to-paid rate": "trial_to_paid",
+    "Conversion rates": "cr_y",
+    "Traffic growth rates": "traffic_gr_y",
+}
+
+# Levenberg-Marquardt damping tried together at every step, as multiples of each start's current damping
+DAMPING_FACTORS = 10.0 ** np.arange(-2, 3)
+
+Z_95 = 1.959964
+
+
+def read_actuals(csv_file):
+    """The actuals CSV as a DataFrame: 'month' (first of the month, sorted) and the SERIES columns it has."""
+    actuals = pd.read_csv(csv_file)
+    actuals.columns = [str(column).strip() for column in actuals.columns]
+    if "month" not in actuals.columns:
+        raise ValueError("Actuals need a 'month' column")
+    unknown = [column for column in actuals.columns if column != "month" and column not in SERIES]
+    if unknown:
+        raise ValueError(f"Unknown actuals columns: {', '.join(unknown)}. Expected any of {', '.join(SERIES)}")
+    if len(actuals.columns) == 1:
+        raise ValueError(f"Actuals need at least one of {', '.join(SERIES)}")
+    actuals["month"] = pd.to_datetime(actuals["month"]).dt.to_period("M").dt.to_timestamp()
+    if actuals["month"].duplicated().any():
+        raise ValueError("Actuals have more than one row for the same month")
+    return actuals.sort_values("month", ignore_index=True)
+
+
+def month_offsets(kick_off_date, months):
+    """0-based projection month of each actuals month, counted from the launch month."""
+    offsets = (np.asarray(months, dtype="datetime64[M]") - np.datetime64(kick_off_date, "M")).astype(np.int64)
+    if len(offsets) and offsets.min() < 0:
+        raise ValueError(f"Actuals start before the launch month ({np.datetime64(kick_off_date, 'M')})")
+    return offsets
+
+
+def default_parameters(form_data, actuals, groups=tuple(PARAMETER_GROUPS.values())):
+    """Inputs to fit: the chosen groups, with yearly rates for the years the actuals cover of channels with traffic."""
+    offsets = month_offsets(form_data['kick_off_date'], actuals["month"])
+    years = sorted({int(offset) // 12 + 1 for offset in offsets})
+    arrays = scenario_arrays(form_data)
+    parameters = [key for key in ("churn_rate", "trial_to_paid") if key in groups]
+    for suffix in ("traffic_gr_y", "cr_y"):
+        if suffix in groups:
+            parameters += [f"{ch.key}_{suffix}{year}" for ch in CHANNELS if arrays[f"{ch.key}_traffic_m1"][0] > 0
+                           for year in years]
+    return parameters
+
+
+def parameter_bounds(key):
+    """(low, high) an input is fitted within: every calibrated input is a monthly rate."""
+    return (0.01, 1.0) if key == "churn_rate" else (0.0, 1.0)
+
+
+def _initial_value(arrays, key):
+    """The scenario's value of an input; yearly rates past the given schedule repeat its last year."""
+    if key in arrays:
+        return float(arrays[key][0])
+    prefix = key.rstrip("0123456789")
+    year = int(key[len(prefix):])
+    while year > 1 and f"{prefix}{year}" not in arrays:
+        year -= 1
+    return float(arrays[f"{prefix}{year}"][0])
+
+
+class _Problem:
+    """Residuals of many candidate input vectors, evaluated in one project_batch() per call."""
+
+    def __init__(self, form_data, actuals, parameters):
+        self.form_data = form_data
+        self.parameters = parameters
+        offsets = month_offsets(form_data['kick_off_date'], actuals["month"])
+        self.n_months = max(12 * form_data.get('horizon_years', 5), int(offsets.max()) + 1)
+        self.targets = []
+        for name in actuals.columns.drop("month"):
+            actual = actuals[name].to_numpy(dtype=float)
+            observed = ~np.isnan(actual)
+            scale = np.sqrt(np.mean(actual[observed] ** 2)) if observed.any() else 0.0
+            self.targets.append((name, offsets[observed], actual[observed], scale or 1.0))
+        self.n_observations = sum(len(target[1]) for target in self.targets)
+        self.evaluations = 0
+
+    def project(self, x):
+        rows = [{**self.form_data, **dict(zip(self.parameters, values))} for values in np.atleast_2d(x)]
+        self.evaluations += len(rows)
+        return project_batch(rows, self.n_months)
+
+    def series(self, batch, name):
+        return sum(batch[column] for column in SERIES[name]["columns"])
+
+    def residuals(self, x):
+        """(candidates, observations) scaled residuals; non-finite model values count as infinite misfit."""
+        batch = self.project(x)
+        residuals = np.concatenate([(self.series(batch, name)[:, offsets] - actual) / scale
+                                    for name, offsets, actual, scale in self.targets], axis=1)
+        return np.where(np.isfinite(residuals), residuals, np.inf)
+
+    def jacobian(self, x, r):
+        """Forward-difference Jacobians of candidates x (S, P) with residuals r (S, N), as (S, P, N)."""
+        n_starts, n_parameters = x.shape
+        h = 1e-6 * np.maximum(np.abs(x), 1e-2)
+        h = np.where(x + h > self.high, -h, h)
+        probes = x[:, None, :] + h[:, :, None] * np.eye(n_parameters)
+        probed = self.residuals(probes.reshape(-1, n_parameters)).reshape(n_starts, n_parameters, -1)
+        # A probe the model can't evaluate contributes no slope
+        return np.nan_to_num((probed - r[:, None, :]) / h[:, :, None], nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _cost(r):
+    return 0.5 * np.sum(r ** 2, axis=-1)
+
+
+def calibrate(form_data, actuals, parameters=None, n_starts=8, max_iter=50, ftol=1e-10, seed=0, progress=None):
+    """Fit inputs of form_data to actuals (read_actuals() output) by least squares.
+
+    parameters: form_data keys to fit (default: default_parameters()).
+    n_starts: starting points fitted together: form_data's values, plus ones
+    drawn between 0.5x and 1.5x of them. The best fit wins.
+    progress: optional callback(iteration, max_iter).
+
+    Returns {"parameters", "initial", "value", "std_error", "low", "high"
+    (95% interval), "identified", "status", "iterations", "evaluations",
+    "seconds", "n_observations", "rmse" (per series, relative to its RMS),
+    "months" (projection months), "series" ({name: label, chart, color,
+    months, actual and the fitted monthly values}) and "form_data" (form_data
+    with the fitted values)}. Inputs the actuals don't move have NaN errors
+    and identified False. Raises ValueError when no start can be evaluated.
+    """
+    started = time.perf_counter()
+    if parameters is None:
+        parameters = default_parameters(form_data, actuals)
+    if not parameters:
+        raise ValueError("Nothing to fit: pick at least one input")
+    problem = _Problem(form_data, actuals, parameters)
+    if problem.n_observations == 0:
+        raise ValueError("Actuals have no values to fit")
+
+    arrays = scenario_arrays(form_data)
+    x0 = np.array([_initial_value(arrays, key) for key in parameters])
+    bounds = np.array([parameter_bounds(key) for key in parameters])
+    problem.low, problem.high = bounds[:, 0], bounds[:, 1]
+    rng = np.random.default_rng(seed)
+    x = np.vstack([x0, x0 * rng.uniform(0.5, 1.5, (max(n_starts, 1) - 1, len(x0)))])
+    x = np.clip(x, problem.low, problem.high)
+
+    r = problem.residuals(x)
+    cost = _cost(r)
+    damping = np.full(len(x), 1e-3)
+    active = np.isfinite(cost)
+    if not active.any():
+        raise ValueError("The model gives no finite values at any starting point, so there is nothing to fit from")
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        idx = np.flatnonzero(active)
+        if not len(idx):
+            break
+        # All starts' Jacobian probes in one batch, then all starts' damped steps in another
+        jt = problem.jacobian(x[idx], r[idx])
+        jtj = jt @ jt.transpose(0, 2, 1)
+        gradient = jt @ r[idx][..., None]
+        diagonal = np.diagonal(jtj, axis1=1, axis2=2)
+        diagonal = np.maximum(diagonal, 1e-12 * np.maximum(diagonal.max(axis=1, keepdims=True), 1e-12))
+        mu = damping[idx, None] * DAMPING_FACTORS
+        system = jtj[:, None] + mu[..., None, None] * (diagonal[:, None, :, None] * np.eye(len(parameters)))
+        step = -np.linalg.solve(system, np.broadcast_to(gradient[:, None], system.shape[:-1] + (1,)))[..., 0]
+        trial = np.clip(x[idx, None, :] + step, problem.low, problem.high)
+        trial_r = problem.residuals(trial.reshape(-1, len(parameters))).reshape(len(idx), len(DAMPING_FACTORS), -1)
+        trial_cost = _cost(trial_r)
+
+        best = np.argmin(trial_cost, axis=1)
+        for row, i in enumerate(idx):
+            k = best[row]
+            if trial_cost[row, k] < cost[i]:
+                improvement = cost[i] - trial_cost[row, k]
+                moved = np.abs(trial[row, k] - x[i]).max()
+                x[i], r[i], cost[i] = trial[row, k], trial_r[row, k], trial_cost[row, k]
+                damping[i] = max(mu[row, k] / 10, 1e-12)
+                if improvement <= ftol * max(cost[i], 1e-300) or moved <= 1e-12:
+                    active[i] = False
+            else:
+                # Even the most damped step failed: the start sits at a (local) minimum
+                damping[i] = mu[row, -1] * 10
+                if damping[i] > 1e8:
+                    active[i] = False
+        if progress is not None:
+            progress(iteration, max_iter)
+    status = "converged" if not active.any() else "max iterations"
+
+    # Uncertainty from the Jacobian at the best start's optimum
+    best_start = int(np.argmin(cost))
+    value = x[best_start]
+    jt = problem.jacobian(value[None], r[best_start][None])[0]
+    identified = np.linalg.norm(jt, axis=1) > 0
+    dof = problem.n_observations - int(identified.sum())
+    variance = 2 * cost[best_start] / dof if dof > 0 else np.nan
+    covariance = variance * np.linalg.pinv(jt[identified] @ jt[identified].T)
+    std_error = np.full(len(parameters), np.nan)
+    std_error[identified] = np.sqrt(np.maximum(np.diagonal(covariance), 0))
+
+    batch = problem.project(value)
+    fitted_r = r[best_start]
+    rmse, series, start = {}, {}, 0
+    months = np.asarray(batch["Month"][0])
+    for name, offsets, actual, scale in problem.targets:
+        rmse[name] = float(np.sqrt(np.mean(fitted_r[start:start + len(offsets)] ** 2)))
+        start += len(offsets)
+        series[name] = {**{key: SERIES[name][key] for key in ("label", "chart", "color")},
+                        "months": months[offsets], "actual": actual,
+                        "fitted": problem.series(batch, name)[0]}
+    return {
+        "parameters": list(parameters),
+        "initial": x0,
+        "value": value,
+        "std_error": std_error,
+        "low": value - Z_95 * std_error,
+        "high": value + Z_95 * std_error,
+        "identified": identified,
+        "status": status,
+        "iterations": iteration,
+        "evaluations": problem.evaluations,
+        "seconds": time.perf_counter() - started,
+        "n_observations": problem.n_observations,
+        "rmse": rmse,
+        "months": months,
+        "series": series,
+        "form_data": {**form_data, **{key: float(v) for key, v in zip(parameters, value)}},
+    }
@@ -0,0 +1,73 @@
+"""Acquisition channel registry.
+
+Every channel the model knows is one Channel in CHANNELS. A channel's
+inputs are form_data keys named after its key:
+
+    {key}_traffic_m1                 traffic in the first month
+    {key}_traffic_gr_y1, _y2, ...    monthly traffic growth rate, per year
+    {key}_cr_y1, _y2, ...            traffic-to-trial conversion rate, per year
+    cac_key                          CAC per new subscription (paid channels only)
+
+and its monthly output columns are traffic_column, subscriptions_column and,
+for paid channels, marketing_column (subscriptions x CAC). The engine
+evaluates all channels together as (channels, scenarios, months) arrays, so
+a channel is added by registering it here, before engine is imported, and
+not by adding model code.
+
+Optional channels have no traffic by default; scenarios that leave out
+their inputs get the defaults, so older scenario files keep working.
+"""
+
+
+class Channel:
+    """One acquisition channel: its inputs, their defaults and its output columns."""
+
+    def __init__(self, key, name, label, paid, cac_key=None, traffic_m1=0, growth=0.02, conversion=0.04,
+                 cac=0.0, optional=True, color=None, legend=None, short=None, marketing_column=None):
+        self.key = key
+        self.name = name
+        self.label = label
+        self.paid = paid
+        self.cac_key = cac_key if paid else None
+        self.optional = optional
+        self.color = color
+        self.legend = legend or f"{label}<br>Traffic"
+        self.short = short or name
+        self.traffic_column = f"{name} - {'Paid' if paid else 'Organic'} Traffic"
+        self.subscriptions_column = f"{name} Subscriptions"
+        self.marketing_column = (marketing_column or f"{name} Marketing") if paid else None
+        self.defaults = {f"{key}_traffic_m1": traffic_m1}
+        # A single rate applies to every year; a sequence gives years 1, 2, ...
+        for suffix, rates in (("traffic_gr_y", growth), ("cr_y", conversion)):
+            rates = rates if isinstance(rates, (list, tuple)) else [rates] * 5
+            self.defaults.update({f"{key}_{suffix}{y}": rate for y, rate in enumerate(rates, start=1)})
+        if paid:
+            self.defaults[cac_key] = cac
+
+
+CHANNELS = []
+
+
+def register_channel(*args, **kwargs):
+    """Add a Channel to the registry (before engine is imported) and return it."""
+    channel = Channel(*args, **kwargs)
+    if any(channel.key == other.key for other in CHANNELS):
+        raise ValueError(f"Channel '{channel.key}' is already registered")
+    CHANNELS.append(channel)
+    return channel
+
+
+_CONVERSION = (0.04, 0.045, 0.05, 0.055, 0.06)
+
+register_channel("sem", "SEM", "Paid (SEM)", paid=True, cac_key="sem_cpa", traffic_m1=100000,
+                 conversion=_CONVERSION, cac=20.0, optional=False, color="#1f77b4",
+                 legend="Paid(SEM)<br>Traffic", short="SEM")
+register_channel("seo", "SEO", "Organic (SEO)", paid=False, traffic_m1=100000, conversion=_CONVERSION,
+                 optional=False, color="#ff7f0e", legend="Organic(SEO)<br>Traffic", short="SEO")
+register_channel("am", "AM", "Affiliate", paid=True, cac_key="affiliate_cpa", traffic_m1=10000,
+                 conversion=_CONVERSION, cac=11.0, optional=False, color="#2ca02c",
+                 legend="Affiliate<br>Marketing", short="Affiliate", marketing_column="Affiliate Marketing")
+register_channel("social", "Paid Social", "Paid Social", paid=True, cac_key="social_cpa", color="#d62728")
+register_channel("email", "Email", "Email", paid=False, color="#9467bd")
+register_channel("partner", "Partnerships", "Partnerships", paid=True, cac_key="partner_cpa", color="#8c564b")
+register_channel("appstore", "App Store", "App Store", paid=False, color="#e377c2")
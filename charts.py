@@ -0,0 +1,412 @@
+import json
+
+import numpy as np
+
+from channels import CHANNELS
+
+# Plotly is imported inside each function: it is the slowest import of the app and
+# nothing needs it until the first results are built (see startup.py)
+
+# Revenue, Income, Gross Income and EBT lines of the annual chart
+FINANCIALS_COLORS = ['#006400','#2E8B57','#3CB371','#90EE90']
+
+# Monthly traces longer than this are decimated to it (LTTB), so long horizons ship a bounded payload
+POINT_BUDGET = 240
+# Monthly line traces longer than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_MIN_POINTS = 120
+
+
+def lttb_indices(y, n_out):
+    """Indices of the n_out points Largest-Triangle-Three-Buckets keeps from an evenly spaced series.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previous pick and the
+    average of the next bucket, which preserves peaks and turns.
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    bounds = np.append(edges, n)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    picked = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_x = (bounds[i + 1] + bounds[i + 2] - 1) / 2
+        next_y = y[bounds[i + 1]:bounds[i + 2]].mean()
+        x = np.arange(lo, hi)
+        area = np.abs((picked - next_x) * (y[lo:hi] - y[picked]) - (picked - x) * (next_y - y[picked]))
+        picked = lo + int(np.argmax(area))
+        keep[i + 1] = picked
+    return keep
+
+
+def stacked_indices(layers, budget=POINT_BUDGET):
+    """Shared indices to decimate stacked traces by (each boundary gets an equal share), or None if short enough."""
+    if len(layers[0]) <= budget:
+        return None
+    # Empty layers repeat the boundary below them; only distinct boundaries share the budget
+    boundaries = np.unique(np.cumsum([np.asarray(layer, dtype=float) for layer in layers], axis=0), axis=0)
+    share = max(budget // len(boundaries), 3)
+    return np.unique(np.concatenate([lttb_indices(boundary, share) for boundary in boundaries]))
+
+
+def monthly_trace(x, y, **kwargs):
+    """A line trace for a monthly series: LTTB-decimated past POINT_BUDGET, WebGL past WEBGL_MIN_POINTS."""
+    import plotly.graph_objects as go
+    trace = go.Scattergl if len(y) > WEBGL_MIN_POINTS else go.Scatter
+    if len(y) > POINT_BUDGET:
+        keep = lttb_indices(y, POINT_BUDGET)
+        x, y = np.asarray(x)[keep], np.asarray(y)[keep]
+    return trace(x=x, y=y, **kwargs)
+
+
+def traffic_figure(df):
+    """Web/App Monthly Traffic chart."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for ch in CHANNELS:
+        # Optional channels only get a line once they have traffic
+        if ch.traffic_column not in df or (ch.optional and not np.any(df[ch.traffic_column])):
+            continue
+        fig.add_trace(monthly_trace(
+            x=df["Month"],
+            y=df[ch.traffic_column],
+            mode='lines',
+            name=ch.legend,
+            line=dict(color=ch.color, width=2),
+            hovertemplate=f'{ch.short}: %{{y:,.0f}}<extra></extra>'
+        ))
+
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Traffic Volume",
+        xaxis=dict(
+            type='date',
+            tickformat='%b-%Y', 
+            tickmode='auto',
+            nticks=30,
+            tickangle=-45  # Optional: rotates labels for better readability
+        ),
+        yaxis=dict(tickformat=","),
+        hovermode="x unified",
+        legend=dict(title="Traffic Source"),
+        plot_bgcolor="white",
+        yaxis_gridcolor="lightgray",
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def subscriptions_figure(df):
+    """Monthly Subscriptions chart."""
+    import plotly.graph_objects as go
+    df_subscriptions = df[[
+        'Month',
+        'Total Monthly Subscriptions',
+        'Trial To Paid Transactions Count'
+    ]]
+
+    fig = go.Figure()
+    fig.add_trace(monthly_trace(
+        x=df_subscriptions["Month"],
+        y=df_subscriptions["Total Monthly Subscriptions"],
+        mode='lines',
+        name='New Monthly<br>Subscriptions',
+        line=dict(color='#4E79A7', width=2),
+        hovertemplate='Total Subs: %{y:,.0f}<extra></extra>'
+    ))
+    fig.add_trace(monthly_trace(
+        x=df_subscriptions["Month"],
+        y=df_subscriptions["Trial To Paid Transactions Count"],
+        mode='lines',
+        name='Trial To Paid<br>New Users',
+        line=dict(color='#F28E2B', width=2),
+        hovertemplate='Trial To Paid: %{y:,.0f}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Count",
+        xaxis=dict(
+            type='date',
+            tickformat='%b-%Y',
+            tickmode='auto',
+            nticks=30,
+            tickangle=-45
+        ),
+        yaxis=dict(tickformat=","),
+        hovermode="x unified",
+        legend=dict(title="Subscription Type"),
+        plot_bgcolor="white",
+        yaxis_gridcolor="lightgray",
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def mrr_figure(df):
+    """Monthly Recurring Revenue MRR Split chart."""
+    import plotly.graph_objects as go
+    df_rev_split = df[[
+        'Month',
+        'New Monthly Recurring Revenue MRR',
+        'Renewal Recurring Revenue MRR' ,
+        'Ad Network Revenue',
+        'Ad Affiliate Revenue'
+    ]]
+    # Stacked areas need shared months, so they are decimated together (and stay SVG: WebGL can't stack)
+    keep = stacked_indices([df_rev_split[c] for c in df_rev_split.columns[1:]])
+    if keep is not None:
+        df_rev_split = df_rev_split.iloc[keep]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df_rev_split["Month"],
+        y=df_rev_split["New Monthly Recurring Revenue MRR"],
+        mode='lines',
+        name='Trial To Paid<br>(New Users)',
+        stackgroup='one',
+        hovertemplate='Trial To Paid: $%{y:,.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=df_rev_split["Month"],
+        y=df_rev_split["Renewal Recurring Revenue MRR"],
+        mode='lines',
+        name='Recurring<br>Renewals',
+        stackgroup='one',
+        hovertemplate='Recurring Renewal: $%{y:,.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=df_rev_split["Month"],
+        y=df_rev_split["Ad Network Revenue"],
+        mode='lines',
+        name='Ad Network',
+        stackgroup='one',
+        hovertemplate='Ad Network: $%{y:,.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=df_rev_split["Month"],
+        y=df_rev_split["Ad Affiliate Revenue"],
+        mode='lines',
+        name='Ad Affiliate<br>Marketing',
+        stackgroup='one',
+        hovertemplate='Ad Affiliate: $%{y:,.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="MRR",
+        xaxis=dict(
+            type='date',
+            tickformat='%b-%Y',
+            tickmode='auto',
+            nticks=30,
+            tickangle=-45,
+            dtick='M2'# Optional: rotates labels for better readability
+        ),
+        yaxis=dict(tickformat="$,.2f"),
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def financials_figure(rollup, xaxis_title="Year"):
+    """Financial Performance (Income Statement Output) chart of one rollups.rollup_cube() level.
+
+    The level's first column (Year, Quarter or Month) is the x axis; long
+    monthly levels are decimated like the other monthly charts.
+    """
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    colors = FINANCIALS_COLORS
+    x = rollup[rollup.columns[0]]
+    for column, name, color in (("Revenue", 'Revenue', colors[0]), ("Income", 'Income', colors[1]),
+                                ("Gross Income", 'Gross<br>Income', colors[2]),
+                                ("Earnings Before Taxes", 'Earnings<br>EBITDA', colors[3])):
+        fig.add_trace(monthly_trace(x, rollup[column], mode='lines+markers', name=name,
+                                    line=dict(color=color, width=3), hovertemplate='$%{y:,.2f}<extra></extra>'))
+    fig.update_layout(
+        xaxis_title=xaxis_title,
+        yaxis_title="Amount ($)",
+        plot_bgcolor="white",
+        hovermode="x unified",
+        legend=dict(title=""),
+        yaxis=dict(gridcolor="lightgray"),
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def cashflow_figure(yearly_rollup):
+    """Cash Flow Accumulation Over The Years chart: the year-end balance of the cube's Fiscal Year level."""
+    import plotly.express as px
+    fig = px.bar(
+        yearly_rollup[["Year", "Cash Flow Accumulation"]],
+        x="Year",
+        y="Cash Flow Accumulation",
+        labels={"Cash Flow Accumulation": "Cash Flow Accumulation ($)"},
+        text_auto='.2f',
+        color_discrete_sequence=["skyblue"]
+    )
+    fig.update_traces(
+        hovertemplate='$%{y:,.2f}<extra></extra>',
+        texttemplate='$%{y:,.2f}',
+        textposition='outside',
+        textfont_color='darkgray'
+    )
+    fig.update_layout(
+        xaxis_title="Year",
+        yaxis_title="Cash Flow Accumulation",
+        bargap=0.3,
+        plot_bgcolor="white",
+        yaxis_gridcolor="lightgray",
+        margin=dict(t=30)
+    )
+    return fig
+
+
+def cohort_figure(months, matrix):
+    """Paying users by cohort (month of first payment) and calendar month."""
+    import plotly.graph_objects as go
+    labels = [m.strftime('%b-%Y') for m in months]
+    fig = go.Figure(go.Heatmap(
+        z=matrix,
+        x=labels,
+        y=labels,
+        colorscale='Blues',
+        colorbar=dict(title="Paying<br>Users"),
+        hovertemplate='Cohort %{y}<br>%{x}: %{z:,.0f} paying<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Cohort (First Paid Month)",
+        xaxis=dict(tickangle=-45, nticks=30),
+        yaxis=dict(autorange="reversed", nticks=30),
+        plot_bgcolor="white",
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def _scenario_lines(frames, values, yaxis_title, hover):
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for name, df in frames.items():
+        fig.add_trace(monthly_trace(
+            x=df["Month"],
+            y=values(df),
+            mode='lines',
+            name=name,
+            hovertemplate=f'{name}: {hover}<extra></extra>'
+        ))
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title=yaxis_title,
+        xaxis=dict(type='date', tickformat='%b-%Y', tickmode='auto', nticks=30, tickangle=-45),
+        hovermode="x unified",
+        legend=dict(title="Scenario"),
+        plot_bgcolor="white",
+        yaxis_gridcolor="lightgray",
+        margin=dict(t=25)
+    )
+    return fig
+
+
+def scenario_traffic_figure(frames):
+    """Total monthly traffic of several scenarios ({name: projection df})."""
+    return _scenario_lines(
+        frames,
+        # Scenarios saved before a channel was registered don't have its column
+        lambda df: sum(df[ch.traffic_column] for ch in CHANNELS if ch.traffic_column in df),
+        "Visitors", '%{y:,.0f}')
+
+
+def scenario_mrr_figure(frames):
+    """Monthly recurring revenue (new + renewals) of several scenarios."""
+    return _scenario_lines(
+        frames,
+        lambda df: df['New Monthly Recurring Revenue MRR'] + df['Renewal Recurring Revenue MRR'],
+        "MRR ($)", '$%{y:,.2f}')
+
+
+def scenario_cashflow_figure(yearly_frames):
+    """Year-end Cash Flow Accumulation of several scenarios ({name: Fiscal Year rollup}), grouped by year."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for name, df in yearly_frames.items():
+        fig.add_trace(go.Bar(
+            x=df["Year"],
+            y=df["Cash Flow Accumulation"],
+            name=name,
+            hovertemplate=f'{name}: $%{{y:,.2f}}<extra></extra>'
+        ))
+    fig.update_layout(
+        barmode='group',
+        xaxis_title="Year",
+        yaxis_title="Cash Flow Accumulation",
+        legend=dict(title="Scenario"),
+        plot_bgcolor="white",
+        yaxis_gridcolor="lightgray",
+        margin=dict(t=30)
+    )
+    return fig
+
+
+def add_financials_bands(fig, monte_carlo):
+    """Overlay Monte Carlo P5-P95 fans and P50 lines for Revenue and EBT."""
+    import plotly.graph_objects as go
+    for column, name, color in [("Revenue", "Revenue", FINANCIALS_COLORS[0]), ("Earnings Before Taxes", "Earnings<br>EBITDA", FINANCIALS_COLORS[3])]:
+        p5, p50, p95 = monte_carlo["yearly"][column]
+        fig.add_trace(go.Scatter(x=monte_carlo["years"], y=p95, mode='lines', line=dict(width=0), showlegend=False,
+                                 name=f'{name} P95', hovertemplate='P95: $%{y:,.2f}<extra></extra>'))
+        fig.add_trace(go.Scatter(x=monte_carlo["years"], y=p5, mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor='rgba(46,139,87,0.15)', name=f'{name}<br>P5-P95', hovertemplate='P5: $%{y:,.2f}<extra></extra>'))
+        fig.add_trace(go.Scatter(x=monte_carlo["years"], y=p50, mode='lines', line=dict(color=color, width=2, dash='dash'),
+                                 name=f'{name} P50', hovertemplate='P50: $%{y:,.2f}<extra></extra>'))
+
+
+def add_cashflow_bands(fig, monte_carlo):
+    """Overlay Monte Carlo P50 year-end cash with P5-P95 error bars."""
+    import plotly.graph_objects as go
+    p5, p50, p95 = monte_carlo["yearly"]["Cash Flow Accumulation"]
+    fig.add_trace(go.Scatter(
+        x=monte_carlo["years"],
+        y=p50,
+        mode='markers',
+        name='Monte Carlo<br>P50 (P5-P95)',
+        marker=dict(color='#1f3b73', size=9),
+        error_y=dict(type='data', symmetric=False, array=p95 - p50, arrayminus=p50 - p5, color='#1f3b73'),
+        hovertemplate='P50: $%{y:,.2f}<extra></extra>'
+    ))
+
+
+def add_calibration_overlay(fig, chart_name, calibration):
+    """Overlay uploaded actuals (markers) and the calibrated model (dotted lines) on a monthly chart.
+
+    calibration: calibration.calibrate() output; only its series drawn on chart_name are added.
+    """
+    import plotly.graph_objects as go
+    for series in calibration["series"].values():
+        if series["chart"] != chart_name:
+            continue
+        label, color = series["label"], series["color"]
+        fig.add_trace(go.Scatter(x=series["months"], y=series["actual"], mode='markers', name=f'{label}<br>Actual',
+                                 marker=dict(color=color, size=7, symbol='circle-open', line=dict(width=2)),
+                                 hovertemplate=f'{label} actual: %{{y:,.0f}}<extra></extra>'))
+        fig.add_trace(monthly_trace(calibration["months"], series["fitted"], mode='lines', name=f'{label}<br>Fitted',
+                                    line=dict(color=color, width=2, dash='dot'),
+                                    hovertemplate=f'{label} fitted: %{{y:,.0f}}<extra></extra>'))
+
+
+def figure_json(fig):
+    """Serialize a figure without its template.
+
+    The template is filled in again from the active default when the JSON is
+    loaded, so a figure built outside Streamlit (e.g. by the cache warm-up)
+    still picks up Streamlit's chart theme.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+    spec = fig.to_plotly_json()
+    spec["layout"].pop("template", None)
+    return json.dumps(spec, cls=PlotlyJSONEncoder)
@@ -0,0 +1,120 @@
+"""Cohort retention: renewals as a convolution of new paid users with a retention curve.
+
+A retention curve S[k] is the share of a month's new paid users still paying
+k months later (S[0] = 1). The flat churn_rate model is the geometric curve
+S[k] = (1 - churn_rate)**k. Scenarios can instead carry optional inputs:
+
+    retention_alpha, retention_beta   shifted-beta-geometric curve
+    retention_m1, retention_m2, ...   an observed curve, S[1], S[2], ...
+                                      (continued past the last month at its
+                                      last month-over-month ratio)
+
+Rows where these are missing or NaN keep the flat churn_rate.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+RETENTION_KEY = re.compile(r"retention_(alpha|beta|m\d+)")
+
+# Horizons above this many months convolve by FFT instead of one pass per lag
+FFT_MIN_MONTHS = 64
+
+
+def sbg_survival(alpha, beta, n_months):
+    """Shifted-beta-geometric survival S[k] = B(alpha, beta + k) / B(alpha, beta) for k < n_months."""
+    alpha = np.asarray(alpha, dtype=float)[..., None]
+    beta = np.asarray(beta, dtype=float)[..., None]
+    j = np.arange(1, n_months)
+    ratios = (beta + j - 1) / (alpha + beta + j - 1)
+    ones = np.ones(ratios.shape[:-1] + (1,))
+    return np.concatenate([ones, np.cumprod(ratios, axis=-1)], axis=-1)
+
+
+def extend_curve(observed, n_months):
+    """(scenarios, K) observed S[1..K] -> (scenarios, n_months) S[0..], continued geometrically."""
+    observed = np.asarray(observed, dtype=float)
+    curve = np.concatenate([np.ones((observed.shape[0], 1)), observed], axis=1)
+    n_given = curve.shape[1]
+    if n_given >= n_months:
+        return curve[:, :n_months]
+    last, before = curve[:, -1:], curve[:, -2:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.clip(np.where(before > 0, last / before, 0.0), 0.0, 1.0)
+    tail = last * ratio ** np.arange(1, n_months - n_given + 1)
+    return np.concatenate([curve, tail], axis=1)
+
+
+def _uploaded_keys(p):
+    keys = [key for key in p if RETENTION_KEY.fullmatch(key) and key.startswith("retention_m")]
+    return sorted(keys, key=lambda key: int(key[len("retention_m"):]))
+
+
+def has_retention_inputs(p):
+    """Whether any scenario of scenario_arrays() output p carries retention curve inputs."""
+    return bool(_uploaded_keys(p)) or ("retention_alpha" in p and "retention_beta" in p)
+
+
+def retention_curves(p, n_months):
+    """(scenarios, n_months) retention curves for scenario_arrays() output p."""
+    uploaded = _uploaded_keys(p)
+    has_sbg = "retention_alpha" in p and "retention_beta" in p
+    curves = (1 - p['churn_rate'])[:, None] ** np.arange(n_months)
+    if has_sbg:
+        alpha, beta = p['retention_alpha'], p['retention_beta']
+        use = (alpha > 0) & (beta > 0)
+        fitted = sbg_survival(np.where(use, alpha, 1.0), np.where(use, beta, 1.0), n_months)
+        curves = np.where(use[:, None], fitted, curves)
+    if uploaded:
+        observed = np.stack([p[key] for key in uploaded], axis=1)
+        use = np.isfinite(observed).all(axis=1)
+        curves = np.where(use[:, None], extend_curve(np.where(use[:, None], observed, 0.0), n_months), curves)
+    return curves
+
+
+def convolve_renewals(new_paid, curves):
+    """renewals[t] = sum(new_paid[t - k] * curves[k] for 1 <= k <= t), per scenario.
+
+    Short horizons take one vectorized pass per lag; longer ones multiply in the
+    frequency domain, O(M log M) per scenario.
+    """
+    new_paid = np.asarray(new_paid, dtype=float)
+    lagged = np.array(np.broadcast_to(curves, new_paid.shape), dtype=float)
+    lagged[..., 0] = 0.0  # a cohort's first payment is new MRR, not a renewal
+    n_months = new_paid.shape[-1]
+
+    if n_months <= FFT_MIN_MONTHS:
+        renewals = np.zeros_like(new_paid)
+        for k in range(1, n_months):
+            renewals[..., k:] += new_paid[..., :n_months - k] * lagged[..., k:k + 1]
+        return renewals
+
+    size = 1 << (2 * n_months - 1).bit_length()
+    spectrum = np.fft.rfft(new_paid, size, axis=-1) * np.fft.rfft(lagged, size, axis=-1)
+    renewals = np.fft.irfft(spectrum, size, axis=-1)[..., :n_months]
+    return np.maximum(renewals, 0.0)  # drop round-off below zero
+
+
+def cohort_matrix(new_paid, curve):
+    """(cohorts, months) paying users for one scenario: row c is the users who first paid in month c."""
+    new_paid = np.asarray(new_paid, dtype=float)
+    curve = np.asarray(curve, dtype=float)
+    lag = np.arange(len(new_paid))[None, :] - np.arange(len(new_paid))[:, None]
+    return np.where(lag >= 0, new_paid[:, None] * curve[np.maximum(lag, 0)], 0.0)
+
+
+def retention_inputs(csv_file):
+    """retention_m1, retention_m2, ... from a CSV with a 'retention' column (fractions, month 1 first).
+
+    An optional 'month' column orders the rows; percentages above 1 are read as %.
+    """
+    observed = pd.read_csv(csv_file)
+    if "retention" not in observed.columns:
+        raise ValueError("The retention CSV needs a 'retention' column")
+    if "month" in observed.columns:
+        observed = observed.sort_values("month")
+    values = observed["retention"].dropna().to_numpy(dtype=float)
+    if values.max(initial=0) > 1:
+        values = values / 100
+    return {f"retention_m{k}": float(v) for k, v in enumerate(values, start=1)}
@@ -0,0 +1,103 @@
+"""Compact storage for a monthly projection: one array per column instead of a DataFrame.
+
+Months are datetime64[M] and any column holding a single value across the
+horizon (flat monthly costs, ad revenue) is kept as one scalar, broadcast
+only when a column is read. Reads mirror the DataFrame calls the charts and
+the app make (frame["col"] -> Series, frame[["a", "b"]] -> DataFrame), with
+Month handed out as datetime.date objects, as project() builds it.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _compact(values, dtype=None):
+    values = np.asarray(values)
+    if dtype is not None and values.dtype.kind == "f":
+        values = values.astype(dtype)
+    if values.ndim == 0:
+        return values[()]
+    if len(values) and (values == values[0]).all():
+        return values[0]
+    return np.ascontiguousarray(values)
+
+
+class CompactFrame:
+    """Projection columns of one scenario: 1-D arrays, or scalars for constant columns."""
+
+    def __init__(self, months, columns, dtype=np.float64):
+        self.months = np.asarray(months, dtype="datetime64[M]")
+        self._columns = columns
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_batch(cls, batch, row=0, dtype=None):
+        """Row `row` of a project_batch() result."""
+        columns = {name: _compact(values[row], dtype) for name, values in batch.items() if name != "Month"}
+        return cls(batch["Month"][row], columns, dtype or np.float64)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """From {column: 1-D array or 0-d scalar}, Month included (see to_arrays())."""
+        columns = {name: _compact(values) for name, values in arrays.items() if name != "Month"}
+        floats = [v.dtype for v in columns.values() if np.asarray(v).dtype.kind == "f"]
+        return cls(arrays["Month"], columns, min(floats, key=lambda d: d.itemsize, default=np.float64))
+
+    def to_arrays(self):
+        """{column: 1-D array, or 0-d array for a scalar column}, Month included."""
+        # A fresh view: unpickled datetime64 dtypes carry metadata that np.savez warns about
+        arrays = {"Month": self.months.view("datetime64[M]")}
+        arrays.update((name, np.asarray(values)) for name, values in self._columns.items())
+        return arrays
+
+    def batch(self):
+        """Columns as read-only (1, months) arrays, the `previous` argument of project_batch()."""
+        out = {"Month": self.months.astype("datetime64[D]")[None, :]}
+        for name, values in self._columns.items():
+            out[name] = np.broadcast_to(values, (1, len(self)))
+        return out
+
+    @property
+    def columns(self):
+        return ["Month", *self._columns]
+
+    def __len__(self):
+        return len(self.months)
+
+    def __contains__(self, name):
+        return name == "Month" or name in self._columns
+
+    def values(self, name):
+        """Full-length NumPy array of one column (Month as datetime64[M])."""
+        if name == "Month":
+            return self.months
+        return np.broadcast_to(self._columns[name], (len(self),))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == "Month":
+                return pd.Series(self.months.astype("datetime64[D]").astype(object), name=key)
+            return pd.Series(self.values(key), name=key)
+        return self.to_frame(key)
+
+    def __setitem__(self, name, values):
+        self._columns[name] = _compact(values, self.dtype)
+
+    def to_frame(self, columns=None):
+        """A pandas DataFrame of the given columns (all by default), for display and export."""
+        data = {}
+        for name in columns or self.columns:
+            data[name] = self.months.astype("datetime64[D]").astype(object) if name == "Month" else self.values(name)
+        return pd.DataFrame(data)
+
+    def drop(self, names):
+        """A new frame without the given columns; the arrays themselves are shared, not copied."""
+        names = set(names)
+        return CompactFrame(self.months, {n: v for n, v in self._columns.items() if n not in names}, self.dtype)
+
+    def astype(self, dtype):
+        """A new frame with float columns stored as dtype (e.g. float32 for plotting-only copies)."""
+        return CompactFrame(self.months, {n: _compact(v, dtype) for n, v in self._columns.items()}, dtype)
+
+    @property
+    def nbytes(self):
+        return self.months.nbytes + sum(np.asarray(v).nbytes for v in self._columns.values())
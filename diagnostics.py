@@ -0,0 +1,117 @@
+"""Per-rerun stage timing and optional cProfile capture for the app.
+
+Stage timers record wall time (perf_counter) and CPU time of the script
+thread (thread_time). With timing off, stage() hands back one shared no-op
+context manager and begin()/end() return immediately, so instrumented code
+costs a method call per stage.
+
+Timed reruns are logged as one JSON line each on the "diagnostics" logger
+(stderr). Set DIAGNOSTICS=1 to time every session by default, and
+ADMIN_TOKEN=<secret> to let visitors with ?admin=<secret> in the URL capture
+a cProfile dump of one rerun into PROFILE_DIR.
+"""
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "profiles"))
+
+ENABLED_BY_DEFAULT = os.environ.get("DIAGNOSTICS", "") not in ("", "0")
+
+logger = logging.getLogger("diagnostics")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_NULL_STAGE = nullcontext()
+
+
+def is_admin(query_params):
+    """Whether the URL carries the ADMIN_TOKEN (profiling is off when no token is configured)."""
+    token = os.environ.get("ADMIN_TOKEN")
+    return bool(token) and query_params.get("admin") == token
+
+
+class StageTimer:
+    """Wall and CPU time per named stage of one rerun."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self._open = {}
+        self._start = time.perf_counter()
+
+    def begin(self, name):
+        if self.enabled:
+            self._open[name] = (time.perf_counter(), time.thread_time())
+
+    def end(self, name):
+        if self.enabled:
+            wall, cpu = self._open.pop(name)
+            self._add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def merge(self, stages):
+        """Add stages timed by another StageTimer, e.g. one in a worker process."""
+        for name, (wall, cpu) in stages.items():
+            self._add(name, wall / 1000, cpu / 1000)
+
+    def _add(self, name, wall, cpu):
+        # A stage entered twice in one rerun accumulates
+        previous = self.stages.get(name, (0.0, 0.0))
+        self.stages[name] = (previous[0] + wall * 1000, previous[1] + cpu * 1000)
+
+    def summary(self):
+        """{"total_ms", "stages": {name: {"wall_ms", "cpu_ms"}}}"""
+        return {
+            "total_ms": (time.perf_counter() - self._start) * 1000,
+            "stages": {name: {"wall_ms": wall, "cpu_ms": cpu} for name, (wall, cpu) in self.stages.items()},
+        }
+
+    def log(self, **context):
+        """Emit this rerun's timings as one JSON log line."""
+        if self.enabled:
+            logger.info(json.dumps({"event": "rerun", **context, **self.summary()}, default=str))
+
+
+NULL_TIMER = StageTimer(enabled=False)
+
+
+class RerunProfiler:
+    """cProfile over one script rerun, dumped as a .pstats file."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self):
+        """Stop profiling and write the stats; returns the file path."""
+        self.stop()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"rerun-{datetime.now():%Y%m%d-%H%M%S-%f}.pstats")
+        self.profile.dump_stats(path)
+        return path
@@ -0,0 +1,156 @@
+"""Content-addressed on-disk cache of projection results.
+
+Results live under DISK_CACHE_DIR as compressed .npz files named by
+canonical_key(form_data), so any worker process (or a restarted dyno that
+shares the directory) can serve them. Writes are atomic renames done under an
+exclusive file lock, and the least recently used files are evicted once the
+directory grows past DISK_CACHE_MB.
+
+Warm-up, e.g. before `streamlit run` at boot:
+
+    python disk_cache.py warm [scenarios.json ...]
+
+Each JSON file holds a list of form_data dicts (dates as "YYYY-MM-DD"); the
+app's default inputs are always warmed.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, writes still land by atomic rename
+    fcntl = None
+
+from projection import build_result, default_form_data, result_from_arrays, result_to_arrays
+from result_cache import canonical_key
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "projections")
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npz")
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)  # mark as recently used for eviction
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        return result_from_arrays(arrays)
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **result_to_arrays(result))
+            with self._locked():
+                os.replace(tmp_path, path)
+                self._evict()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _files(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".npz"):
+                        yield entry
+
+    def _evict(self):
+        files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._files()]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        if not os.path.isdir(self.directory):
+            return {"entries": 0, "bytes": 0, "max_bytes": self.max_bytes}
+        sizes = [entry.stat().st_size for entry in self._files()]
+        return {"entries": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes}
+
+
+DISK_CACHE = DiskCache(
+    os.environ.get("DISK_CACHE_DIR", DEFAULT_DIR),
+    int(float(os.environ.get("DISK_CACHE_MB", "1024")) * 2**20),
+)
+
+
+def _load_scenarios(path):
+    with open(path) as f:
+        scenarios = json.load(f)
+    for form_data in scenarios:
+        if isinstance(form_data.get('kick_off_date'), str):
+            form_data['kick_off_date'] = date.fromisoformat(form_data['kick_off_date'])
+    return scenarios
+
+
+def warm(scenarios, cache=DISK_CACHE):
+    """Compute and store every scenario not already cached; returns how many were added."""
+    added = 0
+    for form_data in scenarios:
+        key = canonical_key(form_data)
+        if not os.path.exists(cache._path(key)):
+            cache.put(key, build_result(form_data))
+            added += 1
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm_parser = sub.add_parser("warm", help="pre-populate the cache")
+    warm_parser.add_argument("scenarios", nargs="*", help="JSON files with lists of form_data dicts")
+    sub.add_parser("stats", help="print entry count and size")
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        scenarios = [default_form_data()]
+        for path in args.scenarios:
+            scenarios.extend(_load_scenarios(path))
+        start = time.perf_counter()
+        added = warm(scenarios)
+        print(f"Warmed {added} of {len(scenarios)} scenarios in {time.perf_counter() - start:.2f}s "
+              f"into {DISK_CACHE.directory}")
+    else:
+        print(json.dumps(DISK_CACHE.stats()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,669 @@
+import re
+from datetime import date
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from channels import CHANNELS
+from cohorts import RETENTION_KEY, convolve_renewals, has_retention_inputs, retention_curves
+from plans import PLAN_KEY, plan_arrays, plan_new_paid
+
+# Default projection horizon (5 years of monthly rows)
+N_MONTHS = 60
+
+PAID_CHANNELS = [ch for ch in CHANNELS if ch.paid]
+
+# Per-year rate inputs, e.g. sem_traffic_gr_y7 or am_cr_y12, beyond the five the form has
+_SCHEDULE_KEY = re.compile(f"({'|'.join(re.escape(ch.key) for ch in CHANNELS)})_(traffic_gr|cr)_y\\d+")
+
+# Inputs scenario_arrays() passes through besides INPUT_KEYS: rate schedules, retention curves and price plans
+_PASSTHROUGH_KEY = re.compile("|".join(f"(?:{key.pattern})" for key in (_SCHEDULE_KEY, RETENTION_KEY, PLAN_KEY)))
+
+# Columns that make up the income statement, in display order
+FINANCIAL_COLUMNS = [
+    'Month',
+    'Year',
+    'Revenue',
+    'Chargebacks',
+    'Refunds',
+    'Income',
+    'Credit Card Processing',
+    'Web Hosting',
+    'Cost of Goods/Services Sold',
+    'Gross Income',
+    'Labor Cost',
+    *[ch.marketing_column for ch in PAID_CHANNELS],
+    'Internet Marketing Cost',
+    'Technology & Software',
+    'Earnings Before Taxes',
+    'Cash Flow Accumulation'
+]
+
+# Financial columns that are running balances: a period's value is its last month's, not the sum of its months
+BALANCE_COLUMNS = ['Cash Flow Accumulation']
+
+
+def default_inputs():
+    """The form defaults of the Streamlit app, as a form_data dict."""
+    inputs = {
+        'kick_off_date': date(date.today().year + 1, 1, 1),
+        'subscription_price': 25.5,
+        'free_trial_days': 7,
+        'trial_to_paid': 0.25,
+        'churn_rate': 0.25,
+    }
+    # Each channel's month-1 traffic, growth rates, conversion rates and CAC, grouped by kind
+    for prefix in ("_traffic_m1", "_traffic_gr_y", "_cr_y"):
+        for ch in CHANNELS:
+            inputs.update((key, value) for key, value in ch.defaults.items() if key.startswith(ch.key + prefix))
+    for ch in PAID_CHANNELS:
+        inputs[ch.cac_key] = ch.defaults[ch.cac_key]
+    inputs.update({
+        'ccp_rate': 0.10,
+        'refund_rate': 0.05,
+        'chb_rate': 0.005,
+        'monthly_web_hosting_cost': 300,
+        'monthly_techsoft_cost': 300,
+        'monthly_labor_cost': 10000,
+        'views per visit': 0.0,
+        'cpm': 5.0,
+        'am_ctr': 0.0,
+        'am_ocr': 0.0,
+        'am_cpa': 0.0,
+    })
+    return inputs
+
+
+INPUT_KEYS = list(default_inputs())
+
+# Inputs of optional channels, with the defaults scenarios that leave them out get
+OPTIONAL_INPUTS = {key: value for ch in CHANNELS if ch.optional for key, value in ch.defaults.items()}
+
+
+def scenario_arrays(scenarios):
+    """Turn a scenario table into {form_data key: 1-D array}.
+
+    `scenarios` can be a DataFrame whose columns are form_data keys, a list of
+    form_data dicts, or a single form_data dict (one scenario). Rate schedules
+    may run past year 5 (sem_cr_y6, sem_cr_y7, ...), and optional retention
+    curve inputs (see cohorts.py) and price plan inputs (see plans.py) are
+    passed through. Inputs of optional
+    channels (see channels.py) that are left out take their defaults.
+    """
+    if isinstance(scenarios, dict):
+        scenarios = [scenarios]
+    if isinstance(scenarios, pd.DataFrame):
+        columns = set(scenarios.columns)
+    else:
+        # Lists of dicts are read directly: building a DataFrame first costs more than the model
+        # once there are many channels' inputs
+        scenarios = list(scenarios)
+        columns = {key for row in scenarios for key in row}
+    missing = [key for key in INPUT_KEYS if key not in columns and key not in OPTIONAL_INPUTS]
+    if missing:
+        raise KeyError(f"Scenarios are missing inputs: {', '.join(missing)}")
+
+    keys = [key for key in INPUT_KEYS if key in columns and key != 'kick_off_date']
+    keys += sorted(c for c in columns.difference(INPUT_KEYS) if _PASSTHROUGH_KEY.fullmatch(str(c)))
+    if isinstance(scenarios, pd.DataFrame):
+        values = scenarios[keys].to_numpy(dtype=float)
+        kick_off_dates = scenarios['kick_off_date']
+    else:
+        values = np.array([[row.get(key, np.nan) for key in keys] for row in scenarios], dtype=float)
+        kick_off_dates = [row['kick_off_date'] for row in scenarios]
+    # One (inputs, scenarios) block, so each input is a contiguous row
+    arrays = dict(zip(keys, np.ascontiguousarray(values.reshape(-1, len(keys)).T)))
+    n_scenarios = values.shape[0]
+    for key, value in OPTIONAL_INPUTS.items():
+        if key not in columns:
+            arrays[key] = np.full(n_scenarios, float(value))
+    try:
+        arrays['kick_off_date'] = np.asarray(kick_off_dates, dtype='datetime64[D]')
+    except (TypeError, ValueError):
+        # Anything numpy doesn't parse itself (e.g. "2024/01/31")
+        arrays['kick_off_date'] = pd.to_datetime(kick_off_dates).to_numpy().astype('datetime64[D]')
+    return arrays
+
+
+def month_calendar(kick_off_dates, n_months=N_MONTHS):
+    """Return (dates, years, days_in_month), each shaped (scenarios, months)."""
+    kick_off_dates = np.asarray(kick_off_dates, dtype='datetime64[D]')
+    kick_off_month = kick_off_dates.astype('datetime64[M]')
+    month_starts = kick_off_month[:, None] + np.arange(n_months)
+    first_days = month_starts.astype('datetime64[D]')
+    days_count = ((month_starts + 1).astype('datetime64[D]') - first_days).astype(np.int64)
+    # Same day-of-month clamping as relativedelta(months=i)
+    day_of_month = (kick_off_dates - kick_off_month.astype('datetime64[D]')).astype(np.int64) + 1
+    dates = first_days + (np.minimum(day_of_month[:, None], days_count) - 1)
+    years = month_starts.astype('datetime64[Y]').astype(np.int64) + 1970
+    return dates, years, days_count
+
+
+def channel_rates(p, suffix):
+    """Every channel's yearly {key}_{suffix}1, {key}_{suffix}2, ... inputs as one (channels, scenarios, years) array.
+
+    Channels with shorter schedules repeat their last year, as monthly_schedule() does.
+    """
+    lengths = []
+    for ch in CHANNELS:
+        n_years = 0
+        while f'{ch.key}_{suffix}{n_years + 1}' in p:
+            n_years += 1
+        lengths.append(n_years)
+    n_years = max(lengths)
+    keys = [f'{ch.key}_{suffix}{min(y, length)}' for ch, length in zip(CHANNELS, lengths) for y in range(1, n_years + 1)]
+    return np.stack([p[key] for key in keys]).reshape(len(CHANNELS), n_years, -1).transpose(0, 2, 1)
+
+
+def monthly_schedule(yearly_values, n_months=N_MONTHS):
+    """Expand per-year values into a per-month array (the last year repeats)."""
+    yearly_values = np.asarray(yearly_values, dtype=float)
+    year_idx = np.minimum(np.arange(n_months) // 12, yearly_values.shape[-1] - 1)
+    return yearly_values[..., year_idx]
+
+
+def compound(first_value, monthly_rates):
+    """Month-over-month compounding: x[0] = first_value, x[i] = x[i-1] * (1 + rate[i])."""
+    factors = 1 + np.asarray(monthly_rates, dtype=float)
+    factors[..., 0] = first_value
+    return np.cumprod(factors, axis=-1)
+
+
+def renewal_recurrence(new_paid, renewal_rate):
+    """Solve r[0] = 0, r[i] = (new_paid[i-1] + r[i-1]) * renewal_rate without a Python loop.
+
+    Unrolled, r[t] = sum(new_paid[s] * renewal_rate**(t - s) for s < t). That sum is
+    evaluated block by block as a rescaled cumsum; blocks are kept short enough that
+    renewal_rate**-block never overflows, and each block's last value carries into the next.
+    """
+    new_paid = np.asarray(new_paid, dtype=float)
+    rate = np.asarray(renewal_rate, dtype=float)[..., None]
+    n_months = new_paid.shape[-1]
+    dead = rate == 0
+    rate = np.where(dead, 1.0, rate)
+
+    min_rate = rate.min()
+    block = n_months if min_rate >= 1 else max(1, min(n_months, int(600 / -np.log(min_rate))))
+
+    renewals = np.zeros_like(new_paid)
+    carry = np.zeros(new_paid.shape[:-1] + (1,))
+    for start in range(0, n_months, block):
+        stop = min(start + block, n_months)
+        steps = np.arange(stop - start + 1)
+        scaled = new_paid[..., start:stop] * rate ** -steps[:-1]
+        acc = np.concatenate([carry, carry + np.cumsum(scaled, axis=-1)], axis=-1)
+        values = rate ** steps * acc
+        renewals[..., start:stop] = values[..., :-1]
+        carry = values[..., -1:]
+    return np.where(dead, 0.0, renewals)
+
+
+def billing_renewals(new_paid, renewal_rate, billing_months):
+    """renewal_recurrence() for users billed every billing_months months: r[t] = (new_paid[t-B] + r[t-B]) * rate.
+
+    Rows with the same billing period are folded into (rows, B, cycles), so the
+    recurrence runs along the cycle axis; there is one pass per distinct billing
+    period, however many rows share it. renewal_rate and billing_months
+    broadcast against new_paid's leading axes.
+    """
+    new_paid = np.asarray(new_paid, dtype=float)
+    shape, n_months = new_paid.shape, new_paid.shape[-1]
+    rows = new_paid.reshape(-1, n_months)
+    rate = np.broadcast_to(renewal_rate, shape[:-1]).reshape(-1)
+    period = np.broadcast_to(billing_months, shape[:-1]).reshape(-1)
+    renewals = np.zeros_like(rows)
+    for months in np.unique(period):
+        idx = np.flatnonzero(period == months)
+        if months == 1:
+            renewals[idx] = renewal_recurrence(rows[idx], rate[idx])
+            continue
+        n_cycles = -(-n_months // months)
+        folded = np.zeros((len(idx), n_cycles * months))
+        folded[:, :n_months] = rows[idx]
+        folded = folded.reshape(len(idx), n_cycles, months).transpose(0, 2, 1)
+        values = renewal_recurrence(folded, rate[idx][:, None])
+        renewals[idx] = values.transpose(0, 2, 1).reshape(len(idx), -1)[:, :n_months]
+    return renewals.reshape(shape)
+
+
+class _Node:
+    """Columns computed together, the form_data keys they read and the columns they use."""
+
+    def __init__(self, columns, inputs, deps, compute):
+        self.columns = columns
+        self.inputs = inputs
+        self.deps = deps
+        self.compute = compute
+
+    def reads(self, key):
+        return any(key == name or (name.endswith("*") and key.startswith(name[:-1])) for name in self.inputs)
+
+
+# The model as a graph of column nodes, in evaluation (and output column) order
+GRAPH = []
+
+
+def _node(columns, inputs=(), deps=()):
+    """Register a node; compute(m) returns one array, or a tuple matching columns."""
+    columns = (columns,) if isinstance(columns, str) else tuple(columns)
+
+    def register(compute):
+        GRAPH.append(_Node(columns, tuple(inputs), tuple(deps), compute))
+        return compute
+    return register
+
+
+class _Model:
+    """What a node sees: the scenario arrays and the columns computed so far."""
+
+    def __init__(self, p, n_months):
+        self.p = p
+        self.n_months = n_months
+        self.n_scenarios = len(p['kick_off_date'])
+        self.out = {}
+
+    def col(self, key):
+        return self.p[key][:, None]
+
+    def flat(self, key):
+        return np.broadcast_to(self.col(key), (self.n_scenarios, self.n_months))
+
+    def __getitem__(self, column):
+        return self.out[column]
+
+    def views_per_visit(self):
+        return np.where(self.col('views per visit') == 0, 0.000000001, self.col('views per visit'))
+
+    @cached_property
+    def plans(self):
+        """The scenarios' price plans (see plans.plan_arrays()), or None when they have none."""
+        return plan_arrays(self.p, self.n_months)
+
+    @cached_property
+    def plan_new_paid(self):
+        """(plans, scenarios, months) new paying users per plan."""
+        return plan_new_paid(self["Total Monthly Subscriptions"], self["Days Count"], self.plans)
+
+    @cached_property
+    def plan_renewals(self):
+        """(plans, scenarios, months) renewal transactions per plan, each on its billing period."""
+        return billing_renewals(self.plan_new_paid, 1 - self.plans["churn_rate"], self.plans["billing_months"])
+
+    def by_plan(self, portfolio, single):
+        """portfolio() summed over plans for scenarios with price plans, single() for the rest.
+
+        portfolio() returns a (plans, scenarios, months) array; each is only called when needed.
+        """
+        if self.plans is None:
+            return single()
+        total = portfolio().sum(axis=0)
+        if self.plans["use"].all():
+            return total
+        return np.where(self.plans["use"][:, None], total, single())
+
+
+TRAFFIC_COLUMNS = {ch.key: ch.traffic_column for ch in CHANNELS}
+SUBSCRIPTION_COLUMNS = {ch.key: ch.subscriptions_column for ch in CHANNELS}
+MARKETING_COLUMNS = {ch.key: ch.marketing_column for ch in PAID_CHANNELS}
+
+
+@_node(["Month", "Year", "Days Count", "Cross-Over Month Trial-To-Paid", "Trial-To-Paid Within Month"],
+       inputs=["kick_off_date", "free_trial_days"])
+def _calendar(m):
+    # Sweeps rarely vary the launch date, so build each distinct calendar once
+    kick_off_dates, calendar_idx = np.unique(m.p['kick_off_date'], return_inverse=True)
+    dates, years, days_count = (a[calendar_idx] for a in month_calendar(kick_off_dates, m.n_months))
+    cross_over = m.col('free_trial_days') / days_count
+    return dates, years, days_count, cross_over, 1 - cross_over
+
+
+# Channels are computed together along a leading channel axis, (channels, scenarios, months), so each
+# channel's column is a contiguous slice and adding channels adds no Python-level work per month
+@_node(TRAFFIC_COLUMNS.values(), inputs=[p for ch in CHANNELS for p in (f'{ch.key}_traffic_m1', f'{ch.key}_traffic_gr_y*')])
+def _traffic(m):
+    growth = monthly_schedule(channel_rates(m.p, 'traffic_gr_y'), m.n_months)
+    first = np.stack([m.p[f'{ch.key}_traffic_m1'] for ch in CHANNELS])
+    return tuple(compound(first, growth))
+
+
+@_node(SUBSCRIPTION_COLUMNS.values(), inputs=[f'{ch.key}_cr_y*' for ch in CHANNELS], deps=TRAFFIC_COLUMNS.values())
+def _subscriptions(m):
+    traffic = np.stack([m[column] for column in TRAFFIC_COLUMNS.values()])
+    return tuple(traffic * monthly_schedule(channel_rates(m.p, 'cr_y'), m.n_months))
+
+
+@_node("Total Monthly Subscriptions", deps=SUBSCRIPTION_COLUMNS.values())
+def _total_subscriptions(m):
+    return np.stack([m[column] for column in SUBSCRIPTION_COLUMNS.values()]).sum(axis=0)
+
+
+@_node("Website Views", inputs=["views per visit"], deps=TRAFFIC_COLUMNS.values())
+def _website_views(m):
+    return np.stack([m[column] for column in TRAFFIC_COLUMNS.values()]).sum(axis=0) * m.views_per_visit()
+
+
+def _single_trial_to_paid(m):
+    # Trials convert within the month they start, or spill over into the next one
+    total_subscriptions, cross_over = m["Total Monthly Subscriptions"], m["Cross-Over Month Trial-To-Paid"]
+    ttp = total_subscriptions * m["Trial-To-Paid Within Month"] * m.col('trial_to_paid')
+    ttp[:, 1:] += total_subscriptions[:, :-1] * cross_over[:, :-1] * m.col('trial_to_paid')
+    return ttp
+
+
+def _single_renewals(m):
+    ttp = m["Trial To Paid Transactions Count"]
+    if has_retention_inputs(m.p):
+        return convolve_renewals(ttp, retention_curves(m.p, m.n_months))
+    return renewal_recurrence(ttp, 1 - m.p['churn_rate'])
+
+
+# Scenarios with price plans (plans.py) sum their plans' (plans, scenarios, months) arrays into these columns
+@_node("Trial To Paid Transactions Count", inputs=["trial_to_paid", "plan*"],
+       deps=["Total Monthly Subscriptions", "Cross-Over Month Trial-To-Paid", "Trial-To-Paid Within Month",
+             "Days Count"])
+def _trial_to_paid(m):
+    return m.by_plan(lambda: m.plan_new_paid, lambda: _single_trial_to_paid(m))
+
+
+@_node("Monthly Renewal Transactions Count", inputs=["churn_rate", "retention_*", "plan*"],
+       deps=["Trial To Paid Transactions Count"])
+def _renewals(m):
+    return m.by_plan(lambda: m.plan_renewals, lambda: _single_renewals(m))
+
+
+@_node("New Monthly Recurring Revenue MRR", inputs=["subscription_price", "plan*"],
+       deps=["Trial To Paid Transactions Count"])
+def _new_mrr(m):
+    return m.by_plan(lambda: m.plan_new_paid * m.plans["price"][..., None],
+                     lambda: m["Trial To Paid Transactions Count"] * m.col('subscription_price'))
+
+
+@_node("Renewal Recurring Revenue MRR", inputs=["subscription_price", "plan*"],
+       deps=["Monthly Renewal Transactions Count"])
+def _renewal_mrr(m):
+    return m.by_plan(lambda: m.plan_renewals * m.plans["price"][..., None],
+                     lambda: m["Monthly Renewal Transactions Count"] * m.col('subscription_price'))
+
+
+@_node("Ad Network Revenue", inputs=["cpm", "views per visit"], deps=["Website Views"])
+def _ad_network_revenue(m):
+    cpm = np.where(m.col('views per visit') == 0, 0, m.col('cpm'))
+    return m["Website Views"] * (cpm / 1000)
+
+
+@_node("Ad Affiliate Revenue", inputs=["am_ctr", "am_ocr", "am_cpa", "views per visit"], deps=["Website Views"])
+def _ad_affiliate_revenue(m):
+    return m["Website Views"] * m.col('am_ctr') * m.col('am_ocr') * m.col('am_cpa') / m.views_per_visit()
+
+
+@_node("Revenue", deps=["Renewal Recurring Revenue MRR", "New Monthly Recurring Revenue MRR",
+                        "Ad Network Revenue", "Ad Affiliate Revenue"])
+def _revenue(m):
+    return m['Renewal Recurring Revenue MRR'] + m['New Monthly Recurring Revenue MRR'] + m["Ad Network Revenue"] + m['Ad Affiliate Revenue']
+
+
+@_node("Chargebacks", inputs=["chb_rate"], deps=["Revenue"])
+def _chargebacks(m):
+    return m['Revenue'] * m.col('chb_rate')
+
+
+@_node("Refunds", inputs=["refund_rate"], deps=["Revenue"])
+def _refunds(m):
+    return m['Revenue'] * m.col('refund_rate')
+
+
+@_node("Income", deps=["Revenue", "Refunds", "Chargebacks"])
+def _income(m):
+    return m['Revenue'] - m['Refunds'] - m['Chargebacks']
+
+
+@_node("Credit Card Processing", inputs=["ccp_rate"], deps=["Revenue"])
+def _credit_card_processing(m):
+    return m['Revenue'] * m.col('ccp_rate')
+
+
+@_node("Web Hosting", inputs=["monthly_web_hosting_cost"])
+def _web_hosting(m):
+    return m.flat('monthly_web_hosting_cost')
+
+
+@_node("Cost of Goods/Services Sold", deps=["Credit Card Processing", "Web Hosting"])
+def _cogs(m):
+    return m['Credit Card Processing'] + m['Web Hosting']
+
+
+@_node("Gross Income", deps=["Income", "Cost of Goods/Services Sold"])
+def _gross_income(m):
+    return m['Income'] - m['Cost of Goods/Services Sold']
+
+
+@_node("Labor Cost", inputs=["monthly_labor_cost"])
+def _labor_cost(m):
+    return m.flat('monthly_labor_cost')
+
+
+@_node(MARKETING_COLUMNS.values(), inputs=[ch.cac_key for ch in PAID_CHANNELS],
+       deps=[ch.subscriptions_column for ch in PAID_CHANNELS])
+def _marketing(m):
+    subscriptions = np.stack([m[ch.subscriptions_column] for ch in PAID_CHANNELS])
+    cac = np.stack([m.col(ch.cac_key) for ch in PAID_CHANNELS])
+    return tuple(subscriptions * cac)
+
+
+@_node("Internet Marketing Cost", deps=MARKETING_COLUMNS.values())
+def _internet_marketing_cost(m):
+    return np.stack([m[column] for column in MARKETING_COLUMNS.values()]).sum(axis=0)
+
+
+@_node("Technology & Software", inputs=["monthly_techsoft_cost"])
+def _techsoft(m):
+    return m.flat('monthly_techsoft_cost')
+
+
+@_node("Earnings Before Taxes", deps=["Gross Income", "Labor Cost", "Internet Marketing Cost", "Technology & Software"])
+def _ebt(m):
+    return m['Gross Income'] - m['Labor Cost'] - m['Internet Marketing Cost'] - m['Technology & Software']
+
+
+@_node("Cash Flow Accumulation", deps=["Earnings Before Taxes"])
+def _cash_flow(m):
+    return np.cumsum(m['Earnings Before Taxes'], axis=1)
+
+
+@_node("Internet Marketing CAC Weighted average", deps=["Internet Marketing Cost",
+                                                        *[ch.subscriptions_column for ch in PAID_CHANNELS]])
+def _cac_weighted_average(m):
+    paid_subscriptions = np.stack([m[ch.subscriptions_column] for ch in PAID_CHANNELS]).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return m['Internet Marketing Cost'] / paid_subscriptions
+
+
+def changed_inputs(old, new):
+    """form_data keys whose value differs between two form_data dicts (or exists in only one)."""
+    return {key for key in old.keys() | new.keys() if key not in old or key not in new or old[key] != new[key]}
+
+
+def stale_columns(changed):
+    """Every column downstream of the changed form_data keys."""
+    stale = set()
+    for node in GRAPH:
+        if any(node.reads(key) for key in changed) or stale.intersection(node.deps):
+            stale.update(node.columns)
+    return stale
+
+
+def project_batch(scenarios, n_months=N_MONTHS, previous=None, stale=None):
+    """Evaluate many scenarios at once over an n_months horizon.
+
+    Every step is a whole-array operation along the month axis, so run time
+    grows linearly with the horizon. Returns {column: array shaped
+    (scenarios, months)} with the same columns as project(). Columns that are
+    a flat monthly cost are read-only broadcast views.
+
+    Given a previous result for the same scenarios and horizon, only the
+    `stale` columns (see stale_columns()) and any missing from `previous` are
+    recomputed; the rest are reused.
+    """
+    m = _Model(scenario_arrays(scenarios), n_months)
+    for node in GRAPH:
+        if (previous is not None and stale is not None and stale.isdisjoint(node.columns)
+                and all(column in previous for column in node.columns)):
+            values = tuple(previous[column] for column in node.columns)
+        else:
+            values = node.compute(m)
+            values = values if len(node.columns) > 1 else (values,)
+        m.out.update(zip(node.columns, values))
+    return m.out
+
+
+def project(form_data, n_months=N_MONTHS, previous=None, stale=None):
+    """Build the monthly projection DataFrame for one set of form inputs.
+
+    previous/stale: an earlier project() DataFrame with the same horizon and the
+    columns to recompute (see project_batch()).
+    """
+    if previous is not None:
+        previous = {name: np.asarray(previous[name].to_numpy())[None, :] for name in previous.columns}
+        previous["Month"] = previous["Month"].astype('datetime64[D]')
+    batch = project_batch(form_data, n_months, previous, stale)
+    df = pd.DataFrame({name: values[0] for name, values in batch.items()})
+    df["Month"] = batch["Month"][0].astype(object)
+    return df
+
+
+def cac_payback_months(cac, subscription_price, trial_to_paid, churn_rate, free_trial_days):
+    """Months until a customer's cumulative value recovers each CAC; all arguments broadcast.
+
+    A paid user is worth first = price * trial_to_paid in their first paid month
+    and that value decays by the renewal rate r = 1 - churn, so after k + 1
+    payments they are worth first * (1 - r**(k+1)) / (1 - r). The payback month
+    is the smallest such k, solved with logarithms, counted from the end of the
+    free trial (free_trial_days / 30). The schedule stops once it reaches 99.9%
+    of LTV, and CACs not recovered by then get NaN ("No Pay Back"). CACs above
+    LTV get inf ("Not Profitable").
+    """
+    cac = np.asarray(cac, dtype=float)
+    first = np.asarray(subscription_price, dtype=float) * trial_to_paid
+    r = np.clip(1 - np.asarray(churn_rate, dtype=float), 0, 1)
+    # Absorbs float noise when a CAC sits exactly on a cumulative value
+    tol = 1e-9
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ltv = np.where(r < 1, first / (1 - r), np.where(first > 0, np.inf, 0.0))
+        log_r = np.log(r)
+        remaining = 1 - cac * (1 - r) / first
+        k = np.ceil(np.log(remaining) / log_r - 1 - tol)
+        k = np.where(remaining <= 0, np.where(r == 0, 0, np.nan), k)
+        k = np.where(r == 1, np.ceil(cac / first - tol) - 1, k)
+        k = np.where(cac <= 0, 0, np.maximum(k, 0))
+        # Number of months kept in the schedule before it reaches 99.9% of LTV
+        n_periods = np.where((r > 0) & (r < 1), np.ceil(np.log(0.001) / log_r - tol), 1)
+        n_periods = np.where(r == 1, np.inf, np.maximum(n_periods, 1))
+
+    months = np.asarray(free_trial_days, dtype=float) / 30 + k
+    months = np.where(k < n_periods, months, np.nan)
+    return np.where(ltv < cac, np.inf, months)
+
+
+def key_metrics(scenarios):
+    """Key Metrics Summary values for every scenario, as {name: 1-D array}.
+
+    ROI percentages are NaN where the CAC is 0 (shown as N/A in the app).
+    """
+    p = scenario_arrays(scenarios)
+    renewal_rate = 1 - p['churn_rate']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ltv = (p['subscription_price'] * p['trial_to_paid']) / (1 - renewal_rate)
+        sem_roi = ltv - p['sem_cpa']
+        affiliate_roi = ltv - p['affiliate_cpa']
+        sem_roi_percent = np.where(p['sem_cpa'] == 0, np.nan, sem_roi / p['sem_cpa'])
+        affiliate_roi_percent = np.where(p['affiliate_cpa'] == 0, np.nan, affiliate_roi / p['affiliate_cpa'])
+    payback = cac_payback_months(
+        np.stack([p['sem_cpa'], p['affiliate_cpa']]), p['subscription_price'], p['trial_to_paid'],
+        p['churn_rate'], p['free_trial_days'])
+    return {
+        "renewal_rate": renewal_rate,
+        "ltv": ltv,
+        "sem_roi": sem_roi,
+        "sem_roi_percent": sem_roi_percent,
+        "affiliate_roi": affiliate_roi,
+        "affiliate_roi_percent": affiliate_roi_percent,
+        "sem_payback_months": payback[0],
+        "affiliate_payback_months": payback[1],
+    }
+
+
+def payback_label(months):
+    """Key Metrics Summary wording for a cac_payback_months() value."""
+    if np.isnan(months):
+        return "No Pay Back"
+    if np.isinf(months):
+        return "Not Profitable"
+    if months == 0.0:
+        return "Immediately"
+    return f"{months:,.2f}"
+
+
+def fiscal_year(months, fiscal_start_month=1):
+    """Fiscal year of datetime64 months, named by the calendar year it ends in."""
+    shifted = np.asarray(months, dtype="datetime64[M]").astype(np.int64) - (fiscal_start_month - 1)
+    return 1970 + shifted // 12 + (fiscal_start_month > 1)
+
+
+def yearly_batch(batch, fiscal_start_month=1):
+    """Sum the financial columns of a project_batch() result by year (fiscal years starting in fiscal_start_month).
+
+    Returns {column: array shaped (scenarios, years)} plus "Year" labels.
+    BALANCE_COLUMNS take their year-end value instead. If scenarios launch in
+    different months, years with no months in them are 0. (A single result's
+    fiscal-year, quarter and TTM rollups are in rollups.py.)
+    """
+    years = batch["Year"] if fiscal_start_month == 1 else fiscal_year(batch["Month"], fiscal_start_month)
+    year_offset = years - years[:, :1]
+    n_scenarios = years.shape[0]
+    n_years = int(year_offset.max()) + 1
+    flow_columns = [c for c in FINANCIAL_COLUMNS if c not in ("Month", "Year", *BALANCE_COLUMNS)]
+
+    out = {"Year": years[:, :1] + np.arange(n_years)}
+    if (year_offset == year_offset[0]).all():
+        # Every scenario shares the same month-to-year layout: one reduceat per column
+        starts = np.flatnonzero(np.diff(year_offset[0], prepend=-1))
+        for c in flow_columns:
+            out[c] = np.add.reduceat(batch[c], starts, axis=1)
+        year_ends = np.append(starts[1:], years.shape[1]) - 1
+        for c in BALANCE_COLUMNS:
+            out[c] = batch[c][:, year_ends]
+    else:
+        bins = (np.arange(n_scenarios)[:, None] * n_years + year_offset).ravel()
+        for c in flow_columns:
+            sums = np.bincount(bins, weights=np.ravel(batch[c]), minlength=n_scenarios * n_years)
+            out[c] = sums.reshape(n_scenarios, n_years)
+        rows, year_ends = np.nonzero(np.diff(year_offset, axis=1, append=n_years) != 0)
+        for c in BALANCE_COLUMNS:
+            out[c] = np.zeros((n_scenarios, n_years))
+            out[c][rows, year_offset[rows, year_ends]] = batch[c][rows, year_ends]
+    # Income statement column order
+    return {c: out[c] for c in FINANCIAL_COLUMNS if c in out}
+
+
+def financials_by_year_batch(scenarios, n_months=N_MONTHS, chunk_size=20000):
+    """Yearly income statement for every scenario, as one long DataFrame.
+
+    Rows are (Scenario, Year) with the yearly_batch() columns.
+    Scenarios are evaluated chunk_size at a time to keep memory bounded.
+    """
+    if isinstance(scenarios, dict):
+        scenarios = [scenarios]
+    if not isinstance(scenarios, pd.DataFrame):
+        scenarios = pd.DataFrame(list(scenarios))
+
+    frames = []
+    for start in range(0, len(scenarios), chunk_size):
+        chunk = scenarios.iloc[start:start + chunk_size]
+        yearly = yearly_batch(project_batch(chunk, n_months))
+        n_scenarios, n_years = yearly["Year"].shape
+        frame = pd.DataFrame({name: values.ravel() for name, values in yearly.items()})
+        frame.insert(0, "Scenario", np.repeat(chunk.index.to_numpy(), n_years))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,232 @@
+"""Downloadable exports of projections: multi-sheet XLSX, CSV or Parquet.
+
+    python export.py scenarios.csv out.xlsx [--chunk-size 2000] [--horizon-years 5]
+
+A single result exports its full monthly table (every intermediate column),
+the fiscal-year, quarterly and TTM income statements (from the result's
+rollup cube, see rollups.py), the Key Metrics Summary and the inputs. Batch
+exports evaluate a scenario file chunk by chunk (see batch_runner.py) and
+append each chunk to the output as it goes, so memory stays bounded by the
+chunk size. XLSX is written in constant-memory mode, with currency formats
+on money columns; CSV and Parquet come as a .zip with one file per table.
+
+In the app, exports run on EXPORT_POOL threads so the script thread only
+checks on them. The writers are imported when an export starts, not with the app.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engine import MARKETING_COLUMNS, key_metrics, project_batch, yearly_batch
+
+FORMATS = {"xlsx": ".xlsx", "csv": ".csv.zip", "parquet": ".parquet.zip"}
+
+EXPORT_DIR = os.environ.get(
+    "EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "exports"))
+
+# Finished exports older than this are removed when the next one starts
+EXPORT_TTL_SECONDS = 3600
+
+EXPORT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+# Columns shown as dollars in XLSX; every other numeric column gets a plain number format
+CURRENCY_COLUMNS = {
+    'New Monthly Recurring Revenue MRR', 'Renewal Recurring Revenue MRR', 'Ad Network Revenue',
+    'Ad Affiliate Revenue', 'Revenue', 'Chargebacks', 'Refunds', 'Income', 'Credit Card Processing',
+    'Web Hosting', 'Cost of Goods/Services Sold', 'Gross Income', 'Labor Cost', *MARKETING_COLUMNS.values(),
+    'Internet Marketing Cost', 'Technology & Software', 'Earnings Before Taxes',
+    'Cash Flow Accumulation', 'Internet Marketing CAC Weighted average', 'ltv', 'sem_roi', 'affiliate_roi',
+}
+
+_XLSX_MAX_ROWS = 1048576
+
+
+class _XlsxSink:
+    """Appends DataFrames to named sheets, row by row, starting a new sheet when one fills up."""
+
+    def __init__(self, path):
+        import xlsxwriter
+        self.workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "nan_inf_to_errors": True})
+        self.formats = {
+            "currency": self.workbook.add_format({"num_format": "$#,##0.00"}),
+            "number": self.workbook.add_format({"num_format": "#,##0.00"}),
+            "date": self.workbook.add_format({"num_format": "mmm-yyyy"}),
+            "header": self.workbook.add_format({"bold": True, "bottom": 1}),
+        }
+        self.sheets = {}
+
+    def _new_sheet(self, table, part, columns):
+        worksheet = self.workbook.add_worksheet(table if part == 1 else f"{table} ({part})")
+        worksheet.write_row(0, 0, columns, self.formats["header"])
+        worksheet.freeze_panes(1, 0)
+        return {"worksheet": worksheet, "row": 1, "part": part, "columns": columns}
+
+    def append(self, table, frame):
+        sheet = self.sheets.get(table)
+        if sheet is None:
+            sheet = self.sheets[table] = self._new_sheet(table, 1, list(frame.columns))
+            self._format_columns(sheet["worksheet"], frame)
+        date_columns = [i for i, name in enumerate(frame.columns) if frame[name].dtype.kind == "M"]
+        values = frame.astype(object).where(frame.notna(), None).to_numpy()
+        for i in date_columns:
+            values[:, i] = [None if v is None else v.to_pydatetime() for v in values[:, i]]
+        for row in values:
+            if sheet["row"] == _XLSX_MAX_ROWS:
+                sheet = self.sheets[table] = self._new_sheet(table, sheet["part"] + 1, sheet["columns"])
+                self._format_columns(sheet["worksheet"], frame)
+            sheet["worksheet"].write_row(sheet["row"], 0, row)
+            sheet["row"] += 1
+
+    def _format_columns(self, worksheet, frame):
+        for i, name in enumerate(frame.columns):
+            kind = frame[name].dtype.kind
+            if kind == "M":
+                worksheet.set_column(i, i, 12, self.formats["date"])
+            elif name in CURRENCY_COLUMNS:
+                worksheet.set_column(i, i, 16, self.formats["currency"])
+            elif kind == "f":
+                worksheet.set_column(i, i, 14, self.formats["number"])
+            else:
+                worksheet.set_column(i, i, max(10, min(40, len(str(name)) + 2)))
+
+    def close(self):
+        self.workbook.close()
+
+
+class _FileSink:
+    """Appends DataFrames to one CSV or Parquet file per table, zipped up on close."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.directory = tempfile.mkdtemp(dir=os.path.dirname(path))
+        self.writers = {}
+
+    def append(self, table, frame):
+        name = os.path.join(self.directory, f"{table.lower().replace(' ', '_')}.{self.fmt}")
+        if self.fmt == "csv":
+            frame.to_csv(name, mode="a", header=table not in self.writers, index=False)
+            self.writers[table] = name
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            batch = pa.Table.from_pandas(frame, preserve_index=False)
+            if table not in self.writers:
+                self.writers[table] = pq.ParquetWriter(name, batch.schema)
+            self.writers[table].write_table(batch)
+
+    def close(self):
+        for writer in self.writers.values():
+            if self.fmt == "parquet":
+                writer.close()
+        compression = zipfile.ZIP_DEFLATED if self.fmt == "csv" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(self.path, "w", compression) as archive:
+            for name in sorted(os.listdir(self.directory)):
+                archive.write(os.path.join(self.directory, name), name)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _open(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    now = time.time()
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file() and now - entry.stat().st_mtime > EXPORT_TTL_SECONDS:
+            os.remove(entry.path)
+    fd, path = tempfile.mkstemp(prefix="projection-", suffix=FORMATS[fmt], dir=EXPORT_DIR)
+    os.close(fd)
+    return path, (_XlsxSink(path) if fmt == "xlsx" else _FileSink(path, fmt))
+
+
+def stage_upload(name, data):
+    """Write an uploaded scenario file into EXPORT_DIR so export_batch() can read it in chunks; returns its path."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=os.path.splitext(name)[1], dir=EXPORT_DIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _inputs_frame(form_data):
+    return pd.DataFrame({"Input": list(form_data), "Value": [str(value) for value in form_data.values()]})
+
+
+def export_result(fmt, form_data, result, metrics_df):
+    """Write one build_result() as an export file; returns its path."""
+    path, sink = _open(fmt)
+    try:
+        monthly = result["df"].to_frame()
+        monthly["Month"] = pd.to_datetime(monthly["Month"])
+        sink.append("Monthly", monthly)
+        # Income statements from the result's rollup cube
+        rollups = result["rollups"]
+        sink.append("Yearly", rollups["Fiscal Year"])
+        sink.append("Quarterly", rollups["Quarter"])
+        sink.append("TTM", rollups["TTM"])
+        sink.append("Key Metrics", metrics_df)
+        sink.append("Inputs", _inputs_frame(form_data))
+    finally:
+        sink.close()
+    return path
+
+
+def export_batch(fmt, input_path, chunk_size=2000, horizon_years=5):
+    """Evaluate every scenario of a CSV/Parquet file and stream it into an export file; returns its path."""
+    from batch_runner import _with_defaults, read_chunks
+
+    path, sink = _open(fmt)
+    offset = 0
+    try:
+        for chunk in read_chunks(input_path, chunk_size):
+            chunk = _with_defaults(chunk, horizon_years)
+            if "scenario_id" not in chunk.columns:
+                chunk["scenario_id"] = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+            for group_horizon, group in chunk.groupby("horizon_years", sort=False):
+                batch = project_batch(group, 12 * int(group_horizon))
+                yearly = yearly_batch(batch)
+                ids = group["scenario_id"].to_numpy()
+                n_months = batch["Revenue"].shape[1]
+                n_years = yearly["Year"].shape[1]
+
+                monthly = {"Scenario": np.repeat(ids, n_months)}
+                monthly.update({name: np.ravel(values) for name, values in batch.items()})
+                sink.append("Monthly", pd.DataFrame(monthly))
+                yearly_columns = {"Scenario": np.repeat(ids, n_years)}
+                yearly_columns.update({name: values.ravel() for name, values in yearly.items()})
+                sink.append("Yearly", pd.DataFrame(yearly_columns))
+                metrics = {"Scenario": ids}
+                metrics.update(key_metrics(group))
+                sink.append("Key Metrics", pd.DataFrame(metrics))
+    finally:
+        sink.close()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file of scenarios")
+    parser.add_argument("output", help="destination; the format comes from its extension (.xlsx, .csv.zip, .parquet.zip)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="scenarios evaluated per chunk (default 2000)")
+    parser.add_argument("--horizon-years", type=int, default=5, help="horizon for rows without horizon_years")
+    args = parser.parse_args(argv)
+
+    fmt = next((fmt for fmt, suffix in FORMATS.items() if args.output.endswith(suffix)), None)
+    if fmt is None:
+        parser.error(f"output must end in one of {', '.join(FORMATS.values())}")
+    start = time.perf_counter()
+    shutil.move(export_batch(fmt, args.input, args.chunk_size, args.horizon_years), args.output)
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
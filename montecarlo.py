@@ -0,0 +1,230 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from engine import N_MONTHS, month_calendar, project_batch, yearly_batch
+from worker_pool import PoolBusy
+
+DISTRIBUTIONS = ("normal", "triangular", "uniform", "bootstrap")
+
+PERCENTILES = (5, 50, 95)
+
+# Inputs that are fractions and must stay within [0, 1] after sampling
+_FRACTION_SUFFIXES = ("_rate", "trial_to_paid", "am_ctr", "am_ocr")
+
+
+def _is_fraction(key):
+    return key.endswith(_FRACTION_SUFFIXES) or "_cr_y" in key or "_traffic_gr_y" in key
+
+
+def draw(spec, n, rng):
+    """Sample n values from a distribution spec such as {"kind": "normal", "mean": 0.25, "sd": 0.05}."""
+    kind = spec["kind"]
+    if kind == "normal":
+        return rng.normal(spec["mean"], spec["sd"], n)
+    if kind in ("triangular", "uniform") and spec["low"] == spec["high"]:
+        # numpy rejects a zero-width triangular; the input is simply fixed
+        return np.full(n, float(spec["low"]))
+    if kind == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], n)
+    if kind == "uniform":
+        return rng.uniform(spec["low"], spec["high"], n)
+    if kind == "bootstrap":
+        return rng.choice(np.asarray(spec["values"], dtype=float), n, replace=True)
+    raise ValueError(f"Unknown distribution '{kind}', expected one of {DISTRIBUTIONS}")
+
+
+def check_distribution(key, spec):
+    """Raise ValueError if a distribution spec can't be sampled."""
+    kind = spec["kind"]
+    if kind == "normal":
+        if not spec["sd"] >= 0:
+            raise ValueError(f"'{key}': the standard deviation must not be negative")
+    elif kind == "triangular":
+        if not spec["low"] <= spec["mode"] <= spec["high"]:
+            raise ValueError(f"'{key}': a triangular distribution needs low <= mode <= high")
+    elif kind == "uniform":
+        if not spec["low"] <= spec["high"]:
+            raise ValueError(f"'{key}': a uniform distribution needs low <= high")
+    elif kind == "bootstrap":
+        if len(spec["values"]) == 0:
+            raise ValueError(f"'{key}': no observed values to bootstrap from")
+    else:
+        raise ValueError(f"'{key}': unknown distribution '{kind}', expected one of {DISTRIBUTIONS}")
+
+
+def bootstrap_specs(csv_file):
+    """One bootstrap spec per column of a CSV of observed input values."""
+    observed = pd.read_csv(csv_file)
+    return {key: {"kind": "bootstrap", "values": observed[key].dropna().to_numpy(dtype=float)}
+            for key in observed.columns}
+
+
+def sample_scenarios(form_data, distributions, n, rng):
+    """A scenario table of n draws: form_data with the uncertain inputs sampled."""
+    scenarios = pd.DataFrame({key: np.full(n, value) for key, value in form_data.items()})
+    for key, spec in distributions.items():
+        values = draw(spec, n, rng)
+        scenarios[key] = np.clip(values, 0, 1) if _is_fraction(key) else np.maximum(values, 0)
+    return scenarios
+
+
+class QuantileSketch:
+    """Fixed-size weighted summary of a stream of (draws x periods) samples.
+
+    Each period keeps `size` representative values with weights. Adding a batch
+    merges it in and re-compresses, so memory stays at size x periods no matter
+    how many draws go through it.
+    """
+
+    def __init__(self, size=200):
+        self.size = size
+        self.values = None
+        self.weights = None
+
+    def add(self, samples):
+        samples = np.asarray(samples, dtype=float)
+        self._merge(samples, np.ones_like(samples))
+
+    def merge(self, other):
+        if other.values is not None:
+            self._merge(other.values, other.weights)
+
+    def _merge(self, values, weights):
+        if self.values is not None:
+            values = np.concatenate([self.values, values])
+            weights = np.concatenate([self.weights, weights])
+        order = np.argsort(values, axis=0)
+        values = np.take_along_axis(values, order, axis=0)
+        weights = np.take_along_axis(weights, order, axis=0)
+        if len(values) > self.size:
+            levels = (np.arange(self.size) + 0.5) / self.size
+            values = self._at_levels(values, weights, levels)
+            weights = np.broadcast_to(weights.sum(axis=0) / self.size, values.shape).copy()
+        self.values, self.weights = values, weights
+
+    @staticmethod
+    def _at_levels(values, weights, levels):
+        # Weighted quantiles for every period in one searchsorted: shift period j's
+        # normalized cumulative weights into [j, j + 1] and search one flat array
+        n_values, n_periods = values.shape
+        if n_values == 1:
+            return np.repeat(values, len(levels), axis=0)
+        cum = np.cumsum(weights, axis=0)
+        mid = (cum - weights / 2) / cum[-1]
+        flat = (mid + np.arange(n_periods)).T.ravel()
+        targets = (levels[:, None] + np.arange(n_periods)).T.ravel()
+        hi = np.searchsorted(flat, targets).reshape(n_periods, -1) - n_values * np.arange(n_periods)[:, None]
+        hi = np.clip(hi, 1, n_values - 1).T
+        lo = hi - 1
+        m_lo = np.take_along_axis(mid, lo, axis=0)
+        m_hi = np.take_along_axis(mid, hi, axis=0)
+        v_lo = np.take_along_axis(values, lo, axis=0)
+        v_hi = np.take_along_axis(values, hi, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip((levels[:, None] - m_lo) / (m_hi - m_lo), 0, 1)
+        return v_lo + np.nan_to_num(t) * (v_hi - v_lo)
+
+    def quantiles(self, percentiles=PERCENTILES):
+        """Array shaped (len(percentiles), periods)."""
+        levels = np.asarray(percentiles, dtype=float) / 100
+        return self._at_levels(self.values, self.weights, levels)
+
+
+# Banded outputs: monthly columns and year-level rollups
+MONTHLY_BANDS = ("Revenue", "Earnings Before Taxes", "Cash Flow Accumulation")
+YEARLY_BANDS = ("Revenue", "Income", "Gross Income", "Earnings Before Taxes", "Cash Flow Accumulation")
+
+
+def _run_chunk(form_data, distributions, n, seed, n_months, sketch_size):
+    rng = np.random.default_rng(seed)
+    batch = project_batch(sample_scenarios(form_data, distributions, n, rng), n_months)
+    # Cash Flow Accumulation is the year-end cash position
+    yearly = yearly_batch(batch)
+
+    sketches = {}
+    for name in MONTHLY_BANDS:
+        sketches[("monthly", name)] = QuantileSketch(sketch_size)
+        sketches[("monthly", name)].add(batch[name])
+    for name in YEARLY_BANDS:
+        sketches[("yearly", name)] = QuantileSketch(sketch_size)
+        sketches[("yearly", name)].add(yearly[name])
+    broke_even = np.maximum.accumulate(batch["Cash Flow Accumulation"], axis=1) >= 0
+    return sketches, broke_even.sum(axis=0), n
+
+
+def simulate(form_data, distributions, n_draws=20000, chunk_size=2500, pool=None, session_id=None,
+             seed=None, progress=None, n_months=N_MONTHS, sketch_size=200):
+    """Run n_draws Monte Carlo projections of form_data with the given input distributions.
+
+    Chunks of draws run on `pool` (a worker_pool.ProjectionPool; None runs
+    them inline), at most one per pool worker at a time, and are reduced into
+    quantile sketches as they finish. Raises PoolBusy if the pool has no room
+    for the first chunk, and ValueError for a distribution that can't be
+    sampled (see check_distribution()) before any draws are run.
+    `progress(done, total)` is called after each chunk. Returns a dict with P5/P50/P95 "monthly" and "yearly" bands, the
+    "break_even" probability by month and the month/year labels.
+    """
+    for key, spec in distributions.items():
+        check_distribution(key, spec)
+    sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    sketches = {}
+    broke_even = np.zeros(n_months)
+    done = 0
+
+    def reduce(result):
+        nonlocal done, broke_even
+        chunk_sketches, chunk_broke_even, n = result
+        for key, sketch in chunk_sketches.items():
+            if key in sketches:
+                sketches[key].merge(sketch)
+            else:
+                sketches[key] = sketch
+        broke_even = broke_even + chunk_broke_even
+        done += n
+        if progress is not None:
+            progress(done, n_draws)
+
+    args = [(form_data, distributions, n, s, n_months, sketch_size) for n, s in zip(sizes, seeds)]
+    if pool is None:
+        for a in args:
+            reduce(_run_chunk(*a))
+    else:
+        # Each chunk has its own slot in the pool; a later simulation from the same session
+        # resubmits those slots with a new key, cancelling chunks of one it abandoned
+        run = object()
+        pending = list(enumerate(args))[::-1]
+        in_flight = []
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max(pool.max_workers, 1):
+                    i, a = pending[-1]
+                    try:
+                        in_flight.append(pool.submit((session_id, "monte_carlo", i), (run, i), _run_chunk, *a))
+                    except PoolBusy:
+                        if not in_flight:
+                            raise
+                        break
+                    pending.pop()
+                finished, _ = wait([ticket.future for ticket in in_flight], return_when=FIRST_COMPLETED)
+                for ticket in [t for t in in_flight if t.future in finished]:
+                    in_flight.remove(ticket)
+                    reduce(ticket.result())
+        finally:
+            for ticket in in_flight:
+                pool.cancel(ticket)
+
+    dates, years, _ = month_calendar([form_data['kick_off_date']], n_months)
+    return {
+        "form_data": dict(form_data),
+        "n_draws": n_draws,
+        "percentiles": PERCENTILES,
+        "months": dates[0].astype(object),
+        "years": np.unique(years[0]),
+        "monthly": {name: sketches[("monthly", name)].quantiles() for name in MONTHLY_BANDS},
+        "yearly": {name: sketches[("yearly", name)].quantiles() for name in YEARLY_BANDS},
+        "break_even": broke_even / n_draws,
+    }
@@ -0,0 +1,126 @@
+"""Price plan portfolios: subscriptions split across plans with their own economics.
+
+Without plan inputs every subscription is on one monthly plan priced at
+subscription_price, with the scenario's free_trial_days, trial_to_paid and
+churn_rate. Scenarios can instead carry any number of plans, numbered from 1:
+
+    plan{i}_price                 price per billing period
+    plan{i}_billing_months        billing period in months (1 monthly, 12 annual; default 1)
+    plan{i}_free_trial_days       trial length (default: the scenario's free_trial_days)
+    plan{i}_trial_to_paid         trial-to-paid rate (default: the scenario's trial_to_paid)
+    plan{i}_churn_rate            share of paying users lost at each renewal
+                                  (default: the scenario's churn_rate)
+    plan{i}_mix_y1, _y2, ...      the plan's share of new trials, per year (the last
+                                  year repeats; default 1, an even split)
+
+Mix shares are normalized across a scenario's plans every month, so they can
+be percentages or weights. A plan exists in a scenario when its price is
+given (not NaN), and scenarios with no plans keep the single-plan model.
+Retention curve inputs (see cohorts.py) only apply to the single-plan model.
+
+Plans are evaluated together as (plans, scenarios, months) arrays and summed
+into the existing income-statement columns.
+"""
+import re
+
+import numpy as np
+
+PLAN_KEY = re.compile(r"plan(\d+)_(price|billing_months|free_trial_days|trial_to_paid|churn_rate|mix_y(\d+))")
+
+# The plans a new portfolio starts with (other inputs come from the single-plan form)
+DEFAULT_PLANS = (
+    {"price": 25.5, "billing_months": 1, "mix": 0.7},
+    {"price": 255.0, "billing_months": 12, "mix": 0.3},
+)
+
+
+def plan_numbers(p):
+    """Sorted plan numbers that any key of p (form_data or scenario_arrays() output) belongs to."""
+    return sorted({int(match.group(1)) for match in map(PLAN_KEY.fullmatch, p) if match})
+
+
+def has_plan_inputs(p):
+    """Whether p (form_data or scenario_arrays() output) carries price plan inputs."""
+    return any(PLAN_KEY.fullmatch(key) for key in p)
+
+
+def plan_arrays(p, n_months):
+    """The plans of scenario_arrays() output p as {input: (plans, scenarios) array}, or None without plans.
+
+    'mix' is each plan's share of a month's new trials, shaped (plans,
+    scenarios, months), and 'use' marks the scenarios that have plans.
+    """
+    # One pass over the keys: {input: {plan number: values}}, mix years keyed by (plan, year)
+    inputs, mix = {}, {}
+    for key, values in p.items():
+        match = PLAN_KEY.fullmatch(key)
+        if match is None:
+            continue
+        number, name, year = match.groups()
+        if year is None:
+            inputs.setdefault(name, {})[int(number)] = values
+        else:
+            mix[int(number), int(year)] = values
+    numbers = sorted({number for plans in inputs.values() for number in plans} | {number for number, _ in mix})
+    if not numbers:
+        return None
+    row = {number: i for i, number in enumerate(numbers)}
+    n_scenarios = len(p['kick_off_date'])
+
+    def stack(name, fallback):
+        values = np.empty((len(numbers), n_scenarios))
+        values[...] = fallback
+        for number, given in inputs.get(name, {}).items():
+            values[row[number]] = given
+        return np.where(np.isnan(values), fallback, values)
+
+    price = stack("price", np.nan)
+    present = ~np.isnan(price)
+    plans = {
+        "price": np.where(present, price, 0.0),
+        "billing_months": np.maximum(np.round(stack("billing_months", 1.0)), 1).astype(np.int64),
+        "free_trial_days": stack("free_trial_days", p['free_trial_days']),
+        "trial_to_paid": stack("trial_to_paid", p['trial_to_paid']),
+        "churn_rate": stack("churn_rate", p['churn_rate']),
+    }
+
+    # (plans, scenarios, years) mix; missing (or NaN) years repeat the year before
+    n_years = max((year for _, year in mix), default=1)
+    yearly = np.full((len(numbers), n_scenarios, n_years), np.nan)
+    for (number, year), given in mix.items():
+        yearly[row[number], :, year - 1] = given
+    yearly[..., 0] = np.where(np.isnan(yearly[..., 0]), 1.0, yearly[..., 0])
+    for year in range(1, n_years):
+        yearly[..., year] = np.where(np.isnan(yearly[..., year]), yearly[..., year - 1], yearly[..., year])
+    yearly = np.where(present[..., None] & (yearly > 0), yearly, 0.0)
+    monthly = yearly[..., np.minimum(np.arange(n_months) // 12, n_years - 1)]
+    total = monthly.sum(axis=0)
+    plans["use"] = present.any(axis=0)
+    # A year whose plans all have mix 0 would drop every trial of that year
+    unmixed = plans["use"] & (total == 0).any(axis=1)
+    if unmixed.any():
+        raise ValueError(f"Price plan mixes add up to 0 in some year of scenarios {np.flatnonzero(unmixed).tolist()}")
+    plans["mix"] = np.divide(monthly, total, out=np.zeros_like(monthly), where=total > 0)
+    return plans
+
+
+def plan_new_paid(trials, days_count, plans):
+    """(plans, scenarios, months) new paying users from (scenarios, months) new trials.
+
+    Each plan gets its mix share of the trials. A trial of trial_days converts
+    trial_days / days_count months after it starts: trials longer than a
+    month move whole months ahead, and the fraction left over spills into
+    the month after, as shorter trials spill into the next month.
+    """
+    started = trials * plans["mix"]
+    months_ahead = plans["free_trial_days"][..., None] / days_count
+    whole = np.floor(months_ahead)
+    cross_over = months_ahead - whole
+    rate = plans["trial_to_paid"][..., None]
+    new_paid = started * np.where(whole == 0, 1 - cross_over, 0.0) * rate
+    # One shifted add per distinct delay; trials of up to a month only take the first
+    for shift in range(1, int(whole.max(initial=0)) + 2):
+        share = np.where(whole == shift, 1 - cross_over, 0.0) + np.where(whole == shift - 1, cross_over, 0.0)
+        if shift < new_paid.shape[-1] and share.any():
+            new_paid[..., shift:] += started[..., :-shift] * share[..., :-shift] * rate
+    return new_paid
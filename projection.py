@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from charts import cashflow_figure, figure_json, financials_figure, mrr_figure, subscriptions_figure, traffic_figure
+from compact import CompactFrame
+from diagnostics import NULL_TIMER
+from engine import (FINANCIAL_COLUMNS, GRAPH, TRAFFIC_COLUMNS, cac_payback_months, changed_inputs, default_inputs,
+                    project_batch, stale_columns)
+from rollups import ROLLUP_COLUMNS, rollup_cube
+
+PAYBACK_COLUMN = "time_to_recover_Internet_marketing_cac"
+
+# What each cached piece of a result is built from, for incremental rebuilds
+PAYBACK_INPUTS = {'subscription_price', 'trial_to_paid', 'churn_rate', 'free_trial_days', 'sem_cpa', 'affiliate_cpa'}
+ROLLUP_INPUTS = {'fiscal_start_month'}
+FIGURE_COLUMNS = {
+    "traffic": {"Month", *TRAFFIC_COLUMNS.values()},
+    "subscriptions": {"Month", "Total Monthly Subscriptions", "Trial To Paid Transactions Count"},
+    "mrr": {"Month", "New Monthly Recurring Revenue MRR", "Renewal Recurring Revenue MRR",
+            "Ad Network Revenue", "Ad Affiliate Revenue"},
+}
+# Figures drawn from the rollup cube rather than monthly columns
+ROLLUP_FIGURES = ("financials", "cashflow")
+
+# Scratch columns nothing on the results page or in the rollups reads. compact_result() can drop them;
+# build_result() recomputes them from the inputs when a later incremental rebuild needs them.
+INTERMEDIATE_COLUMNS = {column for node in GRAPH for column in node.columns} - set().union(
+    *FIGURE_COLUMNS.values(), ROLLUP_COLUMNS, FINANCIAL_COLUMNS, {"Trial To Paid Transactions Count",
+                                                                 "Internet Marketing CAC Weighted average"})
+
+# RESULT_FLOAT32=1 stores every result's monthly columns as float32 (half the memory, ~7 significant digits)
+RESULT_DTYPE = np.float32 if os.environ.get("RESULT_FLOAT32", "") not in ("", "0") else None
+
+
+def default_form_data():
+    """form_data exactly as the app's untouched form submits it."""
+    form_data = default_inputs()
+    form_data['horizon_years'] = 5
+    form_data['fiscal_start_month'] = 1
+    return form_data
+
+
+def build_result(form_data, timer=NULL_TIMER, previous=None):
+    """Run the model for one form_data and build everything the results page shows.
+
+    timer: a diagnostics.StageTimer to record the engine, payback, rollup and figure stages.
+    previous: (form_data, result) from an earlier call, e.g. the session's last
+    result. Only the columns, payback, rollup and figures downstream of the
+    inputs that changed since then are rebuilt; everything else is reused.
+    """
+    n_months = 12 * form_data.get('horizon_years', 5)
+    price = form_data['subscription_price']
+    trial_to_paid = form_data['trial_to_paid']
+    churn_rate = form_data['churn_rate']
+    free_trial_days = form_data['free_trial_days']
+
+    changed = stale = reused = None
+    # float32 columns would leak rounding into recomputed ones, so only full-precision results are reused
+    if previous is not None and len(previous[1]["df"]) == n_months and previous[1]["df"].dtype == np.float64:
+        changed = changed_inputs(previous[0], form_data)
+        stale = stale_columns(changed)
+        reused = previous[1]
+
+    # Recurring revenue and financials columns
+    with timer.stage("engine"):
+        df = CompactFrame.from_batch(project_batch(form_data, n_months, reused["df"].batch() if reused else None, stale))
+
+    # CAC payback period, solved from the geometric series of a paid user's value
+    with timer.stage("payback"):
+        if reused and "Internet Marketing CAC Weighted average" not in stale and changed.isdisjoint(PAYBACK_INPUTS):
+            time_to_recover_sem_cac = reused["time_to_recover_sem_cac"]
+            time_to_recover_affiliate_cac = reused["time_to_recover_affiliate_cac"]
+            df[PAYBACK_COLUMN] = reused["df"].values(PAYBACK_COLUMN)
+        else:
+            time_to_recover_sem_cac, time_to_recover_affiliate_cac = cac_payback_months(
+                [form_data['sem_cpa'], form_data['affiliate_cpa']], price, trial_to_paid, churn_rate, free_trial_days)
+            # NaN where the CAC is never recovered ("No Pay Back")
+            df[PAYBACK_COLUMN] = cac_payback_months(
+                df.values("Internet Marketing CAC Weighted average"), price, trial_to_paid, churn_rate, free_trial_days)
+
+    # Month, quarter, fiscal year and TTM income statements, built once and cached with the result
+    with timer.stage("rollups"):
+        rollups_reused = bool(reused) and stale.isdisjoint(ROLLUP_COLUMNS) and changed.isdisjoint(ROLLUP_INPUTS)
+        if rollups_reused:
+            rollups = reused["rollups"]
+        else:
+            rollups = rollup_cube(df, form_data.get('fiscal_start_month', 1))
+
+    figures = {}
+    for name, build in (
+        ("traffic", lambda: traffic_figure(df)),
+        ("subscriptions", lambda: subscriptions_figure(df)),
+        ("mrr", lambda: mrr_figure(df)),
+        ("financials", lambda: financials_figure(rollups["Fiscal Year"])),
+        ("cashflow", lambda: cashflow_figure(rollups["Fiscal Year"])),
+    ):
+        if reused and (rollups_reused if name in ROLLUP_FIGURES else stale.isdisjoint(FIGURE_COLUMNS[name])):
+            figures[name] = reused["figures"][name]
+            continue
+        with timer.stage(f"figure:{name}"):
+            figures[name] = figure_json(build())
+
+    result = {
+        "df": df,
+        "rollups": rollups,
+        "time_to_recover_sem_cac": time_to_recover_sem_cac,
+        "time_to_recover_affiliate_cac": time_to_recover_affiliate_cac,
+        "figures": figures,
+    }
+    return compact_result(result, dtype=RESULT_DTYPE) if RESULT_DTYPE else result
+
+
+def compact_result(result, drop_intermediates=False, dtype=None):
+    """A copy of a build_result() dict with a smaller monthly frame; the input is left untouched.
+
+    drop_intermediates: leave out INTERMEDIATE_COLUMNS.
+    dtype: store float columns as e.g. np.float32 (figures are already built, so charts are unaffected).
+    """
+    df = result["df"]
+    if drop_intermediates:
+        df = df.drop(INTERMEDIATE_COLUMNS)
+    if dtype is not None:
+        df = df.astype(dtype)
+    return dict(result, df=df)
+
+
+def result_to_arrays(result):
+    """Flatten a build_result() dict into named NumPy arrays (for np.savez)."""
+    arrays = {f"df:{name}": values for name, values in result["df"].to_arrays().items()}
+    for level, frame in result["rollups"].items():
+        for name in frame.columns:
+            values = frame[name].to_numpy()
+            # Quarter labels as fixed-width strings, which load without pickle
+            arrays[f"rollup:{level}:{name}"] = values.astype(str) if values.dtype == object else values
+    arrays["time_to_recover_sem_cac"] = np.asarray(result["time_to_recover_sem_cac"])
+    arrays["time_to_recover_affiliate_cac"] = np.asarray(result["time_to_recover_affiliate_cac"])
+    for name, fig_json in result["figures"].items():
+        arrays[f"figure:{name}"] = np.frombuffer(fig_json.encode(), dtype=np.uint8)
+    return arrays
+
+
+def result_from_arrays(arrays):
+    """Inverse of result_to_arrays()."""
+    df = {}
+    rollups = {}
+    figures = {}
+    for key in arrays:
+        kind, _, name = key.partition(":")
+        if kind == "df":
+            df[name] = arrays[key]
+        elif kind == "rollup":
+            level, _, name = name.partition(":")
+            rollups.setdefault(level, {})[name] = arrays[key]
+        elif kind == "figure":
+            figures[name] = arrays[key].tobytes().decode()
+    df = CompactFrame.from_arrays(df)
+    return {
+        "df": df,
+        # Results saved before rollups were cached only had a calendar-year table: rebuild from the months
+        "rollups": {level: pd.DataFrame(columns) for level, columns in rollups.items()} or rollup_cube(df),
+        "time_to_recover_sem_cac": float(arrays["time_to_recover_sem_cac"]),
+        "time_to_recover_affiliate_cac": float(arrays["time_to_recover_affiliate_cac"]),
+        "figures": figures,
+    }
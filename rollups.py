@@ -0,0 +1,92 @@
+"""Period rollups of a result's income statement: month, quarter, fiscal year and trailing twelve months.
+
+rollup_cube() builds every level from one (columns, months) matrix of the
+financial columns, once per result, and build_result() caches it with the
+result. Charts, tables and exports read their level from the cube, so
+switching level is a dict lookup.
+
+    Month         the monthly values
+    Quarter       fiscal quarters, labelled "2027 Q1" (or "FY2027 Q1" when the
+                  fiscal year doesn't start in January)
+    Fiscal Year   fiscal years starting in fiscal_start_month, labelled (as
+                  "Year") by the calendar year they end in
+    TTM           trailing twelve months ending each month, from month 12
+
+Flow columns (revenue, costs, earnings) are summed over each period.
+Cash Flow Accumulation is a balance, so each period shows its value in the
+period's last month. Run-Rate ARR is 12x the recurring revenue (new plus
+renewal MRR) of that month. Periods cut short by the launch or the end of
+the horizon sum the months they have.
+"""
+import numpy as np
+import pandas as pd
+
+from compact import CompactFrame
+from engine import BALANCE_COLUMNS, FINANCIAL_COLUMNS, fiscal_year
+
+LEVELS = ("Month", "Quarter", "Fiscal Year", "TTM")
+
+FLOW_COLUMNS = [c for c in FINANCIAL_COLUMNS if c not in ("Month", "Year", *BALANCE_COLUMNS)]
+ARR_COLUMN = "Run-Rate ARR"
+RECURRING_COLUMNS = ["New Monthly Recurring Revenue MRR", "Renewal Recurring Revenue MRR"]
+
+# Monthly columns a cube is built from
+ROLLUP_COLUMNS = {"Month", *FLOW_COLUMNS, *BALANCE_COLUMNS, *RECURRING_COLUMNS}
+
+MONTH_NAMES = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+               "November", "December")
+
+
+def _values(df, name):
+    return df.values(name) if isinstance(df, CompactFrame) else df[name].to_numpy()
+
+
+def fiscal_periods(months, fiscal_start_month=1):
+    """(fiscal years, fiscal quarters 1-4) of datetime64 months; fiscal years are named by the year they end in."""
+    shifted = np.asarray(months, dtype="datetime64[M]").astype(np.int64) - (fiscal_start_month - 1)
+    quarters = shifted % 12 // 3 + 1
+    return fiscal_year(months, fiscal_start_month), quarters
+
+
+def _level(label_name, labels, flows, balances, arr, columns_order):
+    data = {label_name: labels}
+    data.update(zip(FLOW_COLUMNS, flows))
+    data.update(zip(BALANCE_COLUMNS, balances))
+    data[ARR_COLUMN] = arr
+    return pd.DataFrame(data)[[label_name, *columns_order, ARR_COLUMN]]
+
+
+def rollup_cube(df, fiscal_start_month=1):
+    """{level: DataFrame} for every level of LEVELS, from a result's monthly frame (CompactFrame or DataFrame).
+
+    Each frame starts with its label column (Month, Quarter or Year; TTM rows
+    are labelled by the Month they end in), then the income statement columns
+    in FINANCIAL_COLUMNS order and Run-Rate ARR.
+    """
+    months = np.asarray(_values(df, "Month"), dtype="datetime64[M]")
+    n_months = len(months)
+    flows = np.stack([_values(df, c) for c in FLOW_COLUMNS]).astype(float)
+    balances = np.stack([_values(df, c) for c in BALANCE_COLUMNS]).astype(float)
+    arr = 12 * sum(np.asarray(_values(df, c), dtype=float) for c in RECURRING_COLUMNS)
+    order = [c for c in FINANCIAL_COLUMNS if c not in ("Month", "Year")]
+    month_labels = pd.to_datetime(months.astype("datetime64[D]"))
+
+    cube = {"Month": _level("Month", month_labels, flows, balances, arr, order)}
+    fiscal_years, quarters = fiscal_periods(months, fiscal_start_month)
+    prefix = "" if fiscal_start_month == 1 else "FY"
+    for level, keys in (("Quarter", fiscal_years * 4 + quarters), ("Fiscal Year", fiscal_years)):
+        starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1))
+        ends = np.append(starts[1:], n_months) - 1
+        sums = np.add.reduceat(flows, starts, axis=1)
+        if level == "Quarter":
+            labels = [f"{prefix}{y} Q{q}" for y, q in zip(fiscal_years[starts], quarters[starts])]
+            cube[level] = _level("Quarter", labels, sums, balances[:, ends], arr[ends], order)
+        else:
+            cube[level] = _level("Year", fiscal_years[starts], sums, balances[:, ends], arr[ends], order)
+
+    # Trailing sums as differences of one running total
+    running = np.concatenate([np.zeros((len(flows), 1)), np.cumsum(flows, axis=1)], axis=1)
+    ends = np.arange(11, n_months)
+    cube["TTM"] = _level("Month", month_labels[ends], running[:, ends + 1] - running[:, ends - 11],
+                         balances[:, ends], arr[ends], order)
+    return cube
@@ -0,0 +1,166 @@
+"""Named scenarios saved to a local SQLite database.
+
+Each scenario keeps its form_data (JSON) and its build_result() output as a
+compressed .npz blob, so loading one never reruns the model. Blobs live in
+their own table: listing and filtering only touch the small, indexed
+scenarios and scenario_tags tables. The database path is SCENARIO_DB
+(default scenarios.sqlite next to this file).
+"""
+import io
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from projection import result_from_arrays, result_to_arrays
+from result_cache import canonical_key
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    owner TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    cache_key TEXT NOT NULL,
+    subscription_price REAL,
+    churn_rate REAL,
+    launch_year INTEGER,
+    horizon_years INTEGER,
+    form_data TEXT NOT NULL,
+    UNIQUE (owner, name)
+);
+CREATE INDEX IF NOT EXISTS scenarios_owner ON scenarios (owner, created_at);
+CREATE INDEX IF NOT EXISTS scenarios_price ON scenarios (subscription_price);
+CREATE INDEX IF NOT EXISTS scenarios_churn ON scenarios (churn_rate);
+CREATE INDEX IF NOT EXISTS scenarios_launch_year ON scenarios (launch_year);
+CREATE TABLE IF NOT EXISTS scenario_tags (
+    tag TEXT NOT NULL,
+    scenario_id INTEGER NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, scenario_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scenario_tags_scenario ON scenario_tags (scenario_id);
+CREATE TABLE IF NOT EXISTS scenario_results (
+    scenario_id INTEGER PRIMARY KEY REFERENCES scenarios (id) ON DELETE CASCADE,
+    result BLOB NOT NULL
+);
+"""
+
+
+def _form_data_json(form_data):
+    return json.dumps(form_data, default=lambda value: value.isoformat() if isinstance(value, date) else float(value),
+                      sort_keys=True)
+
+
+def _form_data_from_json(text):
+    form_data = json.loads(text)
+    form_data['kick_off_date'] = date.fromisoformat(form_data['kick_off_date'])
+    return form_data
+
+
+def _result_blob(result):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **result_to_arrays(result))
+    return buffer.getvalue()
+
+
+def _result_from_blob(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return result_from_arrays({name: data[name] for name in data.files})
+
+
+class ScenarioStore:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: Streamlit runs sessions on separate threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, name, form_data, result, owner="", tags=()):
+        """Insert or replace the owner's scenario called name; returns its id."""
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT INTO scenarios (name, owner, created_at, cache_key, subscription_price, churn_rate,
+                                          launch_year, horizon_years, form_data)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (owner, name) DO UPDATE SET
+                       created_at = excluded.created_at, cache_key = excluded.cache_key,
+                       subscription_price = excluded.subscription_price, churn_rate = excluded.churn_rate,
+                       launch_year = excluded.launch_year, horizon_years = excluded.horizon_years,
+                       form_data = excluded.form_data""",
+                (name, owner, datetime.now().isoformat(timespec="seconds"), canonical_key(form_data),
+                 float(form_data['subscription_price']), float(form_data['churn_rate']),
+                 form_data['kick_off_date'].year, int(form_data.get('horizon_years', 5)), _form_data_json(form_data)))
+            scenario_id = conn.execute("SELECT id FROM scenarios WHERE owner = ? AND name = ?",
+                                       (owner, name)).fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO scenario_results (scenario_id, result) VALUES (?, ?)",
+                         (scenario_id, _result_blob(result)))
+            conn.execute("DELETE FROM scenario_tags WHERE scenario_id = ?", (scenario_id,))
+            conn.executemany("INSERT OR IGNORE INTO scenario_tags (tag, scenario_id) VALUES (?, ?)",
+                             [(tag, scenario_id) for tag in tags if tag])
+        return scenario_id
+
+    def list(self, owner=None, tag=None, price=None, churn=None, launch_year=None, limit=5000):
+        """Saved scenarios, newest first, as a DataFrame (no results are read).
+
+        price and churn are (low, high) ranges; any filter left as None is ignored.
+        """
+        where, params = [], []
+        if owner is not None:
+            where.append("s.owner = ?")
+            params.append(owner)
+        if tag is not None:
+            where.append("EXISTS (SELECT 1 FROM scenario_tags t WHERE t.tag = ? AND t.scenario_id = s.id)")
+            params.append(tag)
+        if price is not None:
+            where.append("s.subscription_price BETWEEN ? AND ?")
+            params.extend(price)
+        if churn is not None:
+            where.append("s.churn_rate BETWEEN ? AND ?")
+            params.extend(churn)
+        if launch_year is not None:
+            where.append("s.launch_year = ?")
+            params.append(launch_year)
+        query = f"""
+            SELECT s.id, s.name, s.owner,
+                   (SELECT group_concat(t.tag, ', ') FROM scenario_tags t WHERE t.scenario_id = s.id) AS tags,
+                   s.subscription_price, s.churn_rate, s.launch_year, s.horizon_years, s.created_at
+            FROM scenarios s
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY s.created_at DESC, s.id DESC
+            LIMIT ?"""
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params + [limit])
+
+    def load(self, scenario_id):
+        """(name, form_data, result) of a saved scenario."""
+        with self._connect() as conn:
+            row = conn.execute(
+                """SELECT s.name, s.form_data, r.result FROM scenarios s
+                   JOIN scenario_results r ON r.scenario_id = s.id WHERE s.id = ?""", (scenario_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No saved scenario {scenario_id}")
+        return row[0], _form_data_from_json(row[1]), _result_from_blob(row[2])
+
+    def delete(self, scenario_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM scenarios WHERE id = ?", (scenario_id,))
+
+
+SCENARIO_STORE = ScenarioStore(os.environ.get("SCENARIO_DB", DEFAULT_PATH))
@@ -0,0 +1,196 @@
+"""The form's grid editors: acquisition channels, per-channel, per-year rate schedules and price plans.
+
+channel_frame() and channel_inputs() convert between form_data and a table
+with a row per channel (see channels.py): month-1 traffic and, for paid
+channels, CAC. plan_frame() and plan_inputs() do the same for price plans
+(see plans.py), a row per plan with its mix of new trials per year.
+
+In the schedules table rows are schedules (each channel's monthly traffic
+growth rate, then each channel's conversion rate), columns are projection
+years, and cells are percentages. schedule_frame() builds the table from
+form_data and schedule_inputs() turns an edited table back into form_data
+keys:
+
+    sem_traffic_gr_y1, sem_traffic_gr_y2, ...   monthly traffic growth rates
+    sem_cr_y1, sem_cr_y2, ...                   traffic-to-trial conversion rates
+
+The engine repeats a schedule's last year to the end of the horizon, so
+years past the fifth are only kept up to the last one that changes a rate.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from channels import CHANNELS
+from engine import default_inputs
+from plans import DEFAULT_PLANS, plan_numbers
+
+# (form_data key prefix, row label) of every schedule, in display order
+SCHEDULE_ROWS = ([(f"{ch.key}_traffic_gr_y", f"{ch.label} traffic growth") for ch in CHANNELS]
+                 + [(f"{ch.key}_cr_y", f"{ch.label} conversion") for ch in CHANNELS])
+
+SCHEDULE_KEY = re.compile("|".join(re.escape(prefix) for prefix, _ in SCHEDULE_ROWS) + r"\d+")
+
+# The grid always shows at least these years; every scenario carries them
+MIN_YEARS = 5
+MAX_RATE = 100.0
+
+
+TRAFFIC_LABEL = "Month 1 Traffic"
+CAC_LABEL = "CAC ($)"
+
+
+def channel_frame(form_data):
+    """{channel label: month-1 traffic, CAC} table; CAC is empty for organic channels."""
+    defaults = default_inputs()
+    rows = {}
+    for ch in CHANNELS:
+        key = f"{ch.key}_traffic_m1"
+        cac = float(form_data.get(ch.cac_key, defaults[ch.cac_key])) if ch.paid else None
+        rows[ch.label] = [int(form_data.get(key, defaults[key])), cac]
+    frame = pd.DataFrame.from_dict(rows, orient="index", columns=[TRAFFIC_LABEL, CAC_LABEL])
+    frame.index.name = "Channel"
+    return frame
+
+
+def channel_inputs(frame):
+    """form_data traffic and CAC keys from an edited channel_frame() table (organic channels' CAC is ignored).
+
+    Raises ValueError naming every empty, non-numeric or negative cell.
+    """
+    values = frame.apply(pd.to_numeric, errors="coerce")
+    cells = [f"{ch.label} {column}" for ch in CHANNELS for column in ([TRAFFIC_LABEL, CAC_LABEL] if ch.paid else [TRAFFIC_LABEL])
+             if not values.at[ch.label, column] >= 0]
+    if cells:
+        raise ValueError(f"Channel inputs must be numbers of at least 0: {', '.join(cells)}")
+
+    inputs = {}
+    for ch in CHANNELS:
+        inputs[f"{ch.key}_traffic_m1"] = int(round(values.at[ch.label, TRAFFIC_LABEL]))
+        if ch.paid:
+            inputs[ch.cac_key] = float(values.at[ch.label, CAC_LABEL])
+    return inputs
+
+
+def year_label(year):
+    return f"Year {year}"
+
+
+def _kept_years(row):
+    """How many years of a per-year row to keep: MIN_YEARS, then up to the last one that differs from the year before."""
+    changes = np.flatnonzero(row[MIN_YEARS:] != row[MIN_YEARS - 1:-1])
+    return MIN_YEARS + (int(changes[-1]) + 1 if changes.size else 0)
+
+
+def schedule_frame(form_data, n_years=MIN_YEARS):
+    """{schedule label: % per year} table with max(n_years, MIN_YEARS) year columns.
+
+    Rates missing from form_data repeat the year before, or take the form
+    default for the first five years.
+    """
+    defaults = default_inputs()
+    n_years = max(int(n_years), MIN_YEARS)
+    rows = {}
+    for prefix, label in SCHEDULE_ROWS:
+        values = []
+        for year in range(1, n_years + 1):
+            key = f"{prefix}{year}"
+            value = form_data.get(key, defaults.get(key, values[-1] / 100 if values else 0.0))
+            # Round off the float noise of * 100, so an unedited cell / 100 is the value it came from
+            values.append(round(float(value) * 100, 10))
+        rows[label] = values
+    frame = pd.DataFrame.from_dict(rows, orient="index", columns=[year_label(y) for y in range(1, n_years + 1)])
+    frame.index.name = "Schedule"
+    return frame
+
+
+def schedule_inputs(frame):
+    """form_data rate keys (as fractions) from an edited schedule_frame() table.
+
+    Raises ValueError naming every empty, non-numeric or out-of-range cell.
+    """
+    values = frame.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    bad = np.isnan(values) | (values < 0) | (values > MAX_RATE)
+    if bad.any():
+        cells = [f"{frame.index[r]} {frame.columns[c]}" for r, c in zip(*np.nonzero(bad))]
+        raise ValueError(f"Rates must be numbers from 0 to {MAX_RATE:g}%: {', '.join(cells)}")
+
+    prefixes = {label: prefix for prefix, label in SCHEDULE_ROWS}
+    inputs = {}
+    for label, row in zip(frame.index, values):
+        for year in range(1, _kept_years(row) + 1):
+            inputs[f"{prefixes[label]}{year}"] = float(row[year - 1]) / 100
+    return inputs
+
+
+# (plan input, column label, scale from the input to the grid) of every per-plan column before the mix
+PLAN_COLUMNS = [
+    ("price", "Price ($)", 1),
+    ("billing_months", "Billing (Months)", 1),
+    ("free_trial_days", "Free Trial (Days)", 1),
+    ("trial_to_paid", "Trial To Paid (%)", 100),
+    ("churn_rate", "Churn per Renewal (%)", 100),
+]
+
+
+def mix_label(year):
+    return f"{year_label(year)} Mix (%)"
+
+
+def plan_frame(form_data, n_years=MIN_YEARS):
+    """A row per price plan: price, billing period, trial, conversion, churn and a mix column per year.
+
+    Without plans in form_data the table holds DEFAULT_PLANS, with the
+    single-plan form's trial, conversion and churn.
+    """
+    defaults = {**default_inputs(), **form_data, "billing_months": 1}
+    n_years = max(int(n_years), MIN_YEARS)
+    numbers = plan_numbers(form_data)
+    if numbers:
+        plans = [{key[len(f"plan{i}_"):]: value for key, value in form_data.items() if key.startswith(f"plan{i}_")}
+                 for i in numbers]
+    else:
+        plans = [{"price": plan["price"], "billing_months": plan["billing_months"],
+                  **{f"mix_y{y}": plan["mix"] for y in range(1, MIN_YEARS + 1)}} for plan in DEFAULT_PLANS]
+    rows = []
+    for plan in plans:
+        row = [round(float(plan.get(name, defaults.get(name, 0.0))) * scale, 10) for name, _, scale in PLAN_COLUMNS]
+        mix = []
+        for year in range(1, n_years + 1):
+            mix.append(round(float(plan.get(f"mix_y{year}", mix[-1] / 100 if mix else 1.0)) * 100, 10))
+        rows.append(row + mix)
+    columns = [label for _, label, _ in PLAN_COLUMNS] + [mix_label(y) for y in range(1, n_years + 1)]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def plan_inputs(frame):
+    """form_data plan{i}_... keys from an edited plan_frame() table, plans numbered in row order.
+
+    Empty rows are dropped. Raises ValueError naming every empty, non-numeric
+    or out-of-range cell, and when there are no plans or a year's mix adds up
+    to 0.
+    """
+    values = frame.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    values = values[~np.isnan(values).all(axis=1)]
+    if not len(values):
+        raise ValueError("Add at least one plan")
+    low = np.array([0, 1, 0, 0, 0] + [0] * (values.shape[1] - len(PLAN_COLUMNS)))
+    high = np.array([np.inf, np.inf, np.inf, MAX_RATE, MAX_RATE] + [MAX_RATE] * (values.shape[1] - len(PLAN_COLUMNS)))
+    bad = np.isnan(values) | (values < low) | (values > high)
+    if bad.any():
+        cells = [f"Plan {r + 1} {frame.columns[c]}" for r, c in zip(*np.nonzero(bad))]
+        raise ValueError(f"Plan inputs are missing or out of range: {', '.join(cells)}")
+    mix = values[:, len(PLAN_COLUMNS):]
+    empty = np.flatnonzero(mix.sum(axis=0) == 0)
+    if empty.size:
+        raise ValueError(f"No plan has a mix above 0 in {', '.join(year_label(y + 1) for y in empty)}")
+
+    inputs = {}
+    for i, row in enumerate(values, start=1):
+        for (name, _, scale), value in zip(PLAN_COLUMNS, row):
+            inputs[f"plan{i}_{name}"] = float(value) / scale
+        inputs[f"plan{i}_billing_months"] = int(round(row[1]))
+        for year in range(1, _kept_years(row[len(PLAN_COLUMNS):]) + 1):
+            inputs[f"plan{i}_mix_y{year}"] = float(row[len(PLAN_COLUMNS) + year - 1]) / 100
+    return inputs
@@ -0,0 +1,92 @@
+"""Bytes held per app session, and a per-session cap.
+
+Every rerun the app reports its session_state to SESSION_MEMORY, which
+measures it with result_cache.sizeof() and, while the session is over
+SESSION_MEMORY_MB, trims it step by step:
+
+    1. held results drop their intermediate columns (projection.INTERMEDIATE_COLUMNS)
+    2. held results store their monthly columns as float32
+    3. state that a button press recomputes (Monte Carlo, goal seek, calibration) is discarded
+
+Results are shared with RESULT_CACHE, so trimming replaces the session's
+reference with a smaller copy and never edits the result in place.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from compact import CompactFrame
+from projection import compact_result
+from result_cache import sizeof
+
+# Session state a user can rebuild with one click, dropped (in this order) as the last resort
+RECOMPUTABLE_KEYS = ("monte_carlo", "goal_seek", "calibration")
+
+# Sessions that have not rerun for this long are assumed closed and leave the ledger
+IDLE_SECONDS = 3600
+
+
+def _with_results(value, **options):
+    """value with every build_result() dict inside it replaced by compact_result(..., **options)."""
+    if isinstance(value, dict) and isinstance(value.get("df"), CompactFrame):
+        return compact_result(value, **options)
+    if isinstance(value, tuple):
+        return tuple(_with_results(v, **options) for v in value)
+    if isinstance(value, dict):
+        return {k: _with_results(v, **options) for k, v in value.items()}
+    return value
+
+
+def _holds_result(value):
+    if isinstance(value, dict):
+        return isinstance(value.get("df"), CompactFrame) or any(_holds_result(v) for v in value.values())
+    if isinstance(value, tuple):
+        return any(_holds_result(v) for v in value)
+    return False
+
+
+class SessionMemory:
+    """Thread-safe ledger of {session id: bytes held}, shared by every session of the process."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def measure(session_state):
+        """{key: bytes} for everything in a session_state."""
+        return {key: sizeof(session_state[key]) for key in list(session_state.keys())}
+
+    def enforce(self, session_id, session_state):
+        """Trim session_state under the cap if needed, record what it holds and return {key: bytes}."""
+        held = self.measure(session_state)
+        trims = [dict(drop_intermediates=True), dict(drop_intermediates=True, dtype=np.float32)]
+        while sum(held.values()) > self.max_bytes:
+            if trims:
+                options = trims.pop(0)
+                for key in [key for key in held if _holds_result(session_state[key])]:
+                    session_state[key] = _with_results(session_state[key], **options)
+            else:
+                key = next((key for key in RECOMPUTABLE_KEYS if key in held), None)
+                if key is None:
+                    break
+                del session_state[key]
+            held = self.measure(session_state)
+        with self._lock:
+            self._sessions[session_id] = (sum(held.values()), time.monotonic())
+        return held
+
+    def stats(self):
+        """[(session id, bytes held)] of live sessions, largest first."""
+        now = time.monotonic()
+        with self._lock:
+            for session_id in [s for s, (_, seen) in self._sessions.items() if now - seen > IDLE_SECONDS]:
+                del self._sessions[session_id]
+            return sorted(((s, nbytes) for s, (nbytes, _) in self._sessions.items()), key=lambda row: -row[1])
+
+
+# SESSION_MEMORY_MB caps what one session keeps between reruns
+SESSION_MEMORY = SessionMemory(int(float(os.environ.get("SESSION_MEMORY_MB", "16")) * 2**20))
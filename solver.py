@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from engine import INPUT_KEYS, key_metrics, project_batch, yearly_batch
+
+# Target kinds: a monthly column at a month, a yearly column in a year, or a Key Metric
+TARGET_KINDS = ("monthly", "yearly", "metric")
+
+METRICS = ("ltv", "sem_roi", "sem_roi_percent", "affiliate_roi", "affiliate_roi_percent",
+           "sem_payback_months", "affiliate_payback_months")
+
+# Targets offered in the app; "N" is the year or month picked alongside
+PRESET_TARGETS = {
+    "EBT in year N": {"kind": "yearly", "column": "Earnings Before Taxes"},
+    "Revenue in year N": {"kind": "yearly", "column": "Revenue"},
+    "Cash Flow Accumulation at month N": {"kind": "monthly", "column": "Cash Flow Accumulation"},
+    "Revenue at month N": {"kind": "monthly", "column": "Revenue"},
+    "LTV ($)": {"kind": "metric", "name": "ltv"},
+    "SEM ROI ($)": {"kind": "metric", "name": "sem_roi"},
+    "Affiliate ROI ($)": {"kind": "metric", "name": "affiliate_roi"},
+    "SEM CAC payback (months)": {"kind": "metric", "name": "sem_payback_months"},
+    "Affiliate CAC payback (months)": {"kind": "metric", "name": "affiliate_payback_months"},
+}
+
+
+def preset_target(name, n=1):
+    """Target spec for one of PRESET_TARGETS, at year or month n where it applies."""
+    target = dict(PRESET_TARGETS[name])
+    if target["kind"] == "yearly":
+        target["year"] = int(n)
+    elif target["kind"] == "monthly":
+        target["month"] = int(n)
+    return target
+
+
+def target_label(target):
+    if target["kind"] == "monthly":
+        return f"{target['column']} at month {target['month']}"
+    if target["kind"] == "yearly":
+        return f"{target['column']} in year {target['year']}"
+    return target["name"]
+
+
+def evaluate_target(target, batch, yearly, metrics):
+    """Value of one target for every scenario of an evaluated batch."""
+    kind = target["kind"]
+    if kind == "monthly":
+        values = batch[target["column"]]
+        if not 1 <= target["month"] <= values.shape[1]:
+            raise ValueError(f"Month {target['month']} is outside the {values.shape[1]}-month horizon")
+        return values[:, target["month"] - 1].astype(float)
+    if kind == "yearly":
+        values = yearly[target["column"]]
+        if not 1 <= target["year"] <= values.shape[1]:
+            raise ValueError(f"Year {target['year']} is outside the {values.shape[1]}-year horizon")
+        return values[:, target["year"] - 1].astype(float)
+    if kind == "metric":
+        return metrics[target["name"]]
+    raise ValueError(f"Unknown target kind '{kind}', expected one of {TARGET_KINDS}")
+
+
+def _evaluate(form_data, problems, candidates):
+    """Evaluate every problem's candidate values in one batch; returns (P, K) target values."""
+    n_problems, n_candidates = candidates.shape
+    columns = {key: [value] * (n_problems * n_candidates) for key, value in form_data.items()}
+    for i, problem in enumerate(problems):
+        rows = slice(i * n_candidates, (i + 1) * n_candidates)
+        columns[problem["input"]] = np.asarray(columns[problem["input"]], dtype=float)
+        columns[problem["input"]][rows] = candidates[i]
+    scenarios = pd.DataFrame(columns)
+
+    batch = project_batch(scenarios, 12 * form_data.get('horizon_years', 5))
+    # The fiscal years of the app's yearly table and charts
+    yearly = yearly_batch(batch, form_data.get('fiscal_start_month', 1))
+    needs_metrics = any(problem["target"]["kind"] == "metric" for problem in problems)
+    metrics = key_metrics(scenarios) if needs_metrics else None
+
+    values = np.empty((n_problems, n_candidates))
+    for i, problem in enumerate(problems):
+        rows = slice(i * n_candidates, (i + 1) * n_candidates)
+        values[i] = evaluate_target(problem["target"], batch, yearly, metrics)[rows]
+    return values
+
+
+def solve(form_data, problems, n_candidates=33, rtol=1e-9, max_iter=12):
+    """Find the input value that makes each target hit its goal.
+
+    problems: list of {"input": form_data key, "low": ..., "high": ..., "target":
+    {"kind": "yearly", "column": "Earnings Before Taxes", "year": 3}, "goal": 0.0}.
+    Yearly targets are the year-th row of the app's yearly table: fiscal years
+    starting in form_data's fiscal_start_month (calendar years by default).
+
+    All problems are solved together: each iteration evaluates n_candidates
+    evenly spaced values inside every unsolved bracket in one project_batch()
+    call, keeps the first sub-interval where the target crosses its goal (the
+    lowest solution in the bound) and shrinks it by a factor of
+    n_candidates - 1. Converged brackets finish with one secant step.
+
+    Returns one dict per problem: {"value", "achieved", "status", "iterations"}
+    where status is "solved", or "not bracketed" when the target never
+    crosses the goal inside [low, high] (value is then the closest candidate).
+    """
+    for problem in problems:
+        if problem["input"] not in INPUT_KEYS or problem["input"] == "kick_off_date":
+            raise ValueError(f"Can't solve for '{problem['input']}'")
+        if not problem["low"] < problem["high"]:
+            raise ValueError(f"Bound for '{problem['input']}' needs low < high")
+
+    n_problems = len(problems)
+    low = np.array([problem["low"] for problem in problems], dtype=float)
+    high = np.array([problem["high"] for problem in problems], dtype=float)
+    goal = np.array([problem["goal"] for problem in problems], dtype=float)
+    results = [None] * n_problems
+    active = np.arange(n_problems)
+    steps = np.linspace(0.0, 1.0, n_candidates)
+
+    for iteration in range(1, max_iter + 1):
+        candidates = low[active, None] + (high - low)[active, None] * steps
+        gap = _evaluate(form_data, [problems[i] for i in active], candidates) - goal[active, None]
+
+        still_active = []
+        for row, i in enumerate(active):
+            x, g = candidates[row], gap[row]
+            finite = np.isfinite(g)
+            hit = np.flatnonzero(finite & (g == 0))
+            crossing = np.flatnonzero(finite[:-1] & finite[1:] & (np.sign(g[:-1]) != np.sign(g[1:])))
+            if len(hit) and (not len(crossing) or hit[0] <= crossing[0]):
+                results[i] = {"value": x[hit[0]], "status": "solved", "iterations": iteration}
+            elif len(crossing):
+                j = crossing[0]
+                low[i], high[i] = x[j], x[j + 1]
+                if high[i] - low[i] <= rtol * max(1.0, abs(high[i])) or iteration == max_iter:
+                    value = x[j] - g[j] * (x[j + 1] - x[j]) / (g[j + 1] - g[j])
+                    results[i] = {"value": value, "status": "solved", "iterations": iteration}
+                else:
+                    still_active.append(i)
+            else:
+                # No crossing means the first (full-bound) pass found nothing to bracket
+                closest = np.nanargmin(np.where(finite, np.abs(g), np.inf)) if finite.any() else 0
+                results[i] = {"value": x[closest], "status": "not bracketed", "iterations": iteration}
+        active = np.array(still_active, dtype=int)
+        if not len(active):
+            break
+
+    # Report what each answer actually achieves, in one more batch
+    values = np.array([[result["value"]] for result in results])
+    achieved = _evaluate(form_data, problems, values)[:, 0]
+    for result, value in zip(results, achieved):
+        result["value"] = float(result["value"])
+        result["achieved"] = float(value)
+    return results
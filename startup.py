@@ -0,0 +1,63 @@
+"""Boot-time warm-up, run on a background thread once the first page is drawn.
+
+start() loads the default-input result from the disk cache (the Procfile's
+`python disk_cache.py warm` writes it before the server starts), or builds it,
+and puts it in RESULT_CACHE, so the first "Calculate Projections" on defaults
+is a lookup. It then rebuilds the cached figures once, which pays for
+Plotly's own lazy imports (about 0.7 s) before anyone is waiting on a chart,
+and starts the worker pool's processes.
+"""
+import threading
+
+from disk_cache import DISK_CACHE
+from projection import build_result, default_form_data
+from result_cache import RESULT_CACHE, canonical_key
+from worker_pool import PROJECTION_POOL
+
+DEFAULT_KEY = canonical_key(default_form_data())
+
+_lock = threading.Lock()
+_thread = None
+_ready = threading.Event()
+
+
+def _warm():
+    try:
+        result = DISK_CACHE.get(DEFAULT_KEY)
+        if result is None:
+            result = build_result(default_form_data())
+            DISK_CACHE.put(DEFAULT_KEY, result)
+        RESULT_CACHE.put(DEFAULT_KEY, result)
+
+        import plotly.io as pio
+        for fig_json in result["figures"].values():
+            pio.from_json(fig_json)
+    finally:
+        _ready.set()
+    PROJECTION_POOL.warm()
+
+
+def _import_json_engine():
+    # Plotly looks its optional JSON engine up in sys.modules before importing it, so a script
+    # thread drawing a chart while the warm-up imports orjson can get the half-initialized module.
+    # Importing it before the thread starts leaves nothing to race on.
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        pass
+
+
+def start():
+    """Start the warm-up once per process; later calls return immediately."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _import_json_engine()
+            _thread = threading.Thread(target=_warm, name="startup-warm", daemon=True)
+            _thread.start()
+
+
+def wait(timeout=None):
+    """Block until the warm-up is done (True) or timeout seconds pass (False); starts it if needed."""
+    start()
+    return _ready.wait(timeout)
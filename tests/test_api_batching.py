@@ -0,0 +1,17 @@
+import json
+import math
+
+from api_server import evaluate, parse_form_data
+
+
+def test_batched_schedules_of_different_lengths_match_solo_evaluation():
+    long_schedule = parse_form_data({"horizon_years": 10, "sem_cr_y6": 0.07})
+    short_schedule = parse_form_data({"horizon_years": 10})
+
+    batched = evaluate([long_schedule, short_schedule])
+    alone = evaluate([short_schedule])
+
+    assert batched[1] == alone[0]
+    body = json.loads(batched[1])
+    assert all(v is not None and math.isfinite(v) for v in body["monthly"]["Revenue"])
+    assert all(v is not None and math.isfinite(v) for v in body["yearly"]["Earnings Before Taxes"])
@@ -0,0 +1,296 @@
+"""Shared, bounded process pool for model runs, with admission control.
+
+Streamlit runs every session's script on a thread of one process, so model
+runs on those threads compete for the GIL with every other session's widget
+interactions. PROJECTION_POOL instead runs them in worker processes:
+
+    PROJECTION_WORKERS   runs executing at once (default: one per core; 0 runs inline)
+    PROJECTION_QUEUE     runs allowed to wait for a worker (default 4 per worker);
+                         past that, submit() raises PoolBusy
+
+Waiting runs keep a queue position the app shows as "busy, queued #N". Each
+session has at most one run in flight: resubmitting different inputs cancels
+the previous run (dropped from the queue, or its result discarded if a
+worker already has it), and resubmitting the same inputs rejoins it.
+
+Local load generator, N simulated sessions against the pool or inline:
+
+    python worker_pool.py --sessions 16 --runs 10 [--inline]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import numpy as np
+
+from diagnostics import StageTimer
+from projection import build_result, default_form_data
+from result_cache import canonical_key
+
+
+# Workers fork from a clean server process with the model and Plotly already imported, never from the
+# multi-threaded app process, where another thread may be holding an import lock
+_CONTEXT = multiprocessing.get_context("forkserver")
+_CONTEXT.set_forkserver_preload(["worker_pool", "plotly.graph_objects", "plotly.express"])
+
+
+@contextmanager
+def _main_script_hidden():
+    """Hide the running script while starting processes.
+
+    Spawned and forkserver children re-run the parent's __main__ file before
+    they take work. Under Streamlit that is app.py, which must not run
+    outside a session.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class PoolBusy(Exception):
+    """The pool's queue is full; the run was not accepted."""
+
+
+def build_in_worker(form_data, previous=None, timed=False):
+    """build_result() in a worker process; returns (result, {stage: (wall_ms, cpu_ms)})."""
+    timer = StageTimer(enabled=timed)
+    return build_result(form_data, timer, previous), timer.stages
+
+
+def _warm_worker():
+    # Building figures once pays for Plotly's validator imports before the first real run
+    build_result(default_form_data())
+
+
+class Ticket:
+    """One submitted run: its queue position while waiting, then its result."""
+
+    def __init__(self, session_id, key, fn, args):
+        self.session_id = session_id
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class ProjectionPool:
+    def __init__(self, max_workers, max_queued):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = None
+        # Reentrant: a done callback can fire inside submit() on the submitting thread
+        self._lock = threading.RLock()
+        self._queued = deque()
+        self._running = 0
+        self._sessions = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def submit(self, session_id, key, fn, *args):
+        """Queue fn(*args) for a session; key identifies its inputs (e.g. canonical_key(form_data))."""
+        if self.max_workers == 0:
+            ticket = Ticket(session_id, key, fn, args)
+            ticket.future.set_result(fn(*args))
+            return ticket
+        with self._lock:
+            previous = self._sessions.get(session_id)
+            if previous is not None and not previous.done():
+                if previous.key == key:
+                    return previous
+                self._cancel(previous)
+            if self._running >= self.max_workers and len(self._queued) >= self.max_queued:
+                self.rejected += 1
+                raise PoolBusy(f"{len(self._queued)} runs are already waiting")
+            ticket = Ticket(session_id, key, fn, args)
+            self._sessions[session_id] = ticket
+            self._queued.append(ticket)
+            self._dispatch()
+        return ticket
+
+    def position(self, ticket):
+        """1-based place in the queue, or 0 once a worker has the run (or it is done)."""
+        with self._lock:
+            try:
+                return self._queued.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def cancel(self, ticket):
+        """Drop a run whose result is no longer wanted."""
+        with self._lock:
+            if not ticket.done():
+                self._cancel(ticket)
+
+    def _cancel(self, ticket):
+        if ticket in self._queued:
+            self._queued.remove(ticket)
+        # A worker already running it can't be interrupted; its result is dropped in _finished()
+        ticket.future.cancel()
+        self.cancelled += 1
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_CONTEXT,
+                                                 initializer=_warm_worker)
+            # The first submit starts every worker process; none are started later
+            with _main_script_hidden():
+                self._executor.submit(int)
+        return self._executor
+
+    def warm(self):
+        """Start the worker processes now instead of on the first run."""
+        if self.max_workers:
+            with self._lock:
+                executor = self._pool()
+            for future in [executor.submit(int) for _ in range(self.max_workers)]:
+                future.result()
+
+    def _dispatch(self):
+        while self._queued and self._running < self.max_workers:
+            ticket = self._queued.popleft()
+            self._running += 1
+            self._pool().submit(ticket.fn, *ticket.args).add_done_callback(partial(self._finished, ticket))
+
+    def _finished(self, ticket, future):
+        with self._lock:
+            self._running -= 1
+            self.completed += 1
+            if self._sessions.get(ticket.session_id) is ticket:
+                del self._sessions[ticket.session_id]
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                # A worker died; the next dispatch starts a fresh pool
+                self._executor = None
+            if not ticket.future.cancelled():
+                if error is None:
+                    ticket.future.set_result(future.result())
+                else:
+                    ticket.future.set_exception(error)
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": len(self._queued),
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "rejected": self.rejected,
+            }
+
+
+_WORKERS = int(os.environ.get("PROJECTION_WORKERS", os.cpu_count() or 1))
+PROJECTION_POOL = ProjectionPool(_WORKERS, int(os.environ.get("PROJECTION_QUEUE", 4 * max(_WORKERS, 1))))
+
+
+def _interaction():
+    # Stand-in for a light widget rerun: a little pure-Python work that needs the GIL
+    return sum(i * i for i in range(20000))
+
+
+def load_test(pool, sessions=16, runs=10, think_time=0.2, resubmit=0.1, horizon_years=5, inline=False, seed=0):
+    """Simulate concurrent sessions that each run the model `runs` times with fresh inputs.
+
+    Between runs every session makes a light interaction, timed to show how
+    model runs on other sessions slow it down. A `resubmit` share of runs is
+    replaced by new inputs shortly after submission, as when an analyst edits
+    the form again mid-run. inline=True runs the model on the session threads
+    instead, the way the app did without a pool.
+    """
+    latencies = []
+    interactions = []
+    busy = []
+    lock = threading.Lock()
+    base = dict(default_form_data(), horizon_years=horizon_years)
+
+    def session(session_id):
+        rng = np.random.default_rng([seed, session_id])
+        local_runs, local_interactions, local_busy = [], [], 0
+        for _ in range(runs):
+            form_data = dict(base, churn_rate=round(float(rng.uniform(0.01, 0.5)), 9))
+            start = time.perf_counter()
+            try:
+                if inline:
+                    build_in_worker(form_data)
+                else:
+                    ticket = pool.submit(session_id, canonical_key(form_data), build_in_worker, form_data)
+                    if rng.random() < resubmit:
+                        time.sleep(0.005)
+                        form_data = dict(form_data, churn_rate=form_data['churn_rate'] / 2)
+                        ticket = pool.submit(session_id, canonical_key(form_data), build_in_worker, form_data)
+                    ticket.result()
+                local_runs.append(time.perf_counter() - start)
+            except PoolBusy:
+                local_busy += 1
+            start = time.perf_counter()
+            _interaction()
+            local_interactions.append(time.perf_counter() - start)
+            time.sleep(rng.uniform(0, 2 * think_time))
+        with lock:
+            latencies.extend(local_runs)
+            interactions.extend(local_interactions)
+            busy.append(local_busy)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    def percentiles(values):
+        if not values:
+            return "n/a"
+        p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000
+        return f"p50 {p50:.1f} ms, p90 {p90:.1f} ms, p99 {p99:.1f} ms"
+
+    print(f"{'inline' if inline else f'pool of {pool.max_workers}'}: {sessions} sessions, "
+          f"{len(latencies):,} runs in {elapsed:.1f}s ({sum(busy)} turned away as busy)")
+    print(f"  run latency          {percentiles(latencies)}")
+    print(f"  interaction latency  {percentiles(interactions)}")
+    if not inline:
+        print(f"  pool: {pool.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16, help="concurrent simulated sessions")
+    parser.add_argument("--runs", type=int, default=10, help="model runs per session")
+    parser.add_argument("--think-time", type=float, default=0.2, help="mean pause between runs (s)")
+    parser.add_argument("--resubmit", type=float, default=0.1, help="share of runs replaced mid-flight")
+    parser.add_argument("--horizon-years", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=_WORKERS, help="pool size (default PROJECTION_WORKERS)")
+    parser.add_argument("--queue", type=int, default=None, help="queue cap (default 4 per worker)")
+    parser.add_argument("--inline", action="store_true", help="run the model on the session threads instead")
+    args = parser.parse_args(argv)
+
+    pool = ProjectionPool(args.workers, args.queue if args.queue is not None else 4 * max(args.workers, 1))
+    load_test(pool, args.sessions, args.runs, args.think_time, args.resubmit, args.horizon_years, args.inline)
+
+
+if __name__ == "__main__":
+    # Run as the imported module, so workers (which don't re-run this script) can unpickle build_in_worker
+    import worker_pool
+    sys.exit(worker_pool.main())